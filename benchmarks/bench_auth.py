@@ -0,0 +1,390 @@
+"""
+Benchmark of the authentication hot paths.
+
+The application of isagog_userauth.main is driven in-process through its ASGI
+interface (no network, no server), against a SQLite database seeded with a
+configurable number of users. Every scenario is run at each concurrency level
+and reported as ops/s and p50/p95/p99 latencies:
+
+    login_valid, login_invalid  POST /user/login with right and wrong passwords
+    refresh                     POST /user/refresh
+    protected, superprotected   GET /protected and /superprotected
+    signup                      POST /user/signup of new users
+    list                        GET /user/list, one page of 100 users
+
+The results can be saved as a JSON baseline and later runs compared against it:
+
+    python -m benchmarks.bench_auth --users 10000 --save baseline.json
+    python -m benchmarks.bench_auth --users 10000 --compare baseline.json
+
+A comparison exits with status 1 when any scenario lost more than --threshold
+of its throughput or grew its p95 latency by more than --threshold.
+
+Password hashing dominates the login and signup scenarios, so the hasher
+settings (e.g. BCRYPT_ROUNDS) are recorded with the results, and login
+throttling and admission control are disabled unless set in the environment.
+
+Functions:
+    percentile(sorted_values, fraction): Nearest-rank percentile of sorted values.
+    run_benchmarks(users, concurrency_levels, requests, scenarios): Run the suite.
+    compare_results(results, baseline, threshold): List the regressions.
+    main(argv): Command-line entry point.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+SCENARIOS = (
+    "login_valid",
+    "login_invalid",
+    "refresh",
+    "protected",
+    "superprotected",
+    "signup",
+    "list",
+)
+BENCH_PASSWORD = "benchpassword"
+ADMIN_PASSWORD = "benchadminpassword"
+
+
+def configure_environment(database_path: str):
+    """point the application at the benchmark database, before it is imported"""
+    os.environ["USER_DB_URL"] = f"sqlite:///{database_path}"
+    os.environ.pop("USER_ASYNC_DB_URL", None)
+    os.environ["ADMIN_EMAIL"] = "benchadmin@example.com"
+    os.environ["ADMIN_USERNAME"] = "benchadmin"
+    os.environ["ADMIN_PASSWORD"] = ADMIN_PASSWORD
+    # measure the raw paths, unless explicitly configured otherwise
+    os.environ.setdefault("LOGIN_MAX_FAILURES_PER_IDENTITY", "0")
+    os.environ.setdefault("LOGIN_MAX_FAILURES_PER_IP", "0")
+    os.environ.setdefault("PASSWORD_MAX_QUEUE", "1000000")
+    os.environ.setdefault("PASSWORD_MAX_QUEUE_TIME", "1000000")
+
+
+def seed_users(count: int):
+    """insert count basic users sharing one password hash, in one transaction"""
+    # pylint: disable=C0415
+    from sqlalchemy import insert
+
+    from isagog_userauth.database import create_tables, upgrade_schema
+    from isagog_userauth.db_session import get_sessionmaker
+    from isagog_userauth.models import User
+    from isagog_userauth.utils import get_password_hash
+
+    create_tables()
+    upgrade_schema()
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    with get_sessionmaker()() as session:
+        session.execute(
+            insert(User),
+            [
+                {
+                    "email": f"bench{i}@example.com",
+                    "username": f"bench{i}",
+                    "password": hashed_password,
+                    "role": "basic",
+                }
+                for i in range(count)
+            ],
+        )
+        session.commit()
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of sorted values.
+
+    Args:
+        sorted_values (list[float]): The values, in ascending order.
+        fraction (float): The percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The value below which the fraction of the values fall.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def measure(send, concurrency: int, requests: int) -> dict:
+    """run requests calls of send, concurrency at a time, and summarize them"""
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in remaining:
+            start = time.perf_counter()
+            ok = await send(index)
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "ops_per_sec": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def login(client, username: str, password: str) -> dict:
+    """log in and return the token response"""
+    response = await client.post(
+        "/user/login", data={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def scenario_senders(client, users: int, admin: dict, basic: list[dict]) -> dict:
+    """the request function of every scenario, given an index, returning success"""
+    admin_headers = {"Authorization": f"Bearer {admin['access_token']}"}
+    basic_headers = [
+        {"Authorization": f"Bearer {tokens['access_token']}"} for tokens in basic
+    ]
+    pick = random.Random(0)
+    signup_numbers = itertools.count()
+
+    async def login_valid(_):
+        username = f"bench{pick.randrange(users)}"
+        response = await client.post(
+            "/user/login", data={"username": username, "password": BENCH_PASSWORD}
+        )
+        return response.status_code == 200
+
+    async def login_invalid(_):
+        username = f"bench{pick.randrange(users)}"
+        response = await client.post(
+            "/user/login", data={"username": username, "password": "wrongpassword"}
+        )
+        return response.status_code == 401
+
+    async def refresh(index):
+        token = basic[index % len(basic)]["refresh_token"]
+        response = await client.post("/user/refresh", json={"refresh_token": token})
+        return response.status_code == 200
+
+    async def protected(index):
+        headers = basic_headers[index % len(basic_headers)]
+        return (await client.get("/protected", headers=headers)).status_code == 200
+
+    async def superprotected(_):
+        response = await client.get("/superprotected", headers=admin_headers)
+        return response.status_code == 200
+
+    async def signup(_):
+        number = next(signup_numbers)
+        response = await client.post(
+            "/user/signup",
+            json={
+                "email": f"signup{number}@example.com",
+                "username": f"signup{number}",
+                "password": BENCH_PASSWORD,
+                "role": "basic",
+            },
+            headers=admin_headers,
+        )
+        return response.status_code == 200
+
+    async def list_users(_):
+        response = await client.get(
+            "/user/list", params={"limit": 100}, headers=admin_headers
+        )
+        return response.status_code == 200
+
+    return {
+        "login_valid": login_valid,
+        "login_invalid": login_invalid,
+        "refresh": refresh,
+        "protected": protected,
+        "superprotected": superprotected,
+        "signup": signup,
+        "list": list_users,
+    }
+
+
+async def run_benchmarks(
+    users: int, concurrency_levels: list[int], requests: int, scenarios: list[str]
+) -> list[dict]:
+    """
+    Run the scenarios at every concurrency level against the in-process app.
+
+    The environment must have been configured and the database seeded.
+
+    Args:
+        users (int): The number of seeded users.
+        concurrency_levels (list[int]): The numbers of concurrent clients.
+        requests (int): The number of requests per scenario and level.
+        scenarios (list[str]): The names of the scenarios to run.
+
+    Returns:
+        list[dict]: One result per scenario and concurrency level.
+    """
+    # pylint: disable=C0415
+    import httpx
+
+    from isagog_userauth.main import app, lifespan
+
+    results = []
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            admin = await login(client, "benchadmin", ADMIN_PASSWORD)
+            basic = [
+                await login(client, f"bench{i}", BENCH_PASSWORD)
+                for i in range(min(users, 16))
+            ]
+            senders = scenario_senders(client, users, admin, basic)
+            for name in scenarios:
+                for concurrency in concurrency_levels:
+                    await senders[name](0)  # warm up
+                    result = await measure(senders[name], concurrency, requests)
+                    results.append({"scenario": name, **result})
+                    print(
+                        f"{name:>15} c={concurrency:<4} "
+                        f"{result['ops_per_sec']:>10.1f} ops/s  "
+                        f"p50 {result['p50_ms']:>8.2f} ms  "
+                        f"p95 {result['p95_ms']:>8.2f} ms  "
+                        f"p99 {result['p99_ms']:>8.2f} ms  "
+                        f"errors {result['errors']}",
+                        file=sys.stderr,
+                    )
+    return results
+
+
+def compare_results(results: list[dict], baseline: list[dict], threshold: float):
+    """
+    List the regressions of results against a baseline.
+
+    Args:
+        results (list[dict]): The results of this run.
+        baseline (list[dict]): The results of the baseline run.
+        threshold (float): The tolerated relative throughput loss or p95 growth.
+
+    Returns:
+        list[str]: One description per regressed scenario and concurrency level.
+    """
+    reference = {(r["scenario"], r["concurrency"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = reference.get((result["scenario"], result["concurrency"]))
+        if base is None:
+            continue
+        label = f"{result['scenario']} at concurrency {result['concurrency']}"
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{label}: {result['ops_per_sec']} ops/s, "
+                f"baseline {base['ops_per_sec']} ops/s"
+            )
+        if result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(
+                f"{label}: p95 {result['p95_ms']} ms, baseline {base['p95_ms']} ms"
+            )
+    return regressions
+
+
+def run_metadata(users: int, requests: int) -> dict:
+    """the settings that must match for two runs to be comparable"""
+    # pylint: disable=C0415
+    from isagog_userauth import config
+
+    return {
+        "users": users,
+        "requests": requests,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "password_hasher": config.PASSWORD_HASHER,
+        "bcrypt_rounds": config.BCRYPT_ROUNDS,
+        "stateless_tokens": config.STATELESS_TOKENS,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Run the benchmark suite, then save or compare the results.
+
+    Args:
+        argv (list[str], optional): The command-line arguments.
+
+    Returns:
+        int: The process exit status, 1 when a regression was found.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the auth hot paths.")
+    parser.add_argument("--users", type=int, default=1000, help="users to seed")
+    parser.add_argument(
+        "--concurrency",
+        default="1,8,32",
+        help="comma-separated numbers of concurrent clients",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=200, help="requests per scenario and level"
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help=f"comma-separated subset of {','.join(SCENARIOS)}",
+    )
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with this JSON baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="tolerated relative throughput loss or p95 growth",
+    )
+    args = parser.parse_args(argv)
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(os.path.join(directory, "bench.db"))
+        random.seed(0)
+        seed_users(args.users)
+        results = asyncio.run(
+            run_benchmarks(args.users, concurrency_levels, args.requests, scenarios)
+        )
+        report = {"meta": run_metadata(args.users, args.requests), "results": results}
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline["meta"] != report["meta"]:
+            print(
+                f"warning: baseline settings differ: {baseline['meta']}",
+                file=sys.stderr,
+            )
+        regressions = compare_results(results, baseline["results"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
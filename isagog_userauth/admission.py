@@ -0,0 +1,153 @@
+"""
+Admission control for password hashing.
+
+The password pool bounds how many hashes run at once, but not how many wait
+for a worker: after an outage, a login storm queues far more hashing work than
+the pool can finish before clients give up, and the CPU is then spent on
+requests nobody waits for anymore. Every hash or verify submitted from the
+event loop therefore takes a slot from an admission limiter first: the routes
+hashing one password hold a slot around it, and hash_passwords_async, which
+backs the bulk import and password reset, takes one per password. A bounded
+number of requests may wait for a slot, each for at most PASSWORD_MAX_QUEUE_TIME
+seconds, and a request whose expected wait already exceeds that time is rejected
+at once. Rejected requests get a 503 with a Retry-After header, so that clients
+back off while the queued work drains.
+
+Environment Variables:
+    PASSWORD_MAX_CONCURRENCY (int): Requests hashing at once, 0 means the pool size.
+    PASSWORD_MAX_QUEUE (int): Requests allowed to wait for a slot.
+    PASSWORD_MAX_QUEUE_TIME (float): The longest wait for a slot, in seconds.
+
+Classes:
+    AdmissionLimiter: A concurrency limiter with a bounded, deadline-aware queue.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from .config import (PASSWORD_MAX_CONCURRENCY, PASSWORD_MAX_QUEUE,
+                     PASSWORD_MAX_QUEUE_TIME, PASSWORD_POOL_SIZE)
+from .custom_exceptions import ServiceUnavailableException
+
+# weight of the latest hold time in the moving average of hold times
+HOLD_TIME_SMOOTHING = 0.1
+
+
+class AdmissionLimiter:
+    """
+    A concurrency limiter with a bounded, deadline-aware FIFO queue.
+
+    It is only used from the event loop, so it needs no locking.
+
+    Attributes:
+        capacity (int): The number of slots.
+        max_queue (int): The number of requests allowed to wait.
+        max_queue_time (float): The longest wait for a slot, in seconds.
+        admitted (int): The number of requests that got a slot.
+        rejected_queue_full (int): Requests rejected because the queue was full.
+        rejected_queue_time (int): Requests rejected because they would wait too long.
+        avg_hold_time (float): The moving average of the time a slot is held.
+    """
+
+    def __init__(self, capacity: int, max_queue: int, max_queue_time: float):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_queue_time = 0
+        self.avg_hold_time = 0.0
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _expected_wait(self, position: int) -> float:
+        """the time until the request at a queue position gets a slot"""
+        return math.ceil(position / self.capacity) * self.avg_hold_time
+
+    def _retry_after(self) -> float:
+        """the time until the current queue has drained"""
+        return self._expected_wait(len(self._waiters) + 1) or self.max_queue_time
+
+    async def acquire(self):
+        """
+        Wait for a slot.
+
+        Raises:
+            ServiceUnavailableException: If the queue is full, or the slot
+            cannot be obtained within max_queue_time.
+        """
+        if self._active < self.capacity and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise ServiceUnavailableException(self._retry_after())
+        if self._expected_wait(len(self._waiters) + 1) > self.max_queue_time:
+            self.rejected_queue_time += 1
+            raise ServiceUnavailableException(self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_queue_time)
+        except asyncio.TimeoutError as exc:
+            if waiter.done():  # granted just as the wait timed out
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            self.rejected_queue_time += 1
+            raise ServiceUnavailableException(self._retry_after()) from exc
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        self.admitted += 1
+
+    def release(self):
+        """hand the slot over to the oldest waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """hold a slot for the duration of the block"""
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.avg_hold_time += HOLD_TIME_SMOOTHING * (elapsed - self.avg_hold_time)
+            self.release()
+
+    def stats(self) -> dict:
+        """report the slot usage, the queue depth and the rejection counters"""
+        return {
+            "capacity": self.capacity,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_queue_time": self.rejected_queue_time,
+            "avg_hold_time": self.avg_hold_time,
+        }
+
+
+password_admission = AdmissionLimiter(
+    PASSWORD_MAX_CONCURRENCY or PASSWORD_POOL_SIZE or os.cpu_count() or 1,
+    PASSWORD_MAX_QUEUE,
+    PASSWORD_MAX_QUEUE_TIME,
+)
@@ -0,0 +1,257 @@
+"""
+Service API keys.
+
+Machine clients authenticate with a long-lived API key instead of logging in
+with a password, which keeps their traffic off the password hashing path. A key
+reads "isk_<prefix>_<secret>": the prefix is public and unique, and indexes the
+key's row; only the HMAC-SHA256 of the secret, keyed with BCRYPT_PEPPER, is
+stored. The secret has 256 random bits, so a fast keyed hash is as safe as a
+slow password hash would be. Resolving a key therefore takes one indexed lookup
+(joined with the user row), one HMAC and a constant-time comparison.
+
+A key authenticates as its user, with the user's current role, plus the scopes
+it was issued with: the "introspect" scope lets an API gateway call
+/user/introspect without holding an admin token. Deleting the user deletes their
+keys in the same transaction (user ids may be reused, so a key must never
+outlive its user), while password changes leave them valid. Keys are issued,
+listed and revoked by admins through the /admin/api-keys routes, and sent in an
+"X-API-Key" header.
+
+Environment Variables:
+    BCRYPT_PEPPER (str): The secret keying the HMAC of API key secrets.
+
+Functions:
+    generate_api_key(): Generate a new key, with its prefix and digest.
+    parse_api_key(key): Split a key into its prefix and secret.
+    key_digest(secret): The HMAC-SHA256 of a key secret.
+    find_api_key(db, key): Return the scopes and user of a valid key.
+    authenticate_api_key(db, key): Return the user of a valid key.
+    delete_user_api_keys(db, user_ids): Delete the keys of users being deleted.
+    get_api_key_user(api_key, db): Dependency authenticating by API key only.
+    get_current_user_or_api_key(request, api_key, db): Dependency accepting either
+    an API key or a bearer token, usable wherever get_current_user_async is.
+    get_introspection_client(request, api_key, db): Dependency accepting an API key
+    with the introspect scope, or an admin bearer token.
+"""
+
+import hashlib
+import hmac
+import secrets
+import time
+
+from fastapi import Depends, HTTPException, Request, Security
+from fastapi.security import APIKeyHeader
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .bulk_import import chunked
+from .config import BCRYPT_PEPPER, BULK_CHUNK_SIZE, STATELESS_TOKENS
+from .custom_exceptions import ForbiddenException
+from .db_session import get_async_read_db
+from .metrics import api_key_authentications_total
+from .models import ApiKey, User
+from .utils import (get_admin_user_async, get_current_user_row_async,
+                    get_token_payload, get_token_principal, oauth2_scheme)
+
+KEY_SCHEME = "isk"
+PREFIX_BYTES = 6  # 12 hex characters
+SECRET_BYTES = 32
+INTROSPECT_SCOPE = "introspect"
+
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+
+def key_digest(secret: str) -> str:
+    """
+    Compute the HMAC-SHA256 of a key secret, keyed with BCRYPT_PEPPER.
+
+    Args:
+        secret (str): The secret part of an API key.
+
+    Returns:
+        str: The hex digest.
+    """
+    return hmac.new(
+        BCRYPT_PEPPER.encode("utf-8"), secret.encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def generate_api_key() -> tuple[str, str, str]:
+    """
+    Generate a new API key.
+
+    Returns:
+        tuple[str, str, str]: The key to hand to the client (it is not stored),
+        its prefix and the digest of its secret.
+    """
+    prefix = secrets.token_hex(PREFIX_BYTES)
+    secret = secrets.token_urlsafe(SECRET_BYTES)
+    return f"{KEY_SCHEME}_{prefix}_{secret}", prefix, key_digest(secret)
+
+
+def parse_api_key(key: str) -> tuple[str, str] | None:
+    """
+    Split an API key into its prefix and secret.
+
+    Args:
+        key (str): The key sent by a client.
+
+    Returns:
+        tuple[str, str] | None: The prefix and the secret, or None if the key is
+        not well formed.
+    """
+    scheme, _, rest = key.partition("_")
+    prefix, _, secret = rest.partition("_")
+    if scheme != KEY_SCHEME or len(prefix) != 2 * PREFIX_BYTES or not secret:
+        return None
+    return prefix, secret
+
+
+async def find_api_key(db: AsyncSession, key: str):
+    """
+    Return the scopes of an API key and the user it authenticates as.
+
+    Args:
+        db (AsyncSession): The asyncio database session.
+        key (str): The key sent by a client.
+
+    Returns:
+        Row | None: The row of the key, with its scopes and User, or None if the
+        key is malformed, unknown, expired, or its user is gone.
+    """
+    parts = parse_api_key(key)
+    if parts is None:
+        api_key_authentications_total.labels("invalid").inc()
+        return None
+    prefix, secret = parts
+    row = (
+        await db.execute(
+            select(ApiKey.digest, ApiKey.expires_at, ApiKey.scopes, User)
+            .join(User, User.id == ApiKey.user_id)
+            .where(ApiKey.prefix == prefix)
+        )
+    ).first()
+    if row is None or not hmac.compare_digest(row.digest, key_digest(secret)):
+        api_key_authentications_total.labels("invalid").inc()
+        return None
+    if row.expires_at is not None and row.expires_at <= time.time():
+        api_key_authentications_total.labels("expired").inc()
+        return None
+    api_key_authentications_total.labels("success").inc()
+    return row
+
+
+async def authenticate_api_key(db: AsyncSession, key: str) -> User | None:
+    """
+    Return the user an API key authenticates as.
+
+    Args:
+        db (AsyncSession): The asyncio database session.
+        key (str): The key sent by a client.
+
+    Returns:
+        User | None: The user of the key, or None if the key is malformed,
+        unknown, expired, or its user is gone.
+    """
+    row = await find_api_key(db, key)
+    return None if row is None else row.User
+
+
+async def delete_user_api_keys(db: AsyncSession, user_ids):
+    """
+    Delete the API keys of some users, without committing, so that they go in
+    the same transaction as the users themselves.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+        user_ids: The IDs of the users.
+
+    Returns:
+        None
+    """
+    for chunk in chunked(list(user_ids), BULK_CHUNK_SIZE):
+        await db.execute(delete(ApiKey).where(ApiKey.user_id.in_(chunk)))
+
+
+async def get_api_key_user(
+    api_key: str | None = Security(api_key_header),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Retrieve the user of the API key in the X-API-Key header.
+
+    Parameters:
+    api_key (str | None): The key extracted from the X-API-Key header.
+    db (AsyncSession): The asyncio read session dependency (see get_async_read_db).
+
+    Returns:
+    User: The user the key authenticates as.
+
+    Raises:
+    HTTPException: If the key is missing or not valid.
+    """
+    user = await authenticate_api_key(db, api_key) if api_key else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return user
+
+
+async def get_current_user_or_api_key(
+    request: Request,
+    api_key: str | None = Security(api_key_header),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Retrieve the current user from an X-API-Key header or, without one, from the
+    bearer token as get_current_user_async does.
+
+    Parameters:
+    request (Request): The incoming request.
+    api_key (str | None): The key extracted from the X-API-Key header.
+    db (AsyncSession): The asyncio read session dependency (see get_async_read_db).
+
+    Returns:
+    User | TokenPrincipal: The authenticated user.
+
+    Raises:
+    HTTPException: If neither credential is present and valid.
+    """
+    if api_key:
+        return await get_api_key_user(api_key, db)
+    payload = await get_token_payload(await oauth2_scheme(request), db)
+    if STATELESS_TOKENS:
+        return await get_token_principal(payload)
+    return await get_current_user_row_async(payload, db)
+
+
+async def get_introspection_client(
+    request: Request,
+    api_key: str | None = Security(api_key_header),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Authorize a /user/introspect caller: an API key with the introspect scope,
+    typically held by an API gateway, or without a key an admin bearer token.
+
+    Parameters:
+    request (Request): The incoming request.
+    api_key (str | None): The key extracted from the X-API-Key header.
+    db (AsyncSession): The asyncio read session dependency (see get_async_read_db).
+
+    Returns:
+    User | TokenPrincipal: The user of the key, or the admin.
+
+    Raises:
+    HTTPException: If the credential is missing or not valid, or it does not
+    grant introspection.
+    """
+    if api_key:
+        row = await find_api_key(db, api_key)
+        if row is None:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        if INTROSPECT_SCOPE not in row.scopes.split():
+            raise ForbiddenException()
+        return row.User
+    return await get_admin_user_async(
+        await get_current_user_or_api_key(request, None, db)
+    )
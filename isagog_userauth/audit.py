@@ -0,0 +1,258 @@
+"""
+Write-behind audit log.
+
+Login attempts, token refreshes and admin actions are recorded in the
+audit_events table, and every successful login sets the last_login_ts of its
+user. Writing them inline would add a commit, and on SQLite a wait for the write
+lock, to the hottest routes. Instead audit() appends the event to a bounded
+in-process queue and returns at once. run_audit_writer, started from the
+application lifespan, drains the queue every AUDIT_FLUSH_INTERVAL seconds, or as
+soon as AUDIT_BATCH_SIZE events are waiting: each batch is written in a single
+transaction, as one multi-row INSERT plus one UPDATE of last_login_ts per user
+who logged in, with only the latest login of each user.
+
+Events are kept in memory until written, so a crash loses those of the last
+AUDIT_FLUSH_INTERVAL seconds; on shutdown the writer drains the queue before it
+returns. When the queue is full, new events are dropped rather than delaying
+the request, and so are the batches that fail to write: both are counted in
+isagog_audit_events_dropped_total{reason}.
+
+Environment Variables:
+    AUDIT_QUEUE_SIZE (int): The number of events waiting to be written, 0 disables it.
+    AUDIT_BATCH_SIZE (int): The maximum number of events written per transaction.
+    AUDIT_FLUSH_INTERVAL (float): Seconds between writes of the waiting events.
+
+Classes:
+    AuditLog: The bounded queue of the events waiting to be written.
+
+Functions:
+    audit(action, outcome, ...): Queue an event, without waiting for its write.
+    write_audit_events(db, events): Insert events and update the last logins.
+    flush_audit_log(session_factory): Write every queued event.
+    run_audit_writer(session_factory): Write the queued events until stopped.
+"""
+
+import asyncio
+import collections
+import contextlib
+import itertools
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, insert, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL, AUDIT_QUEUE_SIZE
+from .metrics import audit_events_dropped_total
+from .models import AuditEvent, User
+
+logger = logging.getLogger(__name__)
+
+# the width of the identifier and detail columns
+MAX_TEXT_LENGTH = 255
+
+
+class AuditLog:
+    """
+    The bounded queue of the audit events waiting to be written.
+
+    It is only used from the event loop, so it needs no locking. Events stay in
+    the queue until their batch is written, the writer being its only consumer.
+
+    Attributes:
+        max_size (int): The number of events the queue holds, 0 to disable it.
+        batch_size (int): The maximum number of events per batch.
+        written (int): The number of events written so far.
+        stopping (bool): Whether the writer was asked to drain the queue and stop.
+    """
+
+    def __init__(self, max_size: int, batch_size: int):
+        self.max_size = max_size
+        self.batch_size = max(1, batch_size)
+        self.written = 0
+        self.stopping = False
+        self._events: collections.deque = collections.deque()
+        self._wakeup: asyncio.Event | None = None
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def record(self, event: dict) -> bool:
+        """queue an event, or count it as dropped if the queue is full"""
+        if len(self._events) >= self.max_size:
+            if self.max_size:
+                audit_events_dropped_total.labels("queue_full").inc()
+            return False
+        self._events.append(event)
+        if len(self._events) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def next_batch(self) -> list[dict]:
+        """the oldest events, up to batch_size, left in the queue"""
+        return list(itertools.islice(self._events, self.batch_size))
+
+    def discard(self, count: int):
+        """remove the count oldest events, once their batch is done with"""
+        for _ in range(count):
+            self._events.popleft()
+
+    def start(self) -> asyncio.Event:
+        """the event waking the writer, created on the running loop"""
+        self.stopping = False
+        self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    def stop(self):
+        """ask the writer to drain the queue and return"""
+        self.stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        """report the queue depth and the number of events written"""
+        return {"queued": len(self._events), "written": self.written}
+
+
+audit_log = AuditLog(AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE)
+
+
+def audit(  # pylint: disable=R0913
+    action: str,
+    outcome: str = "success",
+    *,
+    user_id: int | None = None,
+    actor_id: int | None = None,
+    identifier: str | None = None,
+    client_ip: str | None = None,
+    detail: str | None = None,
+) -> bool:
+    """
+    Queue an audit event, to be written shortly by run_audit_writer.
+
+    Args:
+        action (str): What happened, e.g. "login", "refresh" or "user.delete".
+        outcome (str): How it ended, e.g. "success" or "bad_password".
+        user_id (int, optional): The ID of the user the event is about.
+        actor_id (int, optional): The ID of the admin who performed the action.
+        identifier (str, optional): The email or username submitted at login.
+        client_ip (str, optional): The IP address of the client.
+        detail (str, optional): A short description, truncated to 255 characters.
+
+    Returns:
+        bool: False if the event was dropped, the queue being full or disabled.
+    """
+    return audit_log.record(
+        {
+            "ts": time.time(),
+            "action": action,
+            "outcome": outcome,
+            "user_id": user_id,
+            "actor_id": actor_id,
+            "identifier": identifier and identifier[:MAX_TEXT_LENGTH],
+            "client_ip": client_ip,
+            "detail": detail and detail[:MAX_TEXT_LENGTH],
+        }
+    )
+
+
+async def write_audit_events(db: AsyncSession, events: list[dict]):
+    """
+    Insert audit events and set the last_login_ts of the users who logged in,
+    and commit.
+
+    The events are inserted by a single multi-row INSERT. The logins are
+    coalesced to the latest one per user, and a last_login_ts is never moved
+    back, e.g. by the late batch of another worker.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+        events (list[dict]): The events, as queued by audit().
+
+    Returns:
+        None
+    """
+    if not events:
+        return
+    await db.execute(insert(AuditEvent), events)
+    last_logins = {}
+    for event in events:
+        if event["action"] == "login" and event["outcome"] == "success":
+            user_id = event["user_id"]
+            last_logins[user_id] = max(event["ts"], last_logins.get(user_id, 0.0))
+    last_logins.pop(None, None)
+    if last_logins:
+        users = User.__table__
+        login_ts = bindparam("login_ts")
+        await db.execute(
+            update(users)
+            .where(
+                users.c.id == bindparam("user_id"),
+                or_(users.c.last_login_ts.is_(None), users.c.last_login_ts < login_ts),
+            )
+            .values(last_login_ts=login_ts),
+            [
+                {
+                    "user_id": user_id,
+                    "login_ts": datetime.fromtimestamp(ts, timezone.utc),
+                }
+                for user_id, ts in last_logins.items()
+            ],
+        )
+    await db.commit()
+
+
+async def flush_audit_log(session_factory) -> int:
+    """
+    Write every queued event, AUDIT_BATCH_SIZE per transaction.
+
+    A batch that fails to write is logged, counted as dropped and discarded, so
+    that a poisoned batch cannot fill the queue.
+
+    Args:
+        session_factory: A callable returning an AsyncSession, e.g. AsyncSessionLocal.
+
+    Returns:
+        int: The number of events written.
+    """
+    written = 0
+    while len(audit_log):
+        batch = audit_log.next_batch()
+        try:
+            async with session_factory() as db:
+                await write_audit_events(db, batch)
+        except Exception:  # pylint: disable=W0718
+            logger.exception("Audit log write failed, dropping %d events", len(batch))
+            audit_events_dropped_total.labels("write_error").inc(len(batch))
+        else:
+            written += len(batch)
+            audit_log.written += len(batch)
+        audit_log.discard(len(batch))
+    return written
+
+
+async def run_audit_writer(session_factory):
+    """
+    Write the queued audit events every AUDIT_FLUSH_INTERVAL seconds, or as soon
+    as a batch is full, until audit_log.stop() is called; the queue is drained
+    before returning.
+
+    Start it as a task from the application lifespan, and await it after
+    calling audit_log.stop() on shutdown.
+
+    Args:
+        session_factory: A callable returning an AsyncSession, e.g. AsyncSessionLocal.
+
+    Returns:
+        None
+    """
+    wakeup = audit_log.start()
+    while True:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(wakeup.wait(), AUDIT_FLUSH_INTERVAL)
+        wakeup.clear()
+        stopping = audit_log.stopping
+        await flush_audit_log(session_factory)
+        if stopping:
+            return
@@ -0,0 +1,322 @@
+"""
+Bulk user import from CSV or NDJSON.
+
+Provisioning users one /user/signup call at a time pays a serial bcrypt hash and
+several queries per user. This module imports a whole file at once: rows are
+validated with SignupModel, checked against existing users with set-based IN
+queries, hashed in parallel on the password pool, and inserted with batched
+executemany transactions. Every row gets an entry in the returned report.
+
+The same logic backs the admin /user/import route and a command-line entry point:
+
+    python -m isagog_userauth.bulk_import users.csv
+    python -m isagog_userauth.bulk_import users.ndjson --format ndjson
+
+Environment Variables:
+    IMPORT_BATCH_SIZE (int): The number of rows checked and inserted per transaction.
+
+Functions:
+    parse_users(text, input_format): Parse CSV or NDJSON text into row dictionaries.
+    validate_users(rows): Validate rows against SignupModel and the allowed roles.
+    select_new_users(session, users): Drop rows duplicating existing or earlier users.
+    insert_users(session, users, hashed_passwords): Insert users in batches.
+    import_users(session, rows): Run a whole import with a synchronous session.
+    import_users_async(db, rows): Run a whole import with an asyncio session.
+    main(argv): Command-line entry point.
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import IMPORT_BATCH_SIZE
+from .models import User, normalize_identifier
+from .password_pool import hash_passwords, hash_passwords_async
+from .schemas import SignupModel
+
+ROLES = ("admin", "basic")
+
+
+def chunked(items: list, size: int):
+    """yield consecutive slices of items holding at most size elements"""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def echo_value(value) -> str | None:
+    """a raw input value as reported back: a string, or None if missing"""
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def row_result(row: int, user, status: str, detail: str | None = None) -> dict:
+    """build the report entry of one input row"""
+    if isinstance(user, dict):  # a rejected row, with values of any JSON type
+        email = echo_value(user.get("email"))
+        username = echo_value(user.get("username"))
+    else:
+        email, username = user.email, user.username
+    result = {"row": row, "email": email, "username": username, "status": status}
+    if detail is not None:
+        result["detail"] = detail
+    return result
+
+
+def parse_users(text: str, input_format: str) -> list[dict]:
+    """
+    Parse CSV (with a header line) or NDJSON text into row dictionaries.
+
+    Args:
+        text (str): The file content.
+        input_format (str): Either "csv" or "ndjson".
+
+    Returns:
+        list[dict]: One dictionary per row.
+
+    Raises:
+        ValueError: If the format is unknown or an NDJSON line is not a JSON object.
+    """
+    if input_format == "csv":
+        return [dict(row) for row in csv.DictReader(io.StringIO(text))]
+    if input_format == "ndjson":
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {number} is not a JSON object")
+            rows.append(row)
+        return rows
+    raise ValueError(f"Unknown input format: {input_format!r}")
+
+
+def validate_users(rows: list[dict]) -> tuple[list[tuple[int, SignupModel]], list]:
+    """
+    Validate rows against SignupModel and the allowed roles.
+
+    Args:
+        rows (list[dict]): The parsed rows.
+
+    Returns:
+        tuple: The (row number, SignupModel) pairs of the valid rows, and the
+        report entries of the invalid ones.
+    """
+    users, results = [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            fields = {key: value for key, value in row.items() if key and value}
+            user = SignupModel(**fields)
+        except (ValidationError, TypeError) as exc:
+            results.append(row_result(number, row, "invalid", str(exc)))
+            continue
+        if user.role not in ROLES:
+            results.append(row_result(number, row, "invalid", "Invalid role"))
+            continue
+        users.append((number, user))
+    return users, results
+
+
+def select_new_users(
+    session: Session, users: list[tuple[int, SignupModel]]
+) -> tuple[list[tuple[int, SignupModel]], list]:
+    """
+    Drop the rows whose email or username is already registered or repeated,
+    ignoring case.
+
+    Existing users are found with one pair of IN queries per batch, on the
+    normalized email_key and username_key columns.
+
+    Args:
+        session (Session): A synchronous database session.
+        users (list): The (row number, SignupModel) pairs to check.
+
+    Returns:
+        tuple: The pairs to insert, and the report entries of the duplicates.
+    """
+    emails, usernames = set(), set()
+    for batch in chunked(users, IMPORT_BATCH_SIZE):
+        email_keys = [normalize_identifier(u.email) for _, u in batch]
+        username_keys = [normalize_identifier(u.username) for _, u in batch]
+        emails.update(
+            session.scalars(
+                select(User.email_key).where(User.email_key.in_(email_keys))
+            )
+        )
+        usernames.update(
+            session.scalars(
+                select(User.username_key).where(User.username_key.in_(username_keys))
+            )
+        )
+
+    new_users, results = [], []
+    for number, user in users:
+        email_key = normalize_identifier(user.email)
+        username_key = normalize_identifier(user.username)
+        if email_key in emails:
+            detail = "Email already registered"
+        elif username_key in usernames:
+            detail = "Username already taken"
+        else:
+            emails.add(email_key)
+            usernames.add(username_key)
+            new_users.append((number, user))
+            continue
+        results.append(row_result(number, user, "duplicate", detail))
+    return new_users, results
+
+
+def insert_users(
+    session: Session,
+    users: list[tuple[int, SignupModel]],
+    hashed_passwords: list[str],
+) -> list[dict]:
+    """
+    Insert users with one executemany statement and commit per batch.
+
+    When a batch hits a unique constraint (a user registered concurrently),
+    it is rolled back and retried row by row to report the duplicates.
+
+    Args:
+        session (Session): A synchronous database session.
+        users (list): The (row number, SignupModel) pairs to insert.
+        hashed_passwords (list[str]): The hashed passwords, in the same order.
+
+    Returns:
+        list[dict]: The report entries of the inserted rows.
+    """
+    results = []
+    pairs = list(zip(users, hashed_passwords))
+    for batch in chunked(pairs, IMPORT_BATCH_SIZE):
+        params = [
+            {
+                "email": user.email,
+                "username": user.username,
+                "password": hashed,
+                "role": user.role,
+            }
+            for (_, user), hashed in batch
+        ]
+        try:
+            session.execute(insert(User), params)
+            session.commit()
+            results.extend(row_result(n, user, "created") for (n, user), _ in batch)
+        except IntegrityError:
+            session.rollback()
+            for ((number, user), _), values in zip(batch, params):
+                try:
+                    session.execute(insert(User), values)
+                    session.commit()
+                    results.append(row_result(number, user, "created"))
+                except IntegrityError:
+                    session.rollback()
+                    results.append(
+                        row_result(number, user, "duplicate", "User already exists")
+                    )
+    return results
+
+
+def build_report(results: list[dict]) -> dict:
+    """count the outcomes and sort the report entries by row"""
+    results.sort(key=lambda result: result["row"])
+    counts = {"created": 0, "duplicate": 0, "invalid": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {**counts, "results": results}
+
+
+def import_users(session: Session, rows: list[dict]) -> dict:
+    """
+    Import parsed rows with a synchronous session.
+
+    Args:
+        session (Session): A synchronous database session.
+        rows (list[dict]): The parsed rows.
+
+    Returns:
+        dict: The created/duplicate/invalid counts and the per-row results.
+    """
+    users, results = validate_users(rows)
+    users, duplicates = select_new_users(session, users)
+    hashed_passwords = hash_passwords([user.password for _, user in users])
+    results += duplicates + insert_users(session, users, hashed_passwords)
+    return build_report(results)
+
+
+async def import_users_async(db: AsyncSession, rows: list[dict]) -> dict:
+    """
+    Import parsed rows with an asyncio session, hashing without blocking the loop.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+        rows (list[dict]): The parsed rows.
+
+    Returns:
+        dict: The created/duplicate/invalid counts and the per-row results.
+    """
+    users, results = validate_users(rows)
+    users, duplicates = await db.run_sync(select_new_users, users)
+    hashed_passwords = await hash_passwords_async([user.password for _, user in users])
+    results += duplicates + await db.run_sync(insert_users, users, hashed_passwords)
+    return build_report(results)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Import users from a CSV or NDJSON file into the configured database.
+
+    The per-row results are printed to stdout as NDJSON and the counts to stderr.
+
+    Args:
+        argv (list[str], optional): The command-line arguments.
+
+    Returns:
+        int: The process exit status, 1 if any row was not created.
+    """
+    # pylint: disable=C0415
+    from .database import create_tables, upgrade_schema
+    from .db_session import get_sessionmaker
+    from .password_pool import shutdown_password_pool
+
+    parser = argparse.ArgumentParser(description="Bulk import users.")
+    parser.add_argument("file", help="CSV (with a header line) or NDJSON file")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "ndjson"],
+        help="input format, guessed from the file extension when omitted",
+    )
+    args = parser.parse_args(argv)
+    input_format = args.format or ("csv" if args.file.endswith(".csv") else "ndjson")
+    with open(args.file, encoding="utf-8") as file:
+        rows = parse_users(file.read(), input_format)
+
+    create_tables()
+    upgrade_schema()
+    session = get_sessionmaker()()
+    try:
+        report = import_users(session, rows)
+    finally:
+        session.close()
+        shutdown_password_pool()
+
+    for result in report["results"]:
+        print(json.dumps(result))
+    print(
+        f"created: {report['created']}, duplicate: {report['duplicate']}, "
+        f"invalid: {report['invalid']}",
+        file=sys.stderr,
+    )
+    return 0 if report["created"] == len(report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
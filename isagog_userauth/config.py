@@ -1,12 +1,153 @@
-""" import secrets"""
+"""
+Application settings.
+
+Every setting is read from the environment (and the .env file, loaded once) into
+a single frozen Settings object, built on first use by get_settings(). Each field
+is set by the environment variable of the same name in upper case, e.g.
+BCRYPT_PEPPER for bcrypt_pepper; the README lists them.
+
+The settings are also available as upper-case module attributes, so that
+`from .config import BCRYPT_PEPPER` keeps working; they are resolved from
+get_settings() when first imported.
+
+Classes:
+    Settings: The frozen application settings.
+
+Functions:
+    get_settings(): Return the settings, reading the environment on first use.
+"""
 
 import os
+from dataclasses import dataclass, fields
+from functools import lru_cache
 
 from dotenv import load_dotenv
 
-load_dotenv()
+TRUE_VALUES = ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Settings:  # pylint: disable=R0902
+    """The frozen application settings, one field per environment variable."""
+
+    # secrets and token lifetimes
+    bcrypt_pepper: str = "your_pepper_here"
+    jwt_secret: str = "your_secret_key"
+    access_token_lifetime: int = 15  # in MINUTES
+    refresh_token_lifetime: int = 7  # in DAYS
+    # database
+    user_db_url: str | None = None
+    user_async_db_url: str | None = None  # derived from user_db_url when unset
+    user_read_db_url: str | None = None  # replica, None reads from the primary
+    user_async_read_db_url: str | None = None  # derived from user_read_db_url
+    user_table_name: str = "users"
+    db_pool_class: str = "queue"  # or "null"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30  # in SECONDS
+    sqlite_busy_timeout: str = "5000"  # in milliseconds, "" keeps the default
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size: str = "-65536"  # 64 MiB
+    sqlite_mmap_size: str = "268435456"  # 256 MiB
+    init_db_lock_file: str = ""  # "" derives it from the database location
+    # initial admin user
+    admin_email: str | None = None
+    admin_username: str | None = None
+    admin_password: str | None = None
+    # password hashing
+    password_pool_kind: str = "thread"  # or "process"
+    password_pool_size: int = 0  # 0 means one per CPU
+    password_hasher: str = "bcrypt"  # or "argon2id" / "scrypt"
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536  # in KiB
+    argon2_parallelism: int = 4
+    scrypt_log_n: int = 15
+    scrypt_r: int = 8
+    scrypt_p: int = 1
+    password_max_concurrency: int = 0  # 0 means the pool size
+    password_max_queue: int = 64
+    password_max_queue_time: float = 2  # in SECONDS
+    # tokens
+    stateless_tokens: bool = False
+    token_cache_size: int = 10000  # 0 disables the cache
+    jwt_algorithm: str = "HS256"  # or "EdDSA" / "ES256"
+    jwt_keys_dir: str = "./keys"  # <kid>.pem signing keys
+    jwt_active_kid: str = ""
+    jwks_max_age: int = 3600  # in SECONDS
+    revocation_capacity: int = 100000
+    revocation_error_rate: float = 0.001
+    revocation_sync_interval: float = 5  # in SECONDS
+    revocation_prune_interval: float = 3600  # in SECONDS
+    # audit log
+    audit_queue_size: int = 10000  # 0 disables the audit log
+    audit_batch_size: int = 500  # events per transaction
+    audit_flush_interval: float = 1  # in SECONDS
+    # user routes
+    list_page_size: int = 100  # default /user/list page
+    list_max_page_size: int = 1000
+    list_stream_batch: int = 1000  # rows per fetch
+    import_batch_size: int = 1000  # rows per transaction
+    import_max_rows: int = 10000  # rows per /user/import request
+    bulk_chunk_size: int = 500  # ids/emails per statement
+    bulk_max_password_resets: int = 1000  # users per /user/bulk/passchange
+    introspect_max_tokens: int = 1000  # tokens per /user/introspect
+    json_encoder: str = "auto"  # or "orjson" / "json"
+    # login throttling
+    login_throttle_window: float = 60  # in SECONDS
+    login_max_failures_per_identity: int = 10
+    login_max_failures_per_ip: int = 100
+    login_throttle_width: int = 16384
+    login_throttle_depth: int = 4
+    # profiling
+    profile_sample_rate: float = 0  # 0 disables
+    profile_buffer_size: int = 20
+    profile_top_n: int = 40
+
+    @classmethod
+    def from_env(cls, environ) -> "Settings":
+        """
+        Build the settings from environment variables, keeping the defaults of
+        the unset ones.
+
+        Args:
+            environ (Mapping[str, str]): The environment, e.g. os.environ.
+
+        Returns:
+            Settings: The settings.
+
+        Raises:
+            ValueError: If a numeric variable does not parse.
+        """
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is None:
+                continue
+            if field.type is bool:
+                values[field.name] = raw.lower() in TRUE_VALUES
+            elif field.type in (int, float):
+                values[field.name] = field.type(raw)
+            else:
+                values[field.name] = raw
+        return cls(**values)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Return the settings, loading .env and reading the environment on first use.
+
+    Returns:
+        Settings: The application settings.
+    """
+    load_dotenv()
+    return Settings.from_env(os.environ)
+
 
-BCRYPT_PEPPER = os.getenv("BCRYPT_PEPPER", "your_pepper_here")
-JWT_SECRET = os.getenv("JWT_SECRET", "your_secret_key")
-ACCESS_TOKEN_LIFETIME = int(os.getenv("ACCESS_TOKEN_LIFETIME", "15"))  # in MINUTES
-REFRESH_TOKEN_LIFETIME = int(os.getenv("REFRESH_TOKEN_LIFETIME", "7"))  # in DAYS
+def __getattr__(name: str):
+    """resolve the upper-case module attributes, e.g. BCRYPT_PEPPER, lazily"""
+    if name.isupper() and hasattr(Settings, name.lower()):
+        return getattr(get_settings(), name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,6 +8,8 @@ missing authentication tokens and insufficient permissions.
 Classes:
     MissingTokenException: Exception raised when no JWT token is provided.
     ForbiddenException: Exception raised when a user lacks sufficient permissions.
+    TooManyRequestsException: Exception raised when a client is over a rate limit.
+    ServiceUnavailableException: Exception raised when the server sheds load.
 
 Example usage:
     if not token:
@@ -17,6 +19,8 @@ Example usage:
         raise ForbiddenException()
 """
 
+import math
+
 from fastapi import HTTPException, status
 
 
@@ -72,3 +76,57 @@ class ForbiddenException(HTTPException):
         super().__init__(
             status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions."
         )
+
+
+class TooManyRequestsException(HTTPException):
+    """
+    Exception raised when a client is over a rate limit.
+
+    Inherits from:
+    HTTPException: FastAPI's HTTPException class.
+
+    Attributes:
+    status_code (int): HTTP status code for the response.
+    detail (str): Description of the error.
+    headers (dict): The Retry-After header, in whole seconds.
+
+    Example:
+    ```
+    if retry_after is not None:
+        raise TooManyRequestsException(retry_after)
+    ```
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+class ServiceUnavailableException(HTTPException):
+    """
+    Exception raised when the server sheds load it cannot serve in time.
+
+    Inherits from:
+    HTTPException: FastAPI's HTTPException class.
+
+    Attributes:
+    status_code (int): HTTP status code for the response.
+    detail (str): Description of the error.
+    headers (dict): The Retry-After header, in whole seconds.
+
+    Example:
+    ```
+    if queue_is_full:
+        raise ServiceUnavailableException(retry_after)
+    ```
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
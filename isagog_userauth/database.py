@@ -1,57 +1,195 @@
-""" initialize the users database and initialize it with an admin user from the .env file """
+"""
+Initialize the users database and populate it with an admin user from the .env file.
 
+init_db runs in the lifespan of every worker process, so it is built to cost a
+single query once the database is ready: the fingerprint of the schema it last
+created is recorded in the userauth_schema table, and when it matches the models
+and the admin user exists, nothing else is done. Otherwise the workers take a
+file lock in turn, and the first one creates or upgrades the schema and seeds
+the admin user, while the others find everything done once they get the lock.
+The password of the admin user is only hashed when the user is created.
+
+The lock is a host-local file lock (next to a SQLite database, in the temporary
+directory otherwise); workers on different hosts are covered by the schema DDL
+being idempotent and by the unique email of the admin user.
+
+Environment Variables:
+    ADMIN_EMAIL (str): The email of the initial admin user.
+    ADMIN_USERNAME (str): The username of the initial admin user.
+    ADMIN_PASSWORD (str): The password of the initial admin user.
+    INIT_DB_LOCK_FILE (str): The lock file, derived from the database by default.
+
+Functions:
+    init_db(): Bring the schema up to date and create the admin user, if needed.
+    create_admin_user(db, settings): Create the admin user unless it exists.
+    create_tables(): Create all database tables defined by the models.
+    upgrade_schema(): Add columns and indexes missing from existing tables.
+    backfill_identifier_keys(batch_size): Fill in the normalized login keys.
+    schema_fingerprint(engine): The SHA-256 of the DDL of the models.
+"""
+
+import contextlib
+import hashlib
 import os
+import tempfile
 
-from dotenv import load_dotenv
+from sqlalchemy import bindparam, exists, inspect, or_, select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
 
 from .base import Base
-from .db_session import SessionLocal, engine
-from .models import User
+from .config import IMPORT_BATCH_SIZE, get_settings
+from .db_session import get_engine, get_sessionmaker
+from .models import SchemaState, User, normalize_identifier
 from .utils import get_password_hash
 
-# Load environment variables
-load_dotenv()
-ADMIN_EMAIL = os.getenv("ADMIN_EMAIL")
-ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
-ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+SCHEMA_NAME = "userauth"
+SQLITE_MEMORY = (None, "", ":memory:")
+
+
+def schema_fingerprint(engine) -> str:
+    """
+    Compute the SHA-256 of the DDL of every table and index of the models.
+
+    Args:
+        engine: The engine whose dialect the DDL is compiled for.
+
+    Returns:
+        str: The hex digest, which changes whenever a model changes.
+    """
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        ddl = [CreateTable(table)]
+        ddl += [CreateIndex(index) for index in sorted(table.indexes, key=str)]
+        for statement in ddl:
+            digest.update(str(statement.compile(dialect=engine.dialect)).encode())
+    return digest.hexdigest()
+
+
+def lock_file_path(engine) -> str:
+    """the INIT_DB_LOCK_FILE, or a lock file derived from the database location"""
+    settings = get_settings()
+    if settings.init_db_lock_file:
+        return settings.init_db_lock_file
+    url = engine.url
+    if url.get_backend_name() == "sqlite" and url.database not in SQLITE_MEMORY:
+        return f"{url.database}.init.lock"
+    key = hashlib.sha256(url.render_as_string(hide_password=True).encode())
+    key = key.hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"isagog-userauth-{key[:16]}.lock")
+
+
+@contextlib.contextmanager
+def init_lock(engine):
+    """hold the cross-process lock of init_db for the duration of the block"""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_file_path(engine), "a", encoding="utf-8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def is_initialized(session, fingerprint: str, admin_email: str | None) -> bool:
+    """
+    Check that the schema matches the fingerprint and the admin user exists.
+
+    Args:
+        session (Session): A database session.
+        fingerprint (str): The fingerprint of the current models.
+        admin_email (str | None): The email of the admin user, None to skip it.
+
+    Returns:
+        bool: Whether init_db has nothing left to do.
+    """
+    try:
+        recorded = session.scalar(
+            select(SchemaState.fingerprint).where(SchemaState.name == SCHEMA_NAME)
+        )
+        if recorded != fingerprint:
+            return False
+        if admin_email is None:
+            return True
+        return session.scalar(select(exists().where(User.email == admin_email)))
+    except DBAPIError:  # the userauth_schema table does not exist yet
+        session.rollback()
+        return False
 
 
 def init_db():
     """
-    Initialize the database and create the initial admin user if it does not exist.
+    Bring the schema up to date and create the initial admin user if it does not exist.
 
     This function performs the following actions:
-    1. Creates all database tables defined by the SQLAlchemy models.
-    2. Checks if an admin user exists in the database.
+    1. Returns at once if the recorded schema fingerprint matches the models and
+       the admin user exists.
+    2. Otherwise, under the cross-process lock, checks again, creates the missing
+       tables, columns and indexes and records the new fingerprint.
     3. If no admin user exists, creates one with the credentials
        defined in the environment variables.
 
     Returns:
         None
     """
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
+    settings = get_settings()
+    engine = get_engine()
+    admin_email = settings.admin_email if settings.admin_password else None
+    fingerprint = schema_fingerprint(engine)
+    with get_sessionmaker()() as db:
+        if is_initialized(db, fingerprint, admin_email):
+            return
 
-    # Initialize the first admin user if it doesn't exist
-    db = SessionLocal()
-    try:
-        existing_user = db.query(User).filter(User.email == ADMIN_EMAIL).first()
-        if not existing_user:
-            hashed_password = get_password_hash(ADMIN_PASSWORD)
-            admin_user = User(
-                email=ADMIN_EMAIL,
-                username=ADMIN_USERNAME,
-                password=hashed_password,
-                role="admin",
-            )
-            db.add(admin_user)
+    with init_lock(engine):
+        with get_sessionmaker()() as db:
+            if is_initialized(db, fingerprint, admin_email):
+                return
+        Base.metadata.create_all(bind=engine)
+        upgrade_schema()
+        with get_sessionmaker()() as db:
+            db.merge(SchemaState(name=SCHEMA_NAME, fingerprint=fingerprint))
             db.commit()
-            db.refresh(admin_user)
-            print(
-                f"Admin user {ADMIN_USERNAME} created - email: {ADMIN_EMAIL} from .env"
-            )
-    finally:
-        db.close()
+            if admin_email is not None:
+                create_admin_user(db, settings)
+
+
+def create_admin_user(db, settings):
+    """
+    Create the admin user of the settings, unless a user has its email already.
+
+    Args:
+        db (Session): A database session.
+        settings (Settings): The settings holding the ADMIN_* credentials.
+
+    Returns:
+        None
+    """
+    if db.scalar(select(exists().where(User.email == settings.admin_email))):
+        return
+    db.add(
+        User(
+            email=settings.admin_email,
+            username=settings.admin_username,
+            password=get_password_hash(settings.admin_password),
+            role="admin",
+        )
+    )
+    try:
+        db.commit()
+    except IntegrityError:  # created meanwhile by a worker on another host
+        db.rollback()
+        return
+    print(
+        f"Admin user {settings.admin_username} created - "
+        f"email: {settings.admin_email} from .env"
+    )
 
 
 def create_tables():
@@ -64,4 +202,106 @@ def create_tables():
     Returns:
         None
     """
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+
+
+def upgrade_schema():
+    """
+    Add columns and indexes introduced after an existing database was created.
+
+    create_all only creates missing tables, so any model column missing from an
+    existing table is appended with ALTER TABLE, using its server default to
+    populate the rows already present, and any missing index is created. The
+    normalized login keys of the users are then backfilled.
+
+    Returns:
+        None
+    """
+    engine = get_engine()
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        missing_indexes = [idx for idx in table.indexes if idx.name not in indexes]
+        if not missing and not missing_indexes:
+            continue
+        table_name = engine.dialect.identifier_preparer.format_table(table)
+        with engine.begin() as connection:
+            for column in missing:
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table_name} ADD COLUMN {column_ddl}"
+                )
+            for index in missing_indexes:
+                index.create(bind=connection)
+    backfill_identifier_keys()
+
+
+def backfill_identifier_keys(batch_size: int = IMPORT_BATCH_SIZE) -> list[int]:
+    """
+    Fill in the email_key and username_key of the users missing them, e.g. in a
+    database created before these columns existed.
+
+    The users are updated batch_size at a time, in order of ID, one transaction
+    per batch. A user whose keys would collide with another user's (two emails or
+    usernames differing only in case) is left without keys, and so cannot log in
+    until one of the two is renamed; the IDs of these users are reported.
+
+    Args:
+        batch_size (int): The number of users updated per transaction.
+
+    Returns:
+        list[int]: The IDs of the users left without keys.
+    """
+    engine = get_engine()
+    users = User.__table__
+    statement = (
+        update(users)
+        .where(users.c.id == bindparam("user_id"))
+        .values(
+            email_key=bindparam("new_email_key"),
+            username_key=bindparam("new_username_key"),
+        )
+    )
+    skipped, last_id = [], 0
+    while True:
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(users.c.id, users.c.email, users.c.username)
+                .where(
+                    users.c.id > last_id,
+                    or_(users.c.email_key.is_(None), users.c.username_key.is_(None)),
+                )
+                .order_by(users.c.id)
+                .limit(batch_size)
+            ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        params = [
+            {
+                "user_id": row.id,
+                "new_email_key": normalize_identifier(row.email),
+                "new_username_key": normalize_identifier(row.username),
+            }
+            for row in rows
+        ]
+        try:
+            with engine.begin() as connection:
+                connection.execute(statement, params)
+        except IntegrityError:
+            for values in params:
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(statement, values)
+                except IntegrityError:
+                    skipped.append(values["user_id"])
+    if skipped:
+        print(
+            f"Users {skipped} clash with others ignoring case and were left without "
+            "login keys: rename them to let them log in"
+        )
+    return skipped
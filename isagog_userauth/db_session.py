@@ -6,25 +6,339 @@ to the SQLite database specified in the environment variables. It also provides
 a function to generate database sessions for use in context managers, ensuring
 that sessions are properly closed after use.
 
+Alongside the synchronous engine, an asyncio engine is built on the same database
+(through aiosqlite for SQLite URLs), so that routes can run natively on the event
+loop instead of in Starlette's threadpool. The synchronous SessionLocal and get_db
+remain available for embedders.
+
+Both engines share a production profile: a bounded connection pool suited to
+multi-threaded access and, for SQLite, pragmas applied on every new connection
+(WAL journaling, relaxed fsync, a busy timeout and larger page/mmap caches) so
+that readers are not blocked by concurrent signup or password change writes.
+
+The engines are built on first use rather than on import, so that importing the
+package (or forking workers after importing it) opens no connection pool. The
+module attributes engine, SessionLocal, async_engine and AsyncSessionLocal are
+still available and resolve to the lazily built objects.
+
+Reads that tolerate a little replication lag (token validation, the current user
+lookup, /user/list and introspection) use the read sessions of get_read_db and
+get_async_read_db. They are bound to USER_READ_DB_URL when it is set, e.g. a
+replica or a read-only copy of a SQLite database, and to the primary otherwise.
+Every write, and every read that must see the latest writes (login, refresh,
+signup, ...), uses get_db / get_async_db on the primary. Read engines on SQLite
+open their connections with the query_only pragma and leave the journal mode
+and synchronous pragmas of the primary alone.
+
 Functions:
+    async_database_url(url): Map a synchronous database URL to its asyncio driver.
+    engine_options(url, use_asyncio): Build the pool arguments for an engine.
+    apply_sqlite_pragmas(dbapi_connection, connection_record): Tune a SQLite connection.
+    build_engine(url, read_only): Build a synchronous engine with the pool profile.
+    build_async_engine(url, read_only): Build an asyncio engine with the pool profile.
+    get_engine(): Return the synchronous engine, building it on first use.
+    get_sessionmaker(): Return the synchronous session factory.
+    get_async_engine(): Return the asyncio engine, building it on first use.
+    get_async_sessionmaker(): Return the asyncio session factory.
+    get_read_sessionmaker(): Return the synchronous read session factory.
+    get_async_read_sessionmaker(): Return the asyncio read session factory.
     get_db(): Generate a database session for use in context managers.
+    get_async_db(): Generate an asyncio database session for use in async dependencies.
+    get_read_db(): Generate a read session, on the replica if there is one.
+    get_async_read_db(): Generate an asyncio read session, on the replica if any.
 
 Environment Variables:
     USER_DB_URL (str): The database URL for connecting to the SQLite database.
+    USER_ASYNC_DB_URL (str): Optional asyncio database URL, derived from USER_DB_URL
+    when unset.
+    USER_READ_DB_URL (str): Optional database URL of the read sessions, e.g. a replica.
+    USER_ASYNC_READ_DB_URL (str): Optional asyncio read URL, derived from
+    USER_READ_DB_URL when unset.
+    DB_POOL_CLASS (str): "queue" (default) for a bounded pool, "null" to disable pooling.
+    DB_POOL_SIZE (int): Connections kept open in the pool.
+    DB_MAX_OVERFLOW (int): Extra connections allowed beyond DB_POOL_SIZE under load.
+    DB_POOL_TIMEOUT (float): Seconds to wait for a pooled connection.
+    SQLITE_JOURNAL_MODE (str): SQLite journal_mode pragma, WAL by default.
+    SQLITE_SYNCHRONOUS (str): SQLite synchronous pragma, NORMAL by default.
+    SQLITE_BUSY_TIMEOUT (int): SQLite busy_timeout pragma in milliseconds.
+    SQLITE_CACHE_SIZE (int): SQLite cache_size pragma (negative values are KiB).
+    SQLITE_MMAP_SIZE (int): SQLite mmap_size pragma in bytes.
+    An empty SQLITE_* value leaves the SQLite default for that pragma.
 """
 
-import os
+from functools import lru_cache
 
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from .config import get_settings
+from .metrics import db_session_wait_seconds, instrument_engine, timed
+
+# asyncio drivers used when USER_ASYNC_DB_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Map a synchronous database URL to the equivalent asyncio driver URL.
+
+    Args:
+        url (str): A database URL such as "sqlite:///./users.db".
+
+    Returns:
+        str: The URL with an asyncio driver, e.g. "sqlite+aiosqlite:///./users.db".
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or parsed.drivername in ASYNC_DRIVERS.values():
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def database_urls() -> tuple[str, str]:
+    """the synchronous and asyncio database URLs of the settings"""
+    settings = get_settings()
+    url = settings.user_db_url
+    return url, settings.user_async_db_url or async_database_url(url)
+
+
+def read_database_urls() -> tuple[str, str] | None:
+    """the synchronous and asyncio replica URLs, or None to read from the primary"""
+    settings = get_settings()
+    url = settings.user_read_db_url
+    if not url:
+        return None
+    return url, settings.user_async_read_db_url or async_database_url(url)
+
+
+def sqlite_pragmas(read_only: bool = False) -> dict:
+    """the pragmas applied, in this order, on every new SQLite connection"""
+    settings = get_settings()
+    if read_only:
+        return {
+            "busy_timeout": settings.sqlite_busy_timeout,
+            "query_only": "ON",
+            "cache_size": settings.sqlite_cache_size,
+            "mmap_size": settings.sqlite_mmap_size,
+        }
+    return {
+        "busy_timeout": settings.sqlite_busy_timeout,
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+    }
+
+
+def engine_options(url: str, use_asyncio: bool = False) -> dict:
+    """
+    Build the pool arguments for an engine bound to the given URL.
+
+    In-memory SQLite databases live in a single connection, so they keep the
+    pool SQLAlchemy picks for them; every other database gets a bounded pool.
+
+    Args:
+        url (str): The database URL.
+        use_asyncio (bool): Whether the engine is an asyncio engine.
+
+    Returns:
+        dict: Keyword arguments for create_engine / create_async_engine.
+
+    Raises:
+        ValueError: If DB_POOL_CLASS is neither "queue" nor "null".
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (
+        None,
+        "",
+        ":memory:",
+    ):
+        return {}
+    settings = get_settings()
+    if settings.db_pool_class == "null":
+        return {"poolclass": NullPool}
+    if settings.db_pool_class != "queue":
+        raise ValueError(f"Invalid DB_POOL_CLASS: {settings.db_pool_class!r}")
+    return {
+        "poolclass": AsyncAdaptedQueuePool if use_asyncio else QueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+    }
+
+
+def apply_sqlite_pragmas(  # pylint: disable=W0613
+    dbapi_connection, connection_record, read_only: bool = False
+):
+    """
+    Apply the SQLITE_* pragmas profile to a newly opened SQLite connection.
+
+    Args:
+        dbapi_connection: The DBAPI connection that was just opened.
+        connection_record: The pool record of the connection (unused).
+        read_only (bool): Whether the connection belongs to a read engine.
+
+    Returns:
+        None
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas(read_only).items():
+            if value:
+                cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def apply_read_only_sqlite_pragmas(dbapi_connection, connection_record):
+    """apply_sqlite_pragmas for the connections of a read engine"""
+    apply_sqlite_pragmas(dbapi_connection, connection_record, read_only=True)
+
+
+def _prepare(engine, read_only: bool):
+    """register the SQLite pragmas and the query timing on a new engine"""
+    if engine.dialect.name == "sqlite":
+        listener = apply_read_only_sqlite_pragmas if read_only else apply_sqlite_pragmas
+        event.listen(engine, "connect", listener)
+    instrument_engine(engine)
+    return engine
+
+
+def build_engine(url: str, read_only: bool = False):
+    """
+    Build a synchronous engine with the pool profile and the SQLite pragmas.
+
+    Args:
+        url (str): The database URL.
+        read_only (bool): Whether the engine only serves reads (e.g. a replica).
+
+    Returns:
+        Engine: The new engine.
+    """
+    return _prepare(create_engine(url, **engine_options(url)), read_only)
+
+
+def build_async_engine(url: str, read_only: bool = False):
+    """
+    Build an asyncio engine with the pool profile and the SQLite pragmas.
+
+    Args:
+        url (str): The asyncio database URL.
+        read_only (bool): Whether the engine only serves reads (e.g. a replica).
+
+    Returns:
+        AsyncEngine: The new engine.
+    """
+    engine = create_async_engine(url, **engine_options(url, use_asyncio=True))
+    _prepare(engine.sync_engine, read_only)
+    return engine
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """
+    Return the synchronous engine, building it on first use.
+
+    Returns:
+        Engine: The engine bound to USER_DB_URL.
+    """
+    url, _ = database_urls()
+    return build_engine(url)
+
+
+@lru_cache(maxsize=1)
+def get_sessionmaker():
+    """
+    Return the synchronous session factory, bound to get_engine().
+
+    Returns:
+        sessionmaker: The session factory.
+    """
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+@lru_cache(maxsize=1)
+def get_async_engine():
+    """
+    Return the asyncio engine, building it on first use.
+
+    Returns:
+        AsyncEngine: The engine bound to USER_ASYNC_DB_URL.
+    """
+    _, url = database_urls()
+    return build_async_engine(url)
+
+
+@lru_cache(maxsize=1)
+def get_async_sessionmaker():
+    """
+    Return the asyncio session factory, bound to get_async_engine().
+
+    Returns:
+        async_sessionmaker: The session factory.
+    """
+    return async_sessionmaker(
+        bind=get_async_engine(), autoflush=False, expire_on_commit=False
+    )
 
-# Load environment variables
-load_dotenv()
-DATABASE_URL = os.getenv("USER_DB_URL")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@lru_cache(maxsize=1)
+def get_read_sessionmaker():
+    """
+    Return the synchronous read session factory.
+
+    Returns:
+        sessionmaker: A factory bound to a read-only USER_READ_DB_URL engine, or
+        get_sessionmaker() when no replica is configured.
+    """
+    urls = read_database_urls()
+    if urls is None:
+        return get_sessionmaker()
+    return sessionmaker(
+        autocommit=False, autoflush=False, bind=build_engine(urls[0], read_only=True)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_read_sessionmaker():
+    """
+    Return the asyncio read session factory.
+
+    Returns:
+        async_sessionmaker: A factory bound to a read-only USER_ASYNC_READ_DB_URL
+        engine, or get_async_sessionmaker() when no replica is configured.
+    """
+    urls = read_database_urls()
+    if urls is None:
+        return get_async_sessionmaker()
+    return async_sessionmaker(
+        bind=build_async_engine(urls[1], read_only=True),
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+    "DATABASE_URL": lambda: database_urls()[0],
+    "ASYNC_DATABASE_URL": lambda: database_urls()[1],
+}
+
+
+def __getattr__(name: str):
+    """resolve engine, SessionLocal, async_engine and AsyncSessionLocal lazily"""
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_db():
@@ -33,13 +347,63 @@ def get_db():
 
     This function creates a new SQLAlchemy session and yields it for use
     in database operations. The session is automatically closed after use.
+    Its connection is checked out upfront, so that the wait for a pooled
+    connection is recorded in the isagog_db_session_wait_seconds metric.
+
+    Yields:
+        Session: An SQLAlchemy database session.
+    """
+
+    db = get_sessionmaker()()
+    try:
+        with timed(db_session_wait_seconds.labels("sync")):
+            db.connection()
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """
+    Generate an asyncio database session for use in async dependencies.
+
+    Yields:
+        AsyncSession: An SQLAlchemy asyncio database session.
+    """
+
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+def get_read_db():
+    """
+    Generate a read session, on the replica when USER_READ_DB_URL is set.
+
+    Only use it for reads that tolerate replication lag; its connection is
+    checked out upfront, as in get_db.
 
     Yields:
         Session: An SQLAlchemy database session.
     """
 
-    db = SessionLocal()
+    db = get_read_sessionmaker()()
     try:
+        with timed(db_session_wait_seconds.labels("sync_read")):
+            db.connection()
         yield db
     finally:
         db.close()
+
+
+async def get_async_read_db():
+    """
+    Generate an asyncio read session, on the replica when USER_READ_DB_URL is set.
+
+    Only use it for reads that tolerate replication lag.
+
+    Yields:
+        AsyncSession: An SQLAlchemy asyncio database session.
+    """
+
+    async with get_async_read_sessionmaker()() as db:
+        yield db
@@ -0,0 +1,350 @@
+"""
+Password hashers.
+
+The CPU (and memory) cost of verifying one password is what bounds the login
+throughput of a host, so it is configurable instead of being fixed by the
+library defaults. New hashes are created with PASSWORD_HASHER and its cost
+parameters, while stored hashes are verified by the hasher their prefix
+identifies, so a database can hold a mix of schemes and costs. After a
+successful login, a hash made with another scheme or outdated parameters is
+replaced transparently (see password_needs_rehash).
+
+Passwords are peppered with BCRYPT_PEPPER before hashing, whatever the scheme.
+
+Environment Variables:
+    PASSWORD_HASHER (str): "bcrypt" (default), "argon2id" or "scrypt".
+    BCRYPT_ROUNDS (int): The bcrypt log2 cost factor.
+    ARGON2_TIME_COST (int): The argon2id number of passes.
+    ARGON2_MEMORY_COST (int): The argon2id memory in KiB.
+    ARGON2_PARALLELISM (int): The argon2id number of lanes.
+    SCRYPT_LOG_N (int): The scrypt log2 CPU/memory cost.
+    SCRYPT_R (int): The scrypt block size.
+    SCRYPT_P (int): The scrypt parallelization factor.
+
+Classes:
+    BcryptHasher: bcrypt, "$2b$<rounds>$..." hashes.
+    Argon2Hasher: argon2id through argon2-cffi, "$argon2id$..." hashes.
+    ScryptHasher: scrypt from hashlib, "$scrypt$ln=...,r=...,p=...$..." hashes.
+
+Functions:
+    get_hasher(name, **params): Build a hasher, by default with the configured costs.
+    default_hasher(): Return the hasher of new passwords.
+    identify_hasher(hashed): Return a hasher able to verify a stored hash.
+    calibrate(name, target_ms): Find the cost parameters matching a verify latency.
+    main(argv): Command-line entry point to calibrate the hashers on this host.
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import time
+from functools import lru_cache
+
+import bcrypt
+
+from .config import (ARGON2_MEMORY_COST, ARGON2_PARALLELISM, ARGON2_TIME_COST,
+                     BCRYPT_ROUNDS, PASSWORD_HASHER, PASSWORD_POOL_SIZE,
+                     SCRYPT_LOG_N, SCRYPT_P, SCRYPT_R)
+
+
+def _argon2():
+    """import argon2-cffi, needed by the argon2id hasher"""
+    try:
+        import argon2  # pylint: disable=C0415
+    except ImportError as exc:
+        raise RuntimeError(
+            "The argon2id hasher requires the argon2-cffi package "
+            "(pip install argon2-cffi)"
+        ) from exc
+    return argon2
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+class BcryptHasher:
+    """
+    bcrypt, the historical scheme of this package.
+
+    Attributes:
+        rounds (int): The log2 cost factor of new hashes.
+    """
+
+    name = "bcrypt"
+    prefixes = ("$2a$", "$2b$", "$2y$")
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS):
+        self.rounds = rounds
+
+    def hash(self, password: bytes) -> str:
+        """hash a password with a new salt"""
+        return bcrypt.hashpw(password, bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    def verify(self, password: bytes, hashed: str) -> bool:
+        """tell whether a password matches a hash of this scheme"""
+        return bcrypt.checkpw(password, hashed.encode("utf-8"))
+
+    def needs_update(self, hashed: str) -> bool:
+        """tell whether a hash of this scheme was made with other parameters"""
+        return int(hashed.split("$")[2]) != self.rounds
+
+
+class Argon2Hasher:
+    """
+    argon2id, memory-hard, through the optional argon2-cffi package.
+
+    Attributes:
+        time_cost (int): The number of passes.
+        memory_cost (int): The memory in KiB.
+        parallelism (int): The number of lanes.
+    """
+
+    name = "argon2id"
+    prefixes = ("$argon2id$",)
+
+    def __init__(
+        self,
+        time_cost: int = ARGON2_TIME_COST,
+        memory_cost: int = ARGON2_MEMORY_COST,
+        parallelism: int = ARGON2_PARALLELISM,
+    ):
+        self.time_cost = time_cost
+        self.memory_cost = memory_cost
+        self.parallelism = parallelism
+        self._hasher = _argon2().PasswordHasher(
+            time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+        )
+
+    def hash(self, password: bytes) -> str:
+        """hash a password with a new salt"""
+        return self._hasher.hash(password)
+
+    def verify(self, password: bytes, hashed: str) -> bool:
+        """tell whether a password matches a hash of this scheme, False if malformed"""
+        exceptions = _argon2().exceptions
+        try:
+            return self._hasher.verify(hashed, password)
+        except (exceptions.VerificationError, exceptions.InvalidHashError):
+            return False
+
+    def needs_update(self, hashed: str) -> bool:
+        """tell whether a hash of this scheme was made with other parameters"""
+        return self._hasher.check_needs_rehash(hashed)
+
+
+class ScryptHasher:
+    """
+    scrypt from the standard library, in the "$scrypt$ln=,r=,p=$salt$hash" format.
+
+    Attributes:
+        log_n (int): The log2 CPU/memory cost.
+        r (int): The block size.
+        p (int): The parallelization factor.
+    """
+
+    name = "scrypt"
+    prefixes = ("$scrypt$",)
+    salt_size = 16
+    key_size = 32
+
+    def __init__(self, log_n: int = SCRYPT_LOG_N, r: int = SCRYPT_R, p: int = SCRYPT_P):
+        self.log_n = log_n
+        self.r = r  # pylint: disable=C0103
+        self.p = p  # pylint: disable=C0103
+
+    @staticmethod
+    def _derive(password: bytes, salt: bytes, log_n: int, r: int, p: int, size: int):
+        n = 1 << log_n
+        # hashlib refuses to allocate more than maxmem, 32 MiB by default
+        maxmem = 128 * r * (n + p + 2) + 1024 * 1024
+        return hashlib.scrypt(
+            password, salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=size
+        )
+
+    @staticmethod
+    def _parse(hashed: str) -> tuple[dict, bytes, bytes]:
+        _, _, settings, salt, key = hashed.split("$")
+        params = dict(item.split("=") for item in settings.split(","))
+        return {k: int(v) for k, v in params.items()}, _b64decode(salt), _b64decode(key)
+
+    def hash(self, password: bytes) -> str:
+        """hash a password with a new salt"""
+        salt = os.urandom(self.salt_size)
+        key = self._derive(password, salt, self.log_n, self.r, self.p, self.key_size)
+        return (
+            f"$scrypt$ln={self.log_n},r={self.r},p={self.p}"
+            f"${_b64encode(salt)}${_b64encode(key)}"
+        )
+
+    def verify(self, password: bytes, hashed: str) -> bool:
+        """tell whether a password matches a hash of this scheme, False if malformed"""
+        try:
+            params, salt, key = self._parse(hashed)
+            derived = self._derive(
+                password, salt, params["ln"], params["r"], params["p"], len(key)
+            )
+        except (KeyError, ValueError):  # binascii.Error is a ValueError
+            return False
+        return hmac.compare_digest(derived, key)
+
+    def needs_update(self, hashed: str) -> bool:
+        """tell whether a hash of this scheme was made with other parameters"""
+        params, _, _ = self._parse(hashed)
+        return params != {"ln": self.log_n, "r": self.r, "p": self.p}
+
+
+HASHERS = {
+    hasher.name: hasher for hasher in (BcryptHasher, Argon2Hasher, ScryptHasher)
+}
+
+
+def get_hasher(name: str, **params):
+    """
+    Build a hasher by scheme name.
+
+    Args:
+        name (str): "bcrypt", "argon2id" or "scrypt".
+        **params: Cost parameters overriding the configured ones.
+
+    Returns:
+        The hasher.
+
+    Raises:
+        ValueError: If the scheme is unknown.
+    """
+    if name not in HASHERS:
+        raise ValueError(f"Unknown password hasher: {name!r}")
+    return HASHERS[name](**params)
+
+
+@lru_cache(maxsize=1)
+def default_hasher():
+    """
+    Return the hasher of new passwords, built from PASSWORD_HASHER on first use.
+
+    Returns:
+        The configured hasher.
+    """
+    return get_hasher(PASSWORD_HASHER)
+
+
+@lru_cache(maxsize=None)
+def _hasher_by_name(name: str):
+    """the hasher of a scheme with the configured parameters, built once"""
+    if name == default_hasher().name:
+        return default_hasher()
+    return get_hasher(name)
+
+
+def identify_hasher(hashed: str):
+    """
+    Return a hasher able to verify a stored hash, chosen by its prefix.
+
+    Args:
+        hashed (str): The stored hash.
+
+    Returns:
+        The hasher of the hash scheme.
+
+    Raises:
+        ValueError: If no hasher recognizes the hash.
+    """
+    for name, hasher in HASHERS.items():
+        if hashed.startswith(hasher.prefixes):
+            return _hasher_by_name(name)
+    raise ValueError("Unknown password hash format")
+
+
+def _time_verify(hasher, repeat: int = 3) -> float:
+    """the best verify time of a hasher over a few attempts, in milliseconds"""
+    hashed = hasher.hash(b"calibration password")
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher.verify(b"calibration password", hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def calibrate(name: str, target_ms: float) -> tuple[dict, float]:
+    """
+    Find the highest cost whose verify time on this host stays within target_ms.
+
+    The cost factor doubled at each step is bcrypt rounds, scrypt log_n, or the
+    argon2id time cost (memory and parallelism are kept as configured).
+
+    Args:
+        name (str): "bcrypt", "argon2id" or "scrypt".
+        target_ms (float): The verify latency to aim for, in milliseconds.
+
+    Returns:
+        tuple: The recommended parameters, and their measured verify time in ms.
+    """
+    if name == "bcrypt":
+        steps = ({"rounds": rounds} for rounds in range(4, 32))
+    elif name == "scrypt":
+        steps = ({"log_n": log_n} for log_n in range(10, 25))
+    elif name == "argon2id":
+        steps = ({"time_cost": cost} for cost in range(1, 64))
+    else:
+        raise ValueError(f"Unknown password hasher: {name!r}")
+
+    best, best_ms = None, None
+    for params in steps:
+        elapsed = _time_verify(get_hasher(name, **params))
+        if best is not None and elapsed > target_ms:
+            break
+        best, best_ms = params, elapsed
+        if elapsed > target_ms:
+            break  # even the cheapest setting misses the target
+    return best, best_ms
+
+
+ENVIRONMENT_NAMES = {
+    "rounds": "BCRYPT_ROUNDS",
+    "log_n": "SCRYPT_LOG_N",
+    "time_cost": "ARGON2_TIME_COST",
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Calibrate a password hasher on this host and print the recommended settings.
+
+    Args:
+        argv (list[str], optional): The command-line arguments.
+
+    Returns:
+        int: The process exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Recommend password hashing costs for a target verify latency."
+    )
+    parser.add_argument("--hasher", choices=list(HASHERS), default=PASSWORD_HASHER)
+    parser.add_argument(
+        "--target-ms", type=float, default=250.0, help="verify latency to aim for"
+    )
+    args = parser.parse_args(argv)
+    params, elapsed = calibrate(args.hasher, args.target_ms)
+    workers = PASSWORD_POOL_SIZE or os.cpu_count() or 1
+    print(f"PASSWORD_HASHER={args.hasher}")
+    for key, value in params.items():
+        print(f"{ENVIRONMENT_NAMES[key]}={value}")
+    print(
+        f"# {elapsed:.0f} ms per verify, about {workers * 1000 / elapsed:.0f} "
+        f"logins/s on a password pool of {workers}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
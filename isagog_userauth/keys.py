@@ -0,0 +1,425 @@
+"""
+JWT signing and verification keys.
+
+By default tokens are signed with HS256 and the shared JWT_SECRET. Setting
+JWT_ALGORITHM to EdDSA or ES256 switches to asymmetric signing: private keys
+are loaded from JWT_KEYS_DIR, every token carries the "kid" of the key that
+signed it, and verification looks that key up directly instead of trying each
+one in turn. The public keys are published at /.well-known/jwks.json, so that
+other services can verify tokens locally without sharing a secret.
+
+To rotate, add the new key to JWT_KEYS_DIR and restart: it is published in the
+JWKS right away while JWT_ACTIVE_KID keeps signing with the current key. Once
+the JWKS caches of downstream services have expired, point JWT_ACTIVE_KID at the
+new key. The retired key can later be reduced to its public half, or removed
+once all the tokens it signed have expired.
+
+HS256 tokens are encoded and verified by HS256Codec rather than by PyJWT: the
+header segment and the keyed HMAC state are computed once, and the claims are
+serialized by a preconfigured encoder, while producing the very same bytes as
+jwt.encode. Tokens whose header differs from the codec's (e.g. issued by another
+library) are handed to jwt.decode, which only accepts HS256.
+
+Environment Variables:
+    JWT_ALGORITHM (str): "HS256" (default), "EdDSA" or "ES256".
+    JWT_KEYS_DIR (str): Directory of PEM keys, "<kid>.pem" for private keys and
+    "<kid>.pub.pem" for public keys that only verify.
+    JWT_ACTIVE_KID (str): The kid of the private key that signs new tokens.
+    JWKS_MAX_AGE (int): The Cache-Control max-age of the JWKS in seconds.
+
+Classes:
+    HS256Codec: Encode and verify HS256 tokens with precomputed state.
+    KeySet: The signing key and the verification keys indexed by kid.
+
+Functions:
+    get_keyset(): Return the KeySet built from the environment.
+    generate_key(algorithm): Generate a new private key in PEM format.
+    main(argv): Command-line entry point to generate keys.
+"""
+
+import argparse
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from calendar import timegm
+from datetime import datetime
+from functools import cached_property, lru_cache
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+from .config import JWT_ACTIVE_KID, JWT_ALGORITHM, JWT_KEYS_DIR, JWT_SECRET
+from .metrics import jwt_seconds, timed
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+TIME_CLAIMS = ("exp", "iat", "nbf")
+
+
+def _serialization():
+    """import the cryptography serialization module, needed by asymmetric keys"""
+    try:
+        # pylint: disable=C0415
+        from cryptography.hazmat.primitives import serialization
+    except ImportError as exc:
+        raise RuntimeError(
+            "Asymmetric JWT signing requires the cryptography package "
+            "(pip install 'pyjwt[crypto]')"
+        ) from exc
+    return serialization
+
+
+def _b64encode(data: bytes) -> bytes:
+    """unpadded base64url, as in JWS"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    """decode unpadded base64url"""
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _int_claim(payload: dict, claim: str, error: type) -> int:
+    """the integer value of a time claim, as jwt.decode reads it"""
+    try:
+        return int(payload[claim])
+    except (ValueError, TypeError, OverflowError):
+        raise error(f"The {claim} claim must be an integer.") from None
+
+
+class HS256Codec:
+    """
+    Encode and verify HS256 tokens byte-for-byte like PyJWT, only faster.
+
+    jwt.encode copies the claims, serializes and encodes the constant header and
+    keys a new HMAC for every token. Here the header segment and the keyed HMAC
+    state are computed once, each token copying the state, and the claims are
+    serialized by a JSONEncoder configured once. decode checks the header
+    segment against the precomputed one, which rules out algorithm confusion,
+    before the signature, then validates the registered claims as jwt.decode
+    does with its default options; other tokens are passed on to jwt.decode.
+
+    Attributes:
+        secret (str): The shared secret.
+    """
+
+    HEADER = {"alg": "HS256", "typ": "JWT"}
+
+    def __init__(self, secret: str):
+        self.secret = secret
+        self._mac = hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+        self._json = json.JSONEncoder(separators=(",", ":"))
+        self._header = _b64encode(
+            json.dumps(self.HEADER, separators=(",", ":"), sort_keys=True).encode()
+        )
+        self._prefix = self._header + b"."
+
+    def _signature(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return _b64encode(mac.digest())
+
+    def encode(self, payload: dict) -> str:
+        """
+        Encode and sign a payload.
+
+        Args:
+            payload (dict): The claims. datetime values of exp, iat and nbf are
+            converted to timestamps, as jwt.encode does.
+
+        Returns:
+            str: The encoded JWT token, identical to jwt.encode's.
+        """
+        for claim in TIME_CLAIMS:
+            if isinstance(payload.get(claim), datetime):
+                payload = {
+                    **payload,
+                    claim: timegm(payload[claim].utctimetuple()),
+                }
+        signing_input = self._prefix + _b64encode(
+            self._json.encode(payload).encode("utf-8")
+        )
+        return (signing_input + b"." + self._signature(signing_input)).decode()
+
+    def encode_many(self, payloads) -> list[str]:
+        """
+        Encode and sign several payloads, e.g. an access and refresh token pair.
+
+        Args:
+            payloads (Iterable[dict]): The claims of every token.
+
+        Returns:
+            list[str]: The encoded JWT tokens, in order.
+        """
+        return [self.encode(payload) for payload in payloads]
+
+    def decode(self, token: str) -> dict:
+        """
+        Verify a token and return its claims.
+
+        Args:
+            token (str): The encoded JWT token.
+
+        Returns:
+            dict: The verified token payload.
+
+        Raises:
+            jwt.PyJWTError: If the token is malformed, not signed with HS256 and
+            the secret, expired, or its claims are invalid.
+        """
+        try:
+            header, payload, signature = token.encode("ascii").split(b".")
+        except (AttributeError, UnicodeEncodeError, ValueError):
+            raise jwt.DecodeError("Not a well formed token") from None
+        if header != self._header:
+            return jwt.decode(token, self.secret, algorithms=["HS256"])
+        if not hmac.compare_digest(
+            self._signature(header + b"." + payload), signature
+        ):
+            raise jwt.InvalidSignatureError("Signature verification failed")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except (binascii.Error, ValueError):
+            raise jwt.DecodeError("Invalid payload") from None
+        if not isinstance(claims, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        if "aud" in claims or "nbf" in claims:
+            # rarely set by this service: let PyJWT apply its rules
+            return jwt.decode(token, self.secret, algorithms=["HS256"])
+        self._validate(claims)
+        return claims
+
+    @staticmethod
+    def _validate(claims: dict):
+        """check the registered claims like jwt.decode's default options do"""
+        now = time.time()
+        if "iat" in claims:
+            if _int_claim(claims, "iat", jwt.InvalidIssuedAtError) > now:
+                raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+        if "exp" in claims:
+            if _int_claim(claims, "exp", jwt.DecodeError) <= now:
+                raise jwt.ExpiredSignatureError("Signature has expired")
+        if "sub" in claims and not isinstance(claims["sub"], str):
+            raise jwt.InvalidTokenError("Subject must be a string")
+        if "jti" in claims and not isinstance(claims["jti"], str):
+            raise jwt.InvalidTokenError("JWT ID must be a string")
+
+
+class KeySet:
+    """
+    The key that signs new tokens and the keys that verify them, indexed by kid.
+
+    Attributes:
+        algorithm (str): The JWT signing algorithm.
+        signing_kid (str | None): The kid put in the header of new tokens.
+        signing_key: The key that signs new tokens.
+        verification_keys (dict): The verification keys indexed by kid.
+        codec (HS256Codec | None): The codec of an HS256 shared secret.
+    """
+
+    def __init__(self, algorithm, signing_kid, signing_key, verification_keys):
+        self.algorithm = algorithm
+        self.signing_kid = signing_kid
+        self.signing_key = signing_key
+        self.verification_keys = verification_keys
+        self.codec = HS256Codec(signing_key) if algorithm == "HS256" else None
+
+    @classmethod
+    def from_secret(cls, secret: str) -> "KeySet":
+        """
+        Build the HS256 key set of a shared secret.
+
+        Args:
+            secret (str): The shared secret.
+
+        Returns:
+            KeySet: A key set that signs and verifies with the secret.
+        """
+        return cls("HS256", None, secret, {None: secret})
+
+    @classmethod
+    def from_directory(cls, algorithm: str, directory: str, active_kid: str):
+        """
+        Load the PEM keys of a directory.
+
+        Args:
+            algorithm (str): "EdDSA" or "ES256".
+            directory (str): The directory of "<kid>.pem" and "<kid>.pub.pem" files.
+            active_kid (str): The kid of the private key that signs new tokens.
+
+        Returns:
+            KeySet: A key set that signs with active_kid and verifies with every key.
+
+        Raises:
+            ValueError: If the algorithm is unsupported or the active key is missing.
+        """
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported JWT_ALGORITHM: {algorithm!r}")
+        serialization = _serialization()
+        private_keys, verification_keys = {}, {}
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), "rb") as file:
+                data = file.read()
+            if name.endswith(".pub.pem"):
+                kid = name[: -len(".pub.pem")]
+                verification_keys[kid] = serialization.load_pem_public_key(data)
+            elif name.endswith(".pem"):
+                kid = name[: -len(".pem")]
+                private_keys[kid] = serialization.load_pem_private_key(data, None)
+                verification_keys[kid] = private_keys[kid].public_key()
+        if active_kid not in private_keys:
+            raise ValueError(f"No private key {active_kid}.pem in {directory}")
+        return cls(algorithm, active_kid, private_keys[active_kid], verification_keys)
+
+    def sign(self, payload: dict) -> str:
+        """
+        Sign a payload with the active key.
+
+        Args:
+            payload (dict): The claims to encode.
+
+        Returns:
+            str: The encoded JWT token.
+        """
+        with timed(jwt_seconds.labels("encode")):
+            return self._encode(payload)
+
+    def sign_many(self, payloads) -> list[str]:
+        """
+        Sign several payloads with the active key, e.g. an access and refresh
+        token pair, observed as a single "encode_many" duration.
+
+        Args:
+            payloads (Iterable[dict]): The claims of every token.
+
+        Returns:
+            list[str]: The encoded JWT tokens, in order.
+        """
+        with timed(jwt_seconds.labels("encode_many")):
+            if self.codec is not None:
+                return self.codec.encode_many(payloads)
+            return [self._encode(payload) for payload in payloads]
+
+    def _encode(self, payload: dict) -> str:
+        if self.codec is not None:
+            return self.codec.encode(payload)
+        headers = {"kid": self.signing_kid} if self.signing_kid else None
+        return jwt.encode(
+            payload, self.signing_key, algorithm=self.algorithm, headers=headers
+        )
+
+    def verify(self, token: str) -> dict:
+        """
+        Verify a token with the key named by its "kid" header.
+
+        Only the configured algorithm is accepted, so a token whose header asks
+        for another one (e.g. HS256 keyed with a public key) is rejected.
+
+        Args:
+            token (str): The encoded JWT token.
+
+        Returns:
+            dict: The verified token payload.
+
+        Raises:
+            jwt.PyJWTError: If the token is invalid, expired or names an unknown key.
+        """
+        if self.codec is not None:
+            with timed(jwt_seconds.labels("decode")):
+                return self.codec.decode(token)
+        kid = None
+        if self.signing_kid is not None:
+            kid = jwt.get_unverified_header(token).get("kid")
+        key = self.verification_keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown key id: {kid!r}")
+        with timed(jwt_seconds.labels("decode")):
+            return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    @cached_property
+    def jwks(self) -> bytes:
+        """the JSON Web Key Set of the public keys, empty for a shared secret"""
+        keys = []
+        if self.algorithm in ASYMMETRIC_ALGORITHMS:
+            algorithm = get_default_algorithms()[self.algorithm]
+            for kid, key in self.verification_keys.items():
+                jwk = algorithm.to_jwk(key, as_dict=True)
+                keys.append({**jwk, "kid": kid, "alg": self.algorithm, "use": "sig"})
+        return json.dumps({"keys": keys}, separators=(",", ":")).encode("utf-8")
+
+    @cached_property
+    def jwks_etag(self) -> str:
+        """a strong ETag of the JSON Web Key Set"""
+        return '"' + hashlib.sha256(self.jwks).hexdigest()[:32] + '"'
+
+
+@lru_cache(maxsize=1)
+def get_keyset() -> KeySet:
+    """
+    Return the KeySet built from the environment, loading it on first use.
+
+    Returns:
+        KeySet: The HS256 key set of JWT_SECRET, or the keys of JWT_KEYS_DIR.
+    """
+    if JWT_ALGORITHM == "HS256":
+        return KeySet.from_secret(JWT_SECRET)
+    return KeySet.from_directory(JWT_ALGORITHM, JWT_KEYS_DIR, JWT_ACTIVE_KID)
+
+
+def generate_key(algorithm: str) -> bytes:
+    """
+    Generate a new private key in PEM format.
+
+    Args:
+        algorithm (str): "EdDSA" (Ed25519) or "ES256" (P-256).
+
+    Returns:
+        bytes: The PKCS8 PEM encoding of the key.
+    """
+    serialization = _serialization()
+    # pylint: disable=C0415
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+    if algorithm == "EdDSA":
+        key = ed25519.Ed25519PrivateKey.generate()
+    elif algorithm == "ES256":
+        key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        raise ValueError(f"Unsupported algorithm: {algorithm!r}")
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Generate a signing key named <kid>.pem in JWT_KEYS_DIR (or --dir).
+
+    Args:
+        argv (list[str], optional): The command-line arguments.
+
+    Returns:
+        int: The process exit status.
+    """
+    parser = argparse.ArgumentParser(description="Generate a JWT signing key.")
+    parser.add_argument("kid", help="the key id, also used as the file name")
+    parser.add_argument("--algorithm", choices=ASYMMETRIC_ALGORITHMS, default="EdDSA")
+    parser.add_argument("--dir", default=JWT_KEYS_DIR, help="the keys directory")
+    args = parser.parse_args(argv)
+    os.makedirs(args.dir, exist_ok=True)
+    path = os.path.join(args.dir, f"{args.kid}.pem")
+    with open(path, "xb") as file:
+        file.write(generate_key(args.algorithm))
+    os.chmod(path, 0o600)
+    print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,41 +2,65 @@
     and authorization procedures and shows how to import them
 """
 
+import asyncio
+import contextlib
 from contextlib import \
     asynccontextmanager  # to implement a FastAPI ligetime event
 
 from fastapi import Depends, FastAPI
 
+from isagog_userauth.api_keys import get_current_user_or_api_key
+from isagog_userauth.audit import audit_log, run_audit_writer
 from isagog_userauth.database import init_db
-from isagog_userauth.routers import user
-from isagog_userauth.utils import get_admin_user, get_current_user
+from isagog_userauth.db_session import get_async_sessionmaker
+from isagog_userauth.password_pool import shutdown_password_pool
+from isagog_userauth.profiling import ProfilingMiddleware
+from isagog_userauth.revocation import run_revocation_sync
+from isagog_userauth.routers import api_keys, jwks, metrics, profiles, user
+from isagog_userauth.utils import get_admin_user_async
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # pylint: disable=W0621,W0613
-    """upon startup verify the database is created and populated"""
+    """upon startup verify the database is created and populated,
+    keep the token revocation denylist in sync while serving
+    and write the audit log behind, draining it on shutdown"""
     init_db()
+    session_factory = get_async_sessionmaker()
+    revocation_sync = asyncio.create_task(run_revocation_sync(session_factory))
+    audit_writer = asyncio.create_task(run_audit_writer(session_factory))
     yield
+    revocation_sync.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await revocation_sync
+    audit_log.stop()
+    await audit_writer
+    shutdown_password_pool()
 
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(user.router)  # these are our /user/ routes
+app.include_router(jwks.router)  # /.well-known/jwks.json
+app.include_router(metrics.router)  # /metrics
+app.include_router(profiles.router)  # /admin/profiles
+app.include_router(api_keys.router)  # /admin/api-keys
+app.add_middleware(ProfilingMiddleware)  # X-Profile: summary | pstats
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     """sample unprotected route"""
     return {"message": "This is an unprotected route"}
 
 
-@app.get("/protected", dependencies=[Depends(get_current_user)])
-def protected_route():
-    """sample protected route"""
+@app.get("/protected", dependencies=[Depends(get_current_user_or_api_key)])
+async def protected_route():
+    """sample protected route, accepting a bearer token or an X-API-Key header"""
     return {"message": "You have access to this JWT protected resource."}
 
 
-@app.get("/superprotected", dependencies=[Depends(get_admin_user)])
-def superprotected_route():
+@app.get("/superprotected", dependencies=[Depends(get_admin_user_async)])
+async def superprotected_route():
     """this can be accessed only by an admin user"""
     return {"message": "You have access to this ADMIN protected resource."}
 
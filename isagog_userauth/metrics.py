@@ -0,0 +1,370 @@
+"""
+Metrics instrumentation in the Prometheus text format.
+
+The metrics are kept in process memory and rendered by the /metrics route.
+Recording a sample only takes an uncontended per-series lock (most of them are
+only touched from the event loop), so collection can stay on at full load.
+With several worker processes, each one exposes its own series.
+
+Metrics:
+    isagog_password_hash_seconds{operation}: Password hash and verify durations.
+    isagog_jwt_seconds{operation}: JWT encode, encode_many (batch) and decode
+    (signature) durations.
+    isagog_db_query_seconds{route}: Database statement durations, per route.
+    isagog_db_session_wait_seconds{session}: Connection checkout wait of sessions.
+    isagog_login_attempts_total{outcome}: Login outcomes.
+    isagog_token_rejections_total{reason}: Rejected bearer and refresh tokens.
+    isagog_api_key_authentications_total{outcome}: API key authentication outcomes.
+    isagog_audit_events_dropped_total{reason}: Audit events lost (queue_full,
+    write_error).
+    isagog_requests_in_progress{route}: In-flight requests of the /user/* routes.
+    isagog_response_serialize_seconds{route}: JSON encoding durations of responses.
+    Plus gauges of the token cache, revocation list, login throttle, password
+    admission and audit log counters, read when rendering.
+
+Classes:
+    Counter: A monotonically increasing counter.
+    Gauge: A value that goes up and down.
+    Histogram: Cumulative bucket counts, sum and count of observations.
+
+Functions:
+    timed(histogram): Observe the duration of a block into a histogram series.
+    current_route: The context variable holding the route of the current request.
+    track_in_progress(request): Router dependency counting in-flight requests.
+    instrument_engine(engine): Time the statements of an engine per route.
+    register_collector(collector): Add a callback rendering extra metric lines.
+    render(): Render every metric in the Prometheus text format.
+"""
+
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi import Request
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+_metrics: list = []
+_collectors: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """the series of a metric family, one per label values tuple"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: dict = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """return the series of some label values, creating it on first use"""
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _samples(self, values: tuple, series):
+        raise NotImplementedError
+
+    def collect(self) -> list[str]:
+        """render the family in the Prometheus text format"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, series in list(self._series.items()):
+            lines.extend(self._samples(values, series))
+        return lines
+
+
+class _Value:
+    """a single float protected by its own lock"""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        """add amount to the value"""
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        """subtract amount from the value"""
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        """replace the value"""
+        self.value = value
+
+
+class Counter(_Metric):
+    """A monotonically increasing counter."""
+
+    kind = "counter"
+
+    def _new_series(self):
+        return _Value()
+
+    def _samples(self, values, series):
+        labels = _format_labels(self.labelnames, values)
+        return [f"{self.name}{labels} {_format_value(series.value)}"]
+
+
+class Gauge(Counter):
+    """A value that goes up and down."""
+
+    kind = "gauge"
+
+
+class _HistogramSeries:
+    """the bucket counts, sum and count of one histogram series"""
+
+    __slots__ = ("upper_bounds", "counts", "total", "_lock")
+
+    def __init__(self, upper_bounds: tuple):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """record one observation"""
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count of observations."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def _samples(self, values, series):
+        with series._lock:  # pylint: disable=W0212
+            counts, total = list(series.counts), series.total
+        lines, cumulative = [], 0
+        for upper_bound, count in zip((*self.buckets, math.inf), counts):
+            cumulative += count
+            labels = _format_labels(
+                self.labelnames, values, f'le="{_format_value(upper_bound)}"'
+            )
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+@contextmanager
+def timed(series):
+    """observe the wall-clock duration of the block into a histogram series"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        series.observe(time.perf_counter() - start)
+
+
+password_hash_seconds = Histogram(
+    "isagog_password_hash_seconds",
+    "Duration of password hashing and verification.",
+    ("operation",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+jwt_seconds = Histogram(
+    "isagog_jwt_seconds",
+    "Duration of JWT signing (encode, encode_many) and verification (decode).",
+    ("operation",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+db_query_seconds = Histogram(
+    "isagog_db_query_seconds",
+    "Duration of database statements, per route.",
+    ("route",),
+)
+db_session_wait_seconds = Histogram(
+    "isagog_db_session_wait_seconds",
+    "Time spent waiting for a pooled connection when opening a session.",
+    ("session",),
+)
+login_attempts_total = Counter(
+    "isagog_login_attempts_total",
+    "Login attempts by outcome.",
+    ("outcome",),
+)
+token_rejections_total = Counter(
+    "isagog_token_rejections_total",
+    "Rejected tokens by reason.",
+    ("reason",),
+)
+api_key_authentications_total = Counter(
+    "isagog_api_key_authentications_total",
+    "API key authentications by outcome.",
+    ("outcome",),
+)
+audit_events_dropped_total = Counter(
+    "isagog_audit_events_dropped_total",
+    "Audit events dropped by reason: the queue was full or their batch failed.",
+    ("reason",),
+)
+requests_in_progress = Gauge(
+    "isagog_requests_in_progress",
+    "In-flight requests of the /user/* routes.",
+    ("route",),
+)
+response_serialize_seconds = Histogram(
+    "isagog_response_serialize_seconds",
+    "Duration of the JSON encoding of response bodies, per route.",
+    ("route",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.025),
+)
+
+current_route = contextvars.ContextVar("current_route", default="other")
+
+
+async def track_in_progress(request: Request):
+    """
+    Router dependency counting the in-flight requests of a route, and naming
+    the route of the database statements it runs.
+
+    Args:
+        request (Request): The incoming request.
+
+    Yields:
+        None
+    """
+    route = request.scope.get("route")
+    path = route.path if route is not None else request.url.path
+    current_route.set(path)
+    gauge = requests_in_progress.labels(path)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+def instrument_engine(engine):
+    """
+    Time every statement of an engine, failed ones included, into
+    isagog_db_query_seconds.
+
+    Args:
+        engine: A synchronous Engine, or the sync_engine of an AsyncEngine.
+
+    Returns:
+        None
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=W0613
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        # pylint: disable=W0613
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_query_seconds.labels(current_route.get()).observe(elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def drop_timer(context):
+        # a failed statement never reaches after_cursor_execute
+        conn = context.connection
+        if conn is not None and conn.info.get("query_start"):
+            elapsed = time.perf_counter() - conn.info["query_start"].pop()
+            db_query_seconds.labels(current_route.get()).observe(elapsed)
+
+
+def register_collector(collector):
+    """
+    Add a callback returning extra metric lines, called on every render.
+
+    Args:
+        collector: A callable returning a list of Prometheus text lines.
+
+    Returns:
+        The collector, so that this can be used as a decorator.
+    """
+    _collectors.append(collector)
+    return collector
+
+
+def gauge_lines(name: str, documentation: str, value: float) -> list[str]:
+    """the Prometheus text lines of a gauge without labels"""
+    return [
+        f"# HELP {name} {documentation}",
+        f"# TYPE {name} gauge",
+        f"{name} {_format_value(value)}",
+    ]
+
+
+def render() -> str:
+    """
+    Render every metric in the Prometheus text format.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.collect())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
@@ -1,6 +1,12 @@
 """
 User model definition for SQLAlchemy ORM.
 
+The RevokedToken and UserRevocation models back the token revocation denylist
+(see the revocation module), the ApiKey model holds the service API keys (see the
+api_keys module), the AuditEvent model holds the audit log (see the audit
+module), and the SchemaState model records the schema that init_db last
+brought the database to.
+
 This module defines the User model, which represents the structure of the 'users' table
 in the database. The table name is configured via an environment variable. The User model
 includes fields for the user's ID, username, email, password, role, and creation timestamp.
@@ -16,19 +22,46 @@ Attributes:
     role (str): The role of the user, defaults to 'basic'.
     created_ts (datetime): The timestamp when the user was created,
     defaults to the current time in UTC.
+    token_version (int): Incremented to invalidate every token issued to the user.
+    email_key (str): The normalized email, the exact-match key of email lookups.
+    username_key (str): The normalized username, the key of username lookups.
+    last_login_ts (datetime): When the user last logged in, None if never.
+
+Functions:
+    normalize_identifier(value): The case-insensitive form of an email or username.
 """
 
-import os
+import unicodedata
 from datetime import datetime, timezone
 
-from dotenv import load_dotenv
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import Column, DateTime, Float, Integer, String
 
 from .base import Base
+from .config import USER_TABLE_NAME
+
+
+def normalize_identifier(value: str | None) -> str | None:
+    """
+    Return the case-insensitive form of an email or username.
+
+    Args:
+        value (str | None): An email or username as typed.
+
+    Returns:
+        str | None: The NFKC-normalized, casefolded value.
+    """
+    if value is None:
+        return None
+    return unicodedata.normalize("NFKC", value).casefold()
+
+
+def _key_default(column: str):
+    """a column default normalizing the value inserted into another column"""
+
+    def default(context):
+        return normalize_identifier(context.get_current_parameters().get(column))
 
-# Load environment variables
-load_dotenv()
-USER_TABLE_NAME = os.getenv("USER_TABLE_NAME", "users")
+    return default
 
 
 class User(Base):
@@ -47,6 +80,13 @@ class User(Base):
         role (str): The role of the user, either 'admin' or 'basic'. Defaults to 'basic'.
         created_ts (datetime): The timestamp when the user was created, defaults to
                                the current time in UTC.
+        token_version (int): Carried in tokens as the "ver" claim; incrementing it
+                             invalidates every token previously issued to the user.
+        email_key (str): normalize_identifier(email), filled in on insert; logins
+                         and email lookups are exact probes of its unique index.
+        username_key (str): normalize_identifier(username), filled in on insert.
+        last_login_ts (datetime): When the user last logged in, or None if never;
+                                  written behind by the audit log writer.
     """
 
     __tablename__ = USER_TABLE_NAME
@@ -56,4 +96,137 @@ class User(Base):
     email = Column(String(120), unique=True, index=True)
     password = Column(String, nullable=False)
     role = Column(String, default="basic")
+    created_ts = Column(
+        DateTime, default=lambda: datetime.now(timezone.utc), index=True
+    )
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # NULL only in rows awaiting the backfill of database.upgrade_schema
+    # casefolding may lengthen a value, hence the wider columns
+    email_key = Column(
+        String(255), unique=True, index=True, default=_key_default("email")
+    )
+    username_key = Column(
+        String(255), unique=True, index=True, default=_key_default("username")
+    )
+    last_login_ts = Column(DateTime, nullable=True)
+
+
+class RevokedToken(Base):
+    """
+    SQLAlchemy ORM model for the 'revoked_tokens' table.
+
+    Each row revokes a single token by its "jti" claim, until the token expires.
+
+    Attributes:
+        jti (str): The unique ID of the revoked token.
+        revoked_at (float): When the token was revoked, in seconds since the epoch.
+        expires_at (float): When the token expires anyway, and the row can be pruned.
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    revoked_at = Column(Float, nullable=False, index=True)
+    expires_at = Column(Float, nullable=False, index=True)
+
+
+class UserRevocation(Base):
+    """
+    SQLAlchemy ORM model for the 'user_revocations' table.
+
+    Each row revokes every token issued to a user before revoked_at, e.g. when
+    the user is deleted or their password or role changes.
+
+    Attributes:
+        user_id (int): The ID of the user.
+        revoked_at (float): Tokens issued ("iat") up to this time are revoked.
+        expires_at (float): When the last revoked token expires, so the row can go.
+    """
+
+    __tablename__ = "user_revocations"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    revoked_at = Column(Float, nullable=False, index=True)
+    expires_at = Column(Float, nullable=False, index=True)
+
+
+class ApiKey(Base):
+    """
+    SQLAlchemy ORM model for the 'api_keys' table.
+
+    Each row is an API key authenticating as its user. Only the HMAC-SHA256 of
+    the secret part of the key is stored; the key is found by its prefix.
+
+    Attributes:
+        id (int): The primary key of the API key.
+        prefix (str): The public, unique prefix of the key.
+        digest (str): The hex HMAC-SHA256 of the secret, keyed with BCRYPT_PEPPER.
+        user_id (int): The ID of the user the key authenticates as.
+        name (str): A label telling what the key is used for.
+        created_ts (datetime): When the key was issued.
+        expires_at (float): When the key stops being accepted, in seconds since the
+                            epoch, or None if it never expires.
+        scopes (str): The space-separated permissions the key has beyond its
+                      user's, e.g. "introspect".
+    """
+
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True)
+    prefix = Column(String(16), unique=True, index=True, nullable=False)
+    digest = Column(String(64), nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    name = Column(String(64), nullable=False)
     created_ts = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(Float, nullable=True)
+    scopes = Column(String(255), nullable=False, default="", server_default="")
+
+
+class AuditEvent(Base):
+    """
+    SQLAlchemy ORM model for the 'audit_events' table.
+
+    Each row records a login attempt, a token refresh or an admin action. Rows
+    are inserted in batches by the audit log writer, shortly after the fact.
+
+    Attributes:
+        id (int): The primary key of the event.
+        ts (float): When the event happened, in seconds since the epoch.
+        action (str): What happened, e.g. "login", "refresh" or "user.delete".
+        outcome (str): How it ended, e.g. "success" or "bad_password".
+        user_id (int): The ID of the user the event is about, if known.
+        actor_id (int): The ID of the admin who performed the action, if any.
+        identifier (str): The email or username submitted at login, if any.
+        client_ip (str): The IP address of the client, if known.
+        detail (str): A short free-form description, e.g. import counts.
+    """
+
+    __tablename__ = "audit_events"
+
+    id = Column(Integer, primary_key=True)
+    ts = Column(Float, nullable=False, index=True)
+    action = Column(String(32), nullable=False, index=True)
+    outcome = Column(String(32), nullable=False)
+    user_id = Column(Integer, nullable=True, index=True)
+    actor_id = Column(Integer, nullable=True)
+    identifier = Column(String(255), nullable=True)
+    client_ip = Column(String(45), nullable=True)
+    detail = Column(String(255), nullable=True)
+
+
+class SchemaState(Base):
+    """
+    SQLAlchemy ORM model for the 'userauth_schema' table.
+
+    A single row records the fingerprint of the schema init_db last created or
+    upgraded, so that later startups can skip the schema checks.
+
+    Attributes:
+        name (str): The name of the schema, "userauth".
+        fingerprint (str): The SHA-256 of the DDL of the schema.
+    """
+
+    __tablename__ = "userauth_schema"
+
+    name = Column(String(32), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
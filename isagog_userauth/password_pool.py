@@ -0,0 +1,165 @@
+"""
+Dedicated worker pool for password hashing and verification.
+
+bcrypt is deliberately slow, and running it inline in a route handler holds one
+of Starlette's shared threadpool slots for the whole duration of the hash. Under
+a login burst this starves every other sync dependency (get_db, get_current_user)
+of the application. This module keeps password work on its own bounded executor
+so that a burst can only saturate the hashing pool.
+
+Environment Variables:
+    PASSWORD_POOL_KIND (str): "thread" (default) or "process".
+    PASSWORD_POOL_SIZE (int): Number of workers, 0 (default) means one per CPU.
+
+Functions:
+    pool_size(): Return the number of workers of the password pool.
+    get_password_pool(): Return the shared password executor, creating it on first use.
+    verify_password_async(plain_password, hashed_password): Verify a password on the pool.
+    get_password_hash_async(password): Hash a password on the pool.
+    hash_passwords(passwords): Hash many passwords in parallel.
+    hash_passwords_async(passwords): Hash many passwords, a pool's worth at a time.
+    shutdown_password_pool(): Stop the executor, typically from the app lifespan.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .admission import password_admission
+from .config import PASSWORD_POOL_KIND, PASSWORD_POOL_SIZE
+from .utils import get_password_hash, verify_password
+
+_pool: Executor | None = None
+_pool_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    """the number of workers of the password pool"""
+    return PASSWORD_POOL_SIZE or os.cpu_count() or 1
+
+
+def get_password_pool() -> Executor:
+    """
+    Return the shared password executor, creating it on first use.
+
+    bcrypt releases the GIL while hashing, so a thread pool is enough to use
+    every core; a process pool can be selected to isolate the work completely.
+
+    Returns:
+        Executor: The executor reserved for password work.
+
+    Raises:
+        ValueError: If PASSWORD_POOL_KIND is neither "thread" nor "process".
+    """
+    global _pool  # pylint: disable=W0603
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = pool_size()
+                if PASSWORD_POOL_KIND == "thread":
+                    _pool = ThreadPoolExecutor(
+                        max_workers=workers, thread_name_prefix="password"
+                    )
+                elif PASSWORD_POOL_KIND == "process":
+                    _pool = ProcessPoolExecutor(max_workers=workers)
+                else:
+                    raise ValueError(
+                        f"Invalid PASSWORD_POOL_KIND: {PASSWORD_POOL_KIND!r}"
+                    )
+    return _pool
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against its hash on the password pool.
+
+    Args:
+        plain_password (str): The plain text password.
+        hashed_password (str): The hashed password.
+
+    Returns:
+        bool: True if the password matches the hash, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_password_pool(), verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a password on the password pool.
+
+    Args:
+        password (str): The plain text password.
+
+    Returns:
+        str: The hashed password.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_password_pool(), get_password_hash, password)
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    """
+    Hash many passwords in parallel on the password pool.
+
+    Args:
+        passwords (list[str]): The plain text passwords.
+
+    Returns:
+        list[str]: The hashed passwords, in the same order.
+    """
+    return list(get_password_pool().map(get_password_hash, passwords))
+
+
+async def hash_passwords_async(passwords: list[str]) -> list[str]:
+    """
+    Hash many passwords in parallel on the password pool without blocking the loop.
+
+    At most one hash per pool worker is submitted at a time: the passwords of a
+    large import wait here, not in the executor queue ahead of every login. Each
+    hash takes a password_admission slot, like the single hashes of the routes,
+    so that bulk work takes its turn with the logins and is shed with them.
+
+    Args:
+        passwords (list[str]): The plain text passwords.
+
+    Returns:
+        list[str]: The hashed passwords, in the same order.
+
+    Raises:
+        ServiceUnavailableException: If a slot cannot be obtained in time.
+    """
+    hashed_passwords = [None] * len(passwords)
+    jobs = iter(enumerate(passwords))
+
+    async def hash_jobs():
+        for index, password in jobs:
+            async with password_admission.slot():
+                hashed_passwords[index] = await get_password_hash_async(password)
+
+    concurrency = min(pool_size(), password_admission.capacity, len(passwords))
+    workers = [asyncio.ensure_future(hash_jobs()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for worker in workers:
+            worker.cancel()
+        raise
+    return hashed_passwords
+
+
+def shutdown_password_pool():
+    """
+    Shut down the password executor if it was started.
+
+    Returns:
+        None
+    """
+    global _pool  # pylint: disable=W0603
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
@@ -0,0 +1,286 @@
+"""
+On-demand profiling of single requests.
+
+An admin can profile one request of a live process by sending it with an
+"X-Profile" header set to "summary" or "pstats"; a header, unlike a query
+parameter, cannot collide with the parameters of a route. The whole request is
+profiled with cProfile, routing and dependency resolution (get_current_user,
+get_db, ...) included, and the response is replaced by the profile: a text
+summary of the top PROFILE_TOP_N functions by cumulative time, or a pstats file
+to download. The status the route returned is kept in the X-Profiled-Status
+header.
+
+Additionally, a PROFILE_SAMPLE_RATE fraction of all requests can be profiled
+in the background, with their responses left untouched and passed on as they
+are produced, so that a sampled streaming response (e.g. /user/list?stream=true)
+is never held in memory. Every profile is kept in a ring buffer of the last
+PROFILE_BUFFER_SIZE profiles, listed and downloadable through the admin
+/admin/profiles routes.
+
+Requests without the flag only pay a header lookup. Since cProfile records the
+whole event loop thread, concurrent requests show up in a profile too; only one
+profile runs at a time.
+
+Environment Variables:
+    PROFILE_SAMPLE_RATE (float): The fraction of requests profiled in the background.
+    PROFILE_BUFFER_SIZE (int): The number of profiles kept for later retrieval.
+    PROFILE_TOP_N (int): The number of functions listed in a summary.
+
+Classes:
+    Profile: The profile of one request.
+    ProfileStore: A ring buffer of the latest profiles.
+    ProfilingMiddleware: The ASGI middleware profiling the flagged requests.
+"""
+
+import asyncio
+import cProfile
+import io
+import itertools
+import marshal
+import pstats
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException
+from fastapi.security.utils import get_authorization_scheme_param
+
+from .config import (PROFILE_BUFFER_SIZE, PROFILE_SAMPLE_RATE, PROFILE_TOP_N,
+                     STATELESS_TOKENS)
+from .db_session import get_async_read_db
+from .utils import (get_admin_user_async, get_current_user_row_async,
+                    get_token_payload, get_token_principal)
+
+PROFILE_MODES = ("summary", "pstats")
+
+
+@dataclass
+class Profile:
+    """
+    The profile of one request.
+
+    Attributes:
+        id (int): The profile number, increasing in this process.
+        method (str): The HTTP method of the request.
+        path (str): The path of the request.
+        status (int): The status code the route returned.
+        started_at (float): The request start, as a Unix timestamp.
+        duration (float): The request duration in seconds.
+        sampled (bool): Whether the request was picked by PROFILE_SAMPLE_RATE.
+        stats (pstats.Stats): The profile statistics.
+    """
+
+    id: int
+    method: str
+    path: str
+    status: int
+    started_at: float
+    duration: float
+    sampled: bool
+    stats: pstats.Stats = field(repr=False)
+
+    def summary(self, top_n: int = PROFILE_TOP_N) -> str:
+        """the top_n functions by cumulative time, as pstats prints them"""
+        stream = io.StringIO()
+        stream.write(
+            f"{self.method} {self.path} -> {self.status} "
+            f"in {self.duration * 1000:.1f} ms\n"
+        )
+        self.stats.stream = stream
+        self.stats.sort_stats("cumulative").print_stats(top_n)
+        return stream.getvalue()
+
+    def dump(self) -> bytes:
+        """the statistics in the pstats file format, for pstats.Stats(path)"""
+        return marshal.dumps(self.stats.stats)
+
+    def describe(self) -> dict:
+        """the metadata of the profile"""
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "sampled": self.sampled,
+        }
+
+
+class ProfileStore:
+    """
+    A ring buffer of the latest profiles.
+
+    Attributes:
+        maxsize (int): The number of profiles kept.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._profiles: deque[Profile] = deque(maxlen=maxsize)
+        self._ids = itertools.count(1)
+
+    def next_id(self) -> int:
+        """reserve the number of a new profile"""
+        return next(self._ids)
+
+    def add(self, profile: Profile):
+        """keep a profile, evicting the oldest one when full"""
+        self._profiles.append(profile)
+
+    def get(self, profile_id: int) -> Profile | None:
+        """the profile with the given number, if still kept"""
+        for profile in self._profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def list(self) -> list[dict]:
+        """the metadata of the kept profiles, most recent first"""
+        return [profile.describe() for profile in reversed(self._profiles)]
+
+
+profiles = ProfileStore(PROFILE_BUFFER_SIZE)
+_profiler_lock = asyncio.Lock()
+
+
+def requested_mode(scope) -> str | None:
+    """the profile mode asked for by the X-Profile header"""
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.decode("latin-1").strip().lower()
+    return None
+
+
+async def require_admin(scope):
+    """
+    Run the admin checks of get_admin_user_async on the bearer token of a request.
+
+    Raises:
+        HTTPException: If the request does not carry a valid admin token.
+    """
+    authorization = dict(scope["headers"]).get(b"authorization", b"")
+    scheme, token = get_authorization_scheme_param(authorization.decode("latin-1"))
+    if scheme.lower() != "bearer":
+        token = None
+    app = scope["app"]
+    session_dependency = app.dependency_overrides.get(
+        get_async_read_db, get_async_read_db
+    )
+    async with asynccontextmanager(session_dependency)() as db:
+        payload = await get_token_payload(token, db)
+        if STATELESS_TOKENS:
+            user = await get_token_principal(payload)
+        else:
+            user = await get_current_user_row_async(payload, db)
+        await get_admin_user_async(user)
+
+
+async def send_response(send, status: int, body: bytes, headers: list):
+    """send a complete response"""
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-length", str(len(body)).encode()),
+                *headers,
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class ProfilingMiddleware:
+    """
+    The ASGI middleware profiling the requests flagged by an admin, and a
+    PROFILE_SAMPLE_RATE fraction of all requests.
+    """
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = requested_mode(scope)
+        if mode is None:
+            if self.sample_rate and random.random() < self.sample_rate:
+                await self.profile(scope, receive, send, None)
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        if mode not in PROFILE_MODES:
+            detail = f"Profile mode must be one of {', '.join(PROFILE_MODES)}"
+            await send_response(send, 400, detail.encode(), [])
+            return
+        try:
+            await require_admin(scope)
+        except HTTPException as exc:
+            await send_response(send, exc.status_code, exc.detail.encode(), [])
+            return
+        await self.profile(scope, receive, send, mode)
+
+    async def profile(self, scope, receive, send, mode: str | None):
+        """run the request under cProfile, passing its response through when
+        sampled, or replacing it with the profile when flagged"""
+        if _profiler_lock.locked():
+            if mode is None:
+                await self.app(scope, receive, send)
+            else:
+                await send_response(send, 409, b"A profile is already running", [])
+            return
+
+        status = 500
+
+        async def forward(message):
+            # nothing is buffered: a sampled response streams through as is,
+            # and the body of a flagged one is replaced by the profile anyway
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            if mode is None:
+                await send(message)
+
+        async with _profiler_lock:
+            profiler = cProfile.Profile()
+            started_at, start = time.time(), time.perf_counter()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, forward)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+        profile = Profile(
+            id=profiles.next_id(),
+            method=scope["method"],
+            path=scope["path"],
+            status=status,
+            started_at=started_at,
+            duration=duration,
+            sampled=mode is None,
+            stats=pstats.Stats(profiler),
+        )
+        profiles.add(profile)
+
+        if mode is None:
+            return
+        headers = [
+            (b"x-profile-id", str(profile.id).encode()),
+            (b"x-profiled-status", str(status).encode()),
+        ]
+        if mode == "pstats":
+            disposition = f'attachment; filename="profile-{profile.id}.pstats"'
+            headers += [
+                (b"content-type", b"application/octet-stream"),
+                (b"content-disposition", disposition.encode()),
+            ]
+            await send_response(send, 200, profile.dump(), headers)
+        else:
+            headers.append((b"content-type", b"text/plain; charset=utf-8"))
+            await send_response(send, 200, profile.summary().encode(), headers)
@@ -0,0 +1,94 @@
+"""
+Fast JSON responses for the /user routes.
+
+The user router renders its responses with FastJSONResponse, which encodes the
+payload with the JSON_ENCODER chosen once at import: orjson when it is installed
+(the "orjson" extra) and JSON_ENCODER is "auto" or "orjson", the standard library
+json module otherwise. The time spent encoding every response is recorded in the
+isagog_response_serialize_seconds metric, per route, so that encoders can be
+compared on live traffic (or with the benchmark suite).
+
+Responses that never change, such as the delete and password change messages,
+are encoded once at import and sent as ConstantJSONResponse.
+
+Environment Variables:
+    JSON_ENCODER (str): "auto" (default), "orjson" or "json".
+
+Classes:
+    FastJSONResponse: A JSONResponse rendered with the configured encoder.
+    ConstantJSONResponse: A JSON response with a pre-encoded body.
+
+Functions:
+    get_encoder(name): Return the function encoding a payload to JSON bytes.
+    dumps(content): Encode a payload with the configured encoder.
+"""
+
+import json
+
+from fastapi.responses import JSONResponse, Response
+
+from .config import JSON_ENCODER
+from .metrics import current_route, response_serialize_seconds, timed
+
+JSON_ENCODERS = ("auto", "orjson", "json")
+
+
+def _orjson():
+    """import orjson, needed by the orjson encoder"""
+    try:
+        import orjson  # pylint: disable=C0415
+    except ImportError as exc:
+        raise RuntimeError(
+            "The orjson JSON encoder requires the orjson package (pip install orjson)"
+        ) from exc
+    return orjson
+
+
+def _json_dumps(content) -> bytes:
+    """encode like Starlette's JSONResponse does"""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def get_encoder(name: str):
+    """
+    Return the function encoding a payload to JSON bytes.
+
+    Args:
+        name (str): "orjson", "json", or "auto" for orjson when it is installed.
+
+    Returns:
+        Callable[[Any], bytes]: The encoder.
+
+    Raises:
+        ValueError: If the name is not a known encoder.
+        RuntimeError: If "orjson" is asked for but is not installed.
+    """
+    if name not in JSON_ENCODERS:
+        raise ValueError(f"Invalid JSON_ENCODER: {name!r}")
+    if name == "json":
+        return _json_dumps
+    try:
+        return _orjson().dumps
+    except RuntimeError:
+        if name == "orjson":
+            raise
+        return _json_dumps
+
+
+dumps = get_encoder(JSON_ENCODER)
+
+
+class FastJSONResponse(JSONResponse):
+    """A JSONResponse rendered with the configured encoder, and timed."""
+
+    def render(self, content) -> bytes:
+        with timed(response_serialize_seconds.labels(current_route.get())):
+            return dumps(content)
+
+
+class ConstantJSONResponse(Response):
+    """A JSON response whose body was encoded beforehand, e.g. with dumps."""
+
+    media_type = "application/json"
@@ -0,0 +1,345 @@
+"""
+Token revocation denylist.
+
+A token stays valid until its "exp" once issued. Revocations are therefore
+recorded in two tables: single tokens by their "jti" claim (RevokedToken, e.g.
+on logout), and every token issued to a user up to a point in time
+(UserRevocation, e.g. when the user is deleted or their password changes).
+
+Checking a table on every protected request would add a query to the hottest
+path, so each process keeps the denylist in memory:
+    - per-user revocation times in a dictionary, since there are few of them;
+    - revoked jtis in a Bloom filter, plus a small exact set of jtis known to
+      be revoked. Storage is only queried when the filter reports a probable
+      hit that the exact set cannot settle.
+
+The in-memory state is brought up to date incrementally every
+REVOCATION_SYNC_INTERVAL seconds, so revocations made by other worker processes
+are picked up within that delay. Every REVOCATION_PRUNE_INTERVAL seconds the
+rows of tokens that would have expired anyway are deleted and the filter is
+rebuilt from the remaining ones.
+
+Environment Variables:
+    REVOCATION_CAPACITY (int): The number of revoked jtis the Bloom filter is sized for.
+    REVOCATION_ERROR_RATE (float): The target false positive rate of the Bloom filter.
+    REVOCATION_SYNC_INTERVAL (float): Seconds between incremental syncs.
+    REVOCATION_PRUNE_INTERVAL (float): Seconds between pruning and full rebuilds.
+
+Classes:
+    BloomFilter: A fixed-size Bloom filter of strings.
+    RevocationList: The in-memory view of the revocation tables.
+
+Functions:
+    is_revoked(db, payload): Tell whether a verified token payload is revoked.
+    revoke_tokens(db, payloads): Revoke single tokens by their jti.
+    revoke_users(db, user_ids): Revoke every token issued so far to some users.
+    sync_revocations(db): Load the revocations recorded since the last sync.
+    prune_revocations(db): Delete expired revocations and rebuild the filter.
+    run_revocation_sync(session_factory): Keep the denylist in sync, forever.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import (REFRESH_TOKEN_LIFETIME, REVOCATION_CAPACITY,
+                     REVOCATION_ERROR_RATE, REVOCATION_PRUNE_INTERVAL,
+                     REVOCATION_SYNC_INTERVAL)
+from .models import RevokedToken, UserRevocation
+
+logger = logging.getLogger(__name__)
+
+# jtis confirmed as revoked are kept exactly, up to this many
+EXACT_SET_LIMIT = 10000
+# re-read rows this many seconds older than the last sync, to absorb clock skew
+SYNC_OVERLAP = 60.0
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter of strings.
+
+    Attributes:
+        size (int): The number of bits of the filter.
+        hashes (int): The number of bit positions set per item.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * step) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        """add an item to the filter"""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList:
+    """
+    The in-memory view of the revocation tables.
+
+    It is only used from the event loop, so it needs no locking.
+
+    Attributes:
+        synced_at (float): The most recent revocation time loaded from storage.
+        storage_checks (int): Probable hits that had to be checked in storage.
+        false_positives (int): Storage checks that found no revocation.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._exact: set[str] = set()
+        self._users: dict[int, float] = {}
+        self.synced_at = 0.0
+        self.storage_checks = 0
+        self.false_positives = 0
+
+    def add_token(self, jti: str):
+        """record a revoked jti"""
+        self._bloom.add(jti)
+        self.confirm_token(jti)
+
+    def confirm_token(self, jti: str):
+        """remember a jti known to be revoked, so that storage is not queried again"""
+        if len(self._exact) >= EXACT_SET_LIMIT:
+            self._exact.clear()
+        self._exact.add(jti)
+
+    def add_user(self, user_id: int, revoked_at: float):
+        """record that the tokens issued to a user up to revoked_at are revoked"""
+        if revoked_at > self._users.get(user_id, 0.0):
+            self._users[user_id] = revoked_at
+
+    def user_revoked(self, payload: dict) -> bool:
+        """tell whether a token was issued before its user's revocation time"""
+        revoked_at = self._users.get(payload.get("id"))
+        return revoked_at is not None and payload.get("iat", 0) <= revoked_at
+
+    def check_token(self, jti: str) -> bool | None:
+        """True if jti is revoked, False if it is not, None if storage must tell"""
+        if jti in self._exact:
+            return True
+        if jti not in self._bloom:
+            return False
+        return None
+
+    def rebuild(self, jtis, users):
+        """replace the whole state with the given jtis and (user id, time) pairs"""
+        self._bloom = BloomFilter(self._capacity, self._error_rate)
+        for jti in jtis:
+            self._bloom.add(jti)
+        self._exact = set()
+        self._users = {}
+        for user_id, revoked_at in users:
+            self.add_user(user_id, revoked_at)
+
+    def stats(self) -> dict:
+        """report the sizes of the in-memory state and the storage check counters"""
+        return {
+            "users": len(self._users),
+            "exact": len(self._exact),
+            "storage_checks": self.storage_checks,
+            "false_positives": self.false_positives,
+        }
+
+
+revocations = RevocationList(REVOCATION_CAPACITY, REVOCATION_ERROR_RATE)
+
+
+async def is_revoked(db: AsyncSession, payload: dict) -> bool:
+    """
+    Tell whether a verified token payload is revoked.
+
+    Storage is only queried when the Bloom filter reports a probable hit.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+        payload (dict): The verified token payload.
+
+    Returns:
+        bool: True if the token or its user has been revoked.
+    """
+    if revocations.user_revoked(payload):
+        return True
+    jti = payload.get("jti")
+    if jti is None:
+        return False
+    revoked = revocations.check_token(jti)
+    if revoked is None:
+        revocations.storage_checks += 1
+        revoked = (
+            await db.scalar(select(RevokedToken.jti).where(RevokedToken.jti == jti))
+            is not None
+        )
+        if revoked:
+            revocations.confirm_token(jti)
+        else:
+            revocations.false_positives += 1
+    return revoked
+
+
+async def revoke_tokens(db: AsyncSession, payloads: list[dict]):
+    """
+    Revoke single tokens by their jti, until they expire, and commit.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+        payloads (list[dict]): The verified payloads of the tokens to revoke.
+
+    Returns:
+        None
+    """
+    now = time.time()
+    rows = {
+        payload["jti"]: {
+            "jti": payload["jti"],
+            "revoked_at": now,
+            "expires_at": payload.get("exp", now),
+        }
+        for payload in payloads
+        if payload.get("jti")
+    }
+    if not rows:
+        return
+    await db.execute(delete(RevokedToken).where(RevokedToken.jti.in_(rows)))
+    await db.execute(insert(RevokedToken), list(rows.values()))
+    await db.commit()
+    for jti in rows:
+        revocations.add_token(jti)
+
+
+async def revoke_users(db: AsyncSession, user_ids):
+    """
+    Revoke every token issued so far to some users, and commit.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+        user_ids: The IDs of the users.
+
+    Returns:
+        None
+    """
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return
+    now = time.time()
+    expires_at = now + REFRESH_TOKEN_LIFETIME * 86400
+    await db.execute(delete(UserRevocation).where(UserRevocation.user_id.in_(user_ids)))
+    await db.execute(
+        insert(UserRevocation),
+        [
+            {"user_id": user_id, "revoked_at": now, "expires_at": expires_at}
+            for user_id in user_ids
+        ],
+    )
+    await db.commit()
+    for user_id in user_ids:
+        revocations.add_user(user_id, now)
+
+
+async def sync_revocations(db: AsyncSession):
+    """
+    Load the revocations recorded since the last sync, e.g. by other workers.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+
+    Returns:
+        None
+    """
+    since = revocations.synced_at - SYNC_OVERLAP
+    latest = revocations.synced_at
+    tokens = await db.execute(
+        select(RevokedToken.jti, RevokedToken.revoked_at).where(
+            RevokedToken.revoked_at >= since
+        )
+    )
+    for jti, revoked_at in tokens:
+        revocations.add_token(jti)
+        latest = max(latest, revoked_at)
+    users = await db.execute(
+        select(UserRevocation.user_id, UserRevocation.revoked_at).where(
+            UserRevocation.revoked_at >= since
+        )
+    )
+    for user_id, revoked_at in users:
+        revocations.add_user(user_id, revoked_at)
+        latest = max(latest, revoked_at)
+    revocations.synced_at = latest
+
+
+async def prune_revocations(db: AsyncSession):
+    """
+    Delete the revocations of tokens that have expired anyway, and rebuild the
+    in-memory state from the remaining ones.
+
+    Args:
+        db (AsyncSession): An asyncio database session.
+
+    Returns:
+        None
+    """
+    now = time.time()
+    await db.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+    await db.execute(delete(UserRevocation).where(UserRevocation.expires_at < now))
+    await db.commit()
+    tokens = (
+        await db.execute(select(RevokedToken.jti, RevokedToken.revoked_at))
+    ).all()
+    users = (
+        await db.execute(select(UserRevocation.user_id, UserRevocation.revoked_at))
+    ).all()
+    revocations.rebuild([jti for jti, _ in tokens], users)
+    revocations.synced_at = max(
+        (revoked_at for _, revoked_at in [*tokens, *users]), default=0.0
+    )
+
+
+async def run_revocation_sync(session_factory):
+    """
+    Keep the in-memory denylist in sync with storage until cancelled.
+
+    Start it as a task from the application lifespan.
+
+    Args:
+        session_factory: A callable returning an AsyncSession, e.g. AsyncSessionLocal.
+
+    Returns:
+        None
+    """
+    last_prune = None
+    while True:
+        try:
+            async with session_factory() as db:
+                if (
+                    last_prune is None
+                    or time.monotonic() - last_prune >= REVOCATION_PRUNE_INTERVAL
+                ):
+                    await prune_revocations(db)
+                    last_prune = time.monotonic()
+                else:
+                    await sync_revocations(db)
+        except Exception:  # pylint: disable=W0718
+            logger.exception("Revocation sync failed")
+        await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
@@ -0,0 +1,97 @@
+""" issue, list and revoke the service API keys
+all routes need an admin user
+"""
+
+import time
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..api_keys import generate_api_key
+from ..audit import audit
+from ..db_session import get_async_db
+from ..models import ApiKey, User, normalize_identifier
+from ..responses import ConstantJSONResponse, FastJSONResponse, dumps
+from ..schemas import (ApiKeyCreateModel, ApiKeyIssuedModel, ApiKeyModel,
+                       MessageModel)
+from ..utils import get_admin_user_async
+
+router = APIRouter(
+    prefix="/admin/api-keys",
+    dependencies=[Depends(get_admin_user_async)],
+    default_response_class=FastJSONResponse,
+)
+
+KEY_REVOKED = dumps({"message": "API key revoked successfully"})
+
+
+@router.post("", response_model=ApiKeyIssuedModel)
+async def issue_api_key(
+    request: ApiKeyCreateModel,
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """issue a key authenticating as the user with the given email
+    the key is only returned here: store it, it cannot be recovered"""
+    user_id = await db.scalar(
+        select(User.id).where(User.email_key == normalize_identifier(request.email))
+    )
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    key, prefix, digest = generate_api_key()
+    expires_at = None
+    if request.expires_in_days is not None:
+        expires_at = time.time() + request.expires_in_days * 86400
+    api_key = ApiKey(
+        prefix=prefix,
+        digest=digest,
+        user_id=user_id,
+        name=request.name,
+        expires_at=expires_at,
+        scopes=" ".join(dict.fromkeys(request.scopes)),
+    )
+    db.add(api_key)
+    await db.commit()
+    audit("api_key.issue", user_id=user_id, actor_id=admin.id, detail=prefix)
+    return ApiKeyIssuedModel(
+        **ApiKeyModel.model_validate(api_key).model_dump(), key=key
+    )
+
+
+@router.get("", response_model=list[ApiKeyModel])
+async def list_api_keys(
+    user_id: int | None = None, db: AsyncSession = Depends(get_async_db)
+):
+    """the issued keys, optionally of a single user, without their secrets"""
+    query = select(ApiKey).order_by(ApiKey.id)
+    if user_id is not None:
+        query = query.where(ApiKey.user_id == user_id)
+    return (await db.scalars(query)).all()
+
+
+@router.delete("/{key_id}", response_model=MessageModel)
+async def revoke_api_key(
+    key_id: int,
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """revoke a key: it is deleted and no longer accepted"""
+    deleted = (
+        await db.execute(
+            delete(ApiKey)
+            .where(ApiKey.id == key_id)
+            .returning(ApiKey.user_id, ApiKey.prefix)
+        )
+    ).first()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="API key not found")
+    await db.commit()
+    audit(
+        "api_key.revoke",
+        user_id=deleted.user_id,
+        actor_id=admin.id,
+        detail=deleted.prefix,
+    )
+    return ConstantJSONResponse(KEY_REVOKED)
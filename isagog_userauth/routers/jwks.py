@@ -0,0 +1,24 @@
+""" publish the public JWT verification keys as a JSON Web Key Set
+the response is precomputed and cacheable, so that other services can
+verify tokens locally and pick up rotated keys without calling us per token
+"""
+
+from fastapi import APIRouter, Request, Response
+
+from ..config import JWKS_MAX_AGE
+from ..keys import get_keyset
+
+router = APIRouter()
+
+
+@router.get("/.well-known/jwks.json")
+async def jwks(request: Request):
+    """the public keys that verify our tokens, indexed by kid"""
+    keyset = get_keyset()
+    headers = {
+        "Cache-Control": f"public, max-age={JWKS_MAX_AGE}",
+        "ETag": keyset.jwks_etag,
+    }
+    if request.headers.get("if-none-match") == keyset.jwks_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(keyset.jwks, media_type="application/json", headers=headers)
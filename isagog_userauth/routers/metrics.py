@@ -0,0 +1,42 @@
+""" expose the metrics of this process in the Prometheus text format
+alongside the instrumented histograms and counters, the statistics kept by the
+token cache, the revocation list, the login throttle, the password admission
+limiter and the audit log are read at scrape time
+"""
+
+from fastapi import APIRouter, Response
+
+from ..admission import password_admission
+from ..audit import audit_log
+from ..metrics import gauge_lines, register_collector, render
+from ..revocation import revocations
+from ..throttle import login_throttle
+from ..utils import token_cache
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@register_collector
+def component_stats() -> list[str]:
+    """the counters kept by the caches and limiters, as gauges"""
+    stats = {
+        "token_cache": token_cache.stats(),
+        "revocation": revocations.stats(),
+        "password_admission": password_admission.stats(),
+        "login_throttle": {"rejected": login_throttle.rejected},
+        "audit": audit_log.stats(),
+    }
+    lines = []
+    for component, values in stats.items():
+        for key, value in values.items():
+            name = f"isagog_{component}_{key}"
+            lines.extend(gauge_lines(name, f"{component} {key}.", value))
+    return lines
+
+
+@router.get("/metrics")
+async def metrics():
+    """the metrics of this process, for Prometheus to scrape"""
+    return Response(render(), media_type=PROMETHEUS_CONTENT_TYPE)
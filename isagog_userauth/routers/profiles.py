@@ -0,0 +1,39 @@
+""" list and download the request profiles kept by the profiling middleware
+all routes need an admin user
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from ..profiling import profiles
+from ..utils import get_admin_user_async
+
+router = APIRouter(
+    prefix="/admin/profiles", dependencies=[Depends(get_admin_user_async)]
+)
+
+
+@router.get("")
+async def list_profiles():
+    """the metadata of the kept profiles, most recent first"""
+    return {"maxsize": profiles.maxsize, "profiles": profiles.list()}
+
+
+@router.get("/{profile_id}")
+async def get_profile(profile_id: int, output: str = Query("summary", alias="format")):
+    """a kept profile, as a text summary or a pstats file"""
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if output == "pstats":
+        return Response(
+            profile.dump(),
+            media_type="application/octet-stream",
+            headers={
+                "Content-Disposition": (
+                    f'attachment; filename="profile-{profile.id}.pstats"'
+                )
+            },
+        )
+    if output != "summary":
+        raise HTTPException(status_code=400, detail="Invalid format")
+    return Response(profile.summary(), media_type="text/plain")
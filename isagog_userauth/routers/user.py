@@ -1,163 +1,648 @@
 """ implement all user management routes
 login and refresh are open to all
 the rest need an admin user
+all routes run on the event loop with an asyncio database session
 """
 
-from datetime import timedelta
+import sys
+from datetime import datetime
 
 import jwt
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, bindparam, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..config import ACCESS_TOKEN_LIFETIME, JWT_SECRET
-from ..db_session import get_db
-from ..models import User
+from ..admission import password_admission
+from ..api_keys import delete_user_api_keys, get_introspection_client
+from ..audit import audit
+from ..bulk_import import chunked, import_users_async, parse_users
+from ..config import (
+    BULK_CHUNK_SIZE,
+    IMPORT_MAX_ROWS,
+    LIST_MAX_PAGE_SIZE,
+    LIST_PAGE_SIZE,
+    LIST_STREAM_BATCH,
+    STATELESS_TOKENS,
+)
+from ..custom_exceptions import (
+    ServiceUnavailableException,
+    TooManyRequestsException,
+)
+from ..db_session import get_async_db, get_async_read_db
+from ..metrics import (
+    login_attempts_total,
+    token_rejections_total,
+    track_in_progress,
+)
+from ..models import User, normalize_identifier
+from ..password_pool import (
+    get_password_hash_async,
+    hash_passwords_async,
+    verify_password_async,
+)
+from ..responses import ConstantJSONResponse, FastJSONResponse, dumps
+from ..revocation import is_revoked, revoke_tokens, revoke_users
+from ..throttle import login_throttle
 from ..schemas import (
+    AccessTokenModel,
+    BulkPasswordResetModel,
+    BulkResultsModel,
+    BulkRoleChangeModel,
+    BulkUsersModel,
     DeleteUserModel,
+    ImportReportModel,
+    IntrospectModel,
+    IntrospectResponseModel,
+    LogoutModel,
+    MessageModel,
     SignupModel,
     SignupResponseModel,
     PasswordChangeModel,
+    TokenModel,
+    UserSummaryModel,
 )
 from ..utils import (
+    ACCESS_TOKEN_CLAIMS,
+    access_token_claims,
     create_access_token,
-    create_refresh_token,
-    get_admin_user,
-    get_current_user,
-    get_password_hash,
-    verify_password,
+    create_token_pair,
+    decode_token,
+    email_lookup,
+    get_admin_user_async,
+    get_current_user_async,
+    get_token_payload,
+    login_lookups,
+    password_needs_rehash,
+    stale_token_reason,
 )
 
-router = APIRouter(prefix="/user")
+router = APIRouter(
+    prefix="/user",
+    dependencies=[Depends(track_in_progress)],
+    default_response_class=FastJSONResponse,
+)
 
+# the bodies of the constant responses, encoded once
+LOGGED_OUT = dumps({"message": "Logged out successfully"})
+USER_DELETED = dumps({"message": "User deleted successfully"})
+PASSWORD_UPDATED = dumps({"message": "Password updated successfully"})
 
-@router.post(
-    "/signup",
-    response_model=SignupResponseModel,
-    dependencies=[Depends(get_admin_user)],
-)
-def save_user(user: SignupModel, db: Session = Depends(get_db)):
-    """an admin protected route to register a new user"""
-    existing_user_by_email = db.query(User).filter(User.email == user.email).first()
-    if existing_user_by_email:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
-    existing_user_by_username = (
-        db.query(User).filter(User.username == user.username).first()
+# the columns of the /user/list rows, in UserSummaryModel order
+USER_SUMMARY_COLUMNS = tuple(UserSummaryModel.model_fields)
+
+
+def record_login(identifier: str, client_ip: str | None, outcome: str, user=None):
+    """count a login attempt and queue its audit event"""
+    login_attempts_total.labels(outcome).inc()
+    audit(
+        "login",
+        outcome,
+        user_id=user.id if user is not None else None,
+        identifier=identifier,
+        client_ip=client_ip,
     )
-    if existing_user_by_username:
-        raise HTTPException(status_code=400, detail="Username already taken")
 
+
+def record_refresh(request: Request, outcome: str, user_id: int | None = None):
+    """count a rejected refresh token, and queue the audit event of a refresh"""
+    if outcome != "success":
+        token_rejections_total.labels(outcome).inc()
+    audit(
+        "refresh",
+        outcome,
+        user_id=user_id,
+        client_ip=request.client.host if request.client else None,
+    )
+
+
+def duplicate_user_detail(exc: IntegrityError) -> str:
+    """map a unique constraint violation on the users table to its error message"""
+    message = str(exc.orig).lower()
+    if "username" in message and "email" not in message:
+        return "Username already taken"
+    return "Email already registered"
+
+
+@router.post("/signup", response_model=SignupResponseModel)
+async def save_user(
+    user: SignupModel,
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """an admin protected route to register a new user
+    a single INSERT relies on the unique indexes to reject duplicates"""
     if user.role not in ["admin", "basic"]:
         raise HTTPException(status_code=400, detail="Invalid role")
 
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        email=user.email,
-        username=user.username,
-        password=hashed_password,
-        role=user.role,
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    async with password_admission.slot():
+        hashed_password = await get_password_hash_async(user.password)
+    try:
+        result = await db.execute(
+            insert(User)
+            .values(
+                email=user.email,
+                username=user.username,
+                password=hashed_password,
+                role=user.role,
+            )
+            .returning(User.id, User.email, User.username, User.role)
+        )
+        db_user = result.one()
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=duplicate_user_detail(exc)) from exc
+    audit("user.signup", user_id=db_user.id, actor_id=admin.id, detail=db_user.role)
     return SignupResponseModel(
         email=db_user.email, username=db_user.username, role=db_user.role
     )
 
 
-@router.post("/login")
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+@router.post("/login", response_model=TokenModel)
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """a login route for all users; will return valid JWT tokens when successful"""
-    user = (
-        db.query(User)
-        .filter(
-            or_(User.email == form_data.username, User.username == form_data.username)
-        )
-        .first()
-    )
-    if not user or not verify_password(form_data.password, user.password):
+    """a login route for all users; will return valid JWT tokens when successful
+    a password hash made with outdated hasher settings is replaced on the way
+    identifiers or client IPs with too many recent failures get a 429 up front,
+    and a 503 is returned when the password hashing queue is saturated"""
+    client_ip = request.client.host if request.client else None
+    retry_after = login_throttle.check(form_data.username, client_ip)
+    if retry_after is not None:
+        record_login(form_data.username, client_ip, "throttled")
+        raise TooManyRequestsException(retry_after)
+
+    user = None
+    for statement in login_lookups(form_data.username):
+        user = await db.scalar(statement)
+        if user is not None:
+            break
+    new_hash = None
+    if user:
+        try:
+            async with password_admission.slot():
+                valid = await verify_password_async(form_data.password, user.password)
+                if valid and password_needs_rehash(user.password):
+                    new_hash = await get_password_hash_async(form_data.password)
+        except ServiceUnavailableException:
+            record_login(form_data.username, client_ip, "overloaded", user)
+            raise
+    if not user or not valid:
+        outcome = "bad_password" if user else "unknown_user"
+        record_login(form_data.username, client_ip, outcome, user)
+        login_throttle.record_failure(form_data.username, client_ip)
         raise HTTPException(
             status_code=401, detail="Invalid email/username or password"
         )
+    if new_hash is not None:
+        # only if the password was not changed meanwhile; tokens stay valid
+        await db.execute(
+            update(User)
+            .where(User.id == user.id, User.password == user.password)
+            .values(password=new_hash)
+        )
+        await db.commit()
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_LIFETIME)
-    access_token = create_access_token(
-        data={"sub": user.email, "id": user.id, "role": user.role},
-        expires_delta=access_token_expires,
+    access_token, new_refresh_token = create_token_pair(
+        access_token_claims(user),
+        {"sub": user.email, "id": user.id, "ver": user.token_version},
+    )
+    record_login(form_data.username, client_ip, "success", user)
+    return TokenModel(
+        access_token=access_token,
+        refresh_token=new_refresh_token,
+        role=user.role,  # Include role in response
     )
-    new_refresh_token = create_refresh_token(data={"sub": user.email, "id": user.id})
-    return {
-        "access_token": access_token,
-        "refresh_token": new_refresh_token,
-        "token_type": "bearer",
-        "role": user.role,  # Include role in response
-    }
 
 
-@router.post("/refresh")
-async def refresh_token(request: Request, db: Session = Depends(get_db)):
+@router.post("/refresh", response_model=AccessTokenModel)
+async def refresh_token(request: Request, db: AsyncSession = Depends(get_async_db)):
     """refresh an access token"""
     refresh_token_value = (await request.json()).get("refresh_token")
     try:
-        payload = jwt.decode(refresh_token_value, JWT_SECRET, algorithms=["HS256"])
-        user = db.query(User).filter(User.email == payload["sub"]).first()
-        if not user:
+        payload = decode_token(refresh_token_value)
+        if await is_revoked(db, payload):
+            record_refresh(request, "revoked", payload.get("id"))
+            raise HTTPException(status_code=401, detail="Invalid token")
+        user = await db.scalar(email_lookup(payload["sub"]))
+        if not user or payload.get("ver", 0) != user.token_version:
+            record_refresh(request, stale_token_reason(user), payload.get("id"))
             raise HTTPException(status_code=401, detail="Invalid token")
-        new_access_token = create_access_token(data={"sub": user.email, "id": user.id})
-        return {"access_token": new_access_token, "token_type": "bearer"}
+        new_access_token = create_access_token(data=access_token_claims(user))
+        record_refresh(request, "success", user.id)
+        return AccessTokenModel(access_token=new_access_token)
     except jwt.ExpiredSignatureError as exc:
+        record_refresh(request, "expired")
         raise HTTPException(
             status_code=401, detail="Refresh token has expired"
         ) from exc
     except jwt.InvalidTokenError as exc:
+        record_refresh(request, "invalid")
         raise HTTPException(status_code=401, detail="Invalid token") from exc
 
 
-@router.get("/list", dependencies=[Depends(get_admin_user)])
-def list_users(db: Session = Depends(get_db)):
-    """admins can list defined users"""
-    users = db.query(User).all()
-    return [
-        {
-            "id": user.id,
-            "email": user.email,
-            "username": user.username,
-            "role": user.role,
-        }
-        for user in users
-    ]
+@router.post("/logout", response_model=MessageModel)
+async def logout(
+    logout_request: LogoutModel,
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """revoke the bearer access token and, when given, a refresh token of the
+    same user, so that neither is accepted again before it expires"""
+    payloads = [payload]
+    if logout_request.refresh_token:
+        try:
+            refresh_payload = decode_token(logout_request.refresh_token)
+        except jwt.PyJWTError as exc:
+            raise HTTPException(status_code=401, detail="Invalid token") from exc
+        if refresh_payload.get("sub") != payload.get("sub"):
+            raise HTTPException(status_code=401, detail="Invalid token")
+        payloads.append(refresh_payload)
+    await revoke_tokens(db, payloads)
+    return ConstantJSONResponse(LOGGED_OUT)
+
+
+def prefix_filter(column, prefix: str):
+    """an index-friendly range condition matching the values starting with prefix"""
+    if ord(prefix[-1]) == sys.maxunicode:  # no next character bounds the range
+        return and_(column >= prefix, column.startswith(prefix, autoescape=True))
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return and_(column >= prefix, column < upper_bound)
+
+
+async def stream_users(bind, query):
+    """yield the users selected by query as NDJSON lines, LIST_STREAM_BATCH rows
+    at a time; runs on its own session since it outlives the request handler"""
+    async with AsyncSession(bind) as db:
+        result = await db.stream(query.execution_options(yield_per=LIST_STREAM_BATCH))
+        async for rows in result.partitions():
+            yield b"".join(
+                dumps(dict(zip(USER_SUMMARY_COLUMNS, row))) + b"\n" for row in rows
+            )
+
+
+@router.get(
+    "/list",
+    response_model=list[UserSummaryModel],
+    dependencies=[Depends(get_admin_user_async)],
+)
+async def list_users(  # pylint: disable=R0913
+    after_id: int | None = Query(default=None, description="keyset cursor"),
+    limit: int | None = Query(default=None, ge=1, le=LIST_MAX_PAGE_SIZE),
+    role: str | None = None,
+    email_prefix: str | None = Query(default=None, min_length=1),
+    username_prefix: str | None = Query(default=None, min_length=1),
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """admins can list defined users
+    pages are ordered by id: pass the X-Next-Cursor header value as after_id
+    to fetch the next page; stream=true returns every match as NDJSON
+    the page is encoded straight from the selected columns, skipping the
+    response model validation"""
+    query = select(User.id, User.email, User.username, User.role).order_by(User.id)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    if role is not None:
+        query = query.where(User.role == role)
+    if email_prefix is not None:
+        query = query.where(prefix_filter(User.email, email_prefix))
+    if username_prefix is not None:
+        query = query.where(prefix_filter(User.username, username_prefix))
+    if created_after is not None:
+        query = query.where(User.created_ts >= created_after)
+    if created_before is not None:
+        query = query.where(User.created_ts < created_before)
+
+    if stream:
+        if limit is not None:
+            query = query.limit(limit)
+        return StreamingResponse(
+            stream_users(db.bind, query), media_type="application/x-ndjson"
+        )
 
+    limit = limit or LIST_PAGE_SIZE
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+    return FastJSONResponse(
+        [dict(zip(USER_SUMMARY_COLUMNS, row)) for row in rows], headers=headers
+    )
+
+
+@router.post(
+    "/import",
+    response_model=ImportReportModel,
+    response_model_exclude_none=True,
+)
+async def bulk_import_users(
+    request: Request,
+    input_format: str | None = Query(
+        default=None, alias="format", pattern="^(csv|ndjson)$"
+    ),
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """admins can create many users at once from a CSV or NDJSON request body
+    the format defaults to csv for a text/csv content type, ndjson otherwise;
+    at most IMPORT_MAX_ROWS rows are accepted per request;
+    returns the created/duplicate/invalid counts and a result for every row"""
+    if input_format is None:
+        content_type = request.headers.get("content-type", "")
+        input_format = "csv" if "csv" in content_type else "ndjson"
+    try:
+        rows = parse_users((await request.body()).decode("utf-8"), input_format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if len(rows) > IMPORT_MAX_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {IMPORT_MAX_ROWS} rows per import"
+        )
+    report = await import_users_async(db, rows)
+    audit(
+        "user.import",
+        actor_id=admin.id,
+        detail=(
+            f"created {report['created']}, duplicate {report['duplicate']}, "
+            f"invalid {report['invalid']}"
+        ),
+    )
+    return report
 
-@router.delete("/delete", dependencies=[Depends(get_admin_user)])
-def delete_user(user_data: DeleteUserModel, db: Session = Depends(get_db)):
-    """admins can delete a user using the numeric ID"""
-    user = db.query(User).filter(User.id == user_data.id).first()
-    if not user:
+
+@router.delete("/delete", response_model=MessageModel)
+async def delete_user(
+    user_data: DeleteUserModel,
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """admins can delete a user using the numeric ID, along with their API keys"""
+    deleted_id = await db.scalar(
+        delete(User).where(User.id == user_data.id).returning(User.id)
+    )
+    if deleted_id is None:
         raise HTTPException(status_code=404, detail="User not found")
+    await delete_user_api_keys(db, [deleted_id])  # the id may be reused
 
-    db.delete(user)
-    db.commit()
-    return {"message": "User deleted successfully"}
+    await db.commit()
+    await revoke_users(db, [deleted_id])
+    audit("user.delete", user_id=deleted_id, actor_id=admin.id)
+    return ConstantJSONResponse(USER_DELETED)
 
 
-@router.put("/passchange")
-def change_user_password(
+@router.put("/passchange", response_model=MessageModel)
+async def change_user_password(
     user_update: PasswordChangeModel,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Change the password; admins can change any, basic users only theirs"""
-    if current_user.role != "admin" and current_user.email != user_update.email:
+    email_key = normalize_identifier(user_update.email)
+    own_email = normalize_identifier(current_user.email) == email_key
+    if current_user.role != "admin" and not own_email:
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    user = db.query(User).filter(User.email == user_update.email).first()
-    if not user:
+    async with password_admission.slot():
+        hashed_password = await get_password_hash_async(user_update.new_password)
+    updated_id = await db.scalar(
+        update(User)
+        .where(User.email_key == email_key)
+        .values(
+            password=hashed_password,
+            token_version=User.token_version + 1,  # invalidate issued tokens
+        )
+        .returning(User.id)
+    )
+    if updated_id is None:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.password = get_password_hash(user_update.new_password)
-    db.commit()
-    return {"message": "Password updated successfully"}
+    await db.commit()
+    await revoke_users(db, [updated_id])
+    audit("user.password_change", user_id=updated_id, actor_id=current_user.id)
+    return ConstantJSONResponse(PASSWORD_UPDATED)
+
+
+async def apply_to_users(db: AsyncSession, statement, selection: BulkUsersModel):
+    """run an UPDATE or DELETE statement on the selected users, BULK_CHUNK_SIZE
+    ids or emails per statement, and return the ids and normalized emails of the
+    matched users; emails are matched case-insensitively, as by login"""
+    statement = statement.execution_options(synchronize_session=False)
+    matched_ids, matched_keys = set(), set()
+    email_keys = list({normalize_identifier(email) for email in selection.emails})
+    conditions = [
+        User.id.in_(chunk) for chunk in chunked(selection.ids, BULK_CHUNK_SIZE)
+    ]
+    conditions += [
+        User.email_key.in_(chunk) for chunk in chunked(email_keys, BULK_CHUNK_SIZE)
+    ]
+    for condition in conditions:
+        rows = await db.execute(
+            statement.where(condition).returning(User.id, User.email_key)
+        )
+        for user_id, email_key in rows:
+            matched_ids.add(user_id)
+            matched_keys.add(email_key)
+    return matched_ids, matched_keys
+
+
+def audit_users(action: str, user_ids, admin, detail: str | None = None):
+    """queue the audit event of an admin action, one per affected user"""
+    for user_id in user_ids:
+        audit(action, user_id=user_id, actor_id=admin.id, detail=detail)
+
+
+def bulk_outcomes(selection: BulkUsersModel, matched_ids, matched_keys, status):
+    """one outcome per selected id and email, in request order"""
+    return [
+        {"id": user_id, "status": status if user_id in matched_ids else "not_found"}
+        for user_id in selection.ids
+    ] + [
+        {
+            "email": email,
+            "status": status
+            if normalize_identifier(email) in matched_keys
+            else "not_found",
+        }
+        for email in selection.emails
+    ]
+
+
+@router.delete(
+    "/bulk/delete",
+    response_model=BulkResultsModel,
+    response_model_exclude_none=True,
+)
+async def bulk_delete_users(
+    selection: BulkUsersModel,
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """admins can delete many users by ID and/or email in one transaction,
+    along with their API keys"""
+    matched_ids, matched_keys = await apply_to_users(db, delete(User), selection)
+    await delete_user_api_keys(db, matched_ids)
+    await db.commit()
+    await revoke_users(db, matched_ids)
+    audit_users("user.delete", matched_ids, admin)
+    return {
+        "results": bulk_outcomes(selection, matched_ids, matched_keys, "deleted")
+    }
+
+
+@router.put(
+    "/bulk/role",
+    response_model=BulkResultsModel,
+    response_model_exclude_none=True,
+)
+async def bulk_change_role(
+    change: BulkRoleChangeModel,
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """admins can change the role of many users by ID and/or email in one
+    transaction; tokens issued with the former role are invalidated"""
+    if change.role not in ["admin", "basic"]:
+        raise HTTPException(status_code=400, detail="Invalid role")
+
+    statement = update(User).values(
+        role=change.role, token_version=User.token_version + 1
+    )
+    matched_ids, matched_keys = await apply_to_users(db, statement, change)
+    await db.commit()
+    await revoke_users(db, matched_ids)
+    audit_users("user.role_change", matched_ids, admin, detail=change.role)
+    return {"results": bulk_outcomes(change, matched_ids, matched_keys, "updated")}
+
+
+@router.put(
+    "/bulk/passchange",
+    response_model=BulkResultsModel,
+    response_model_exclude_none=True,
+)
+async def bulk_reset_passwords(
+    reset: BulkPasswordResetModel,
+    admin: User = Depends(get_admin_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """admins can reset the password of up to BULK_MAX_PASSWORD_RESETS users
+    in one transaction; the new passwords of the existing users are hashed in
+    parallel, each taking a password admission slot"""
+    new_passwords = {
+        normalize_identifier(user.email): user.new_password for user in reset.users
+    }
+    user_ids = {}
+    for chunk in chunked(list(new_passwords), BULK_CHUNK_SIZE):
+        rows = await db.execute(
+            select(User.email_key, User.id).where(User.email_key.in_(chunk))
+        )
+        user_ids.update(rows.all())
+
+    email_keys = list(user_ids)
+    hashed_passwords = await hash_passwords_async(
+        [new_passwords[email_key] for email_key in email_keys]
+    )
+    users = User.__table__
+    if email_keys:
+        await db.execute(
+            update(users)
+            .where(users.c.id == bindparam("user_id"))
+            .values(
+                password=bindparam("new_password"),
+                token_version=users.c.token_version + 1,
+            ),
+            [
+                {"user_id": user_ids[email_key], "new_password": hashed}
+                for email_key, hashed in zip(email_keys, hashed_passwords)
+            ],
+        )
+    await db.commit()
+    await revoke_users(db, user_ids.values())
+    audit_users("user.password_change", user_ids.values(), admin)
+    return {
+        "results": [
+            {
+                "email": email,
+                "status": "updated"
+                if normalize_identifier(email) in user_ids
+                else "not_found",
+            }
+            for email in dict.fromkeys(user.email for user in reset.users)
+        ]
+    }
+
+
+def role_grants(role: str, required_role: str | None) -> bool:
+    """admins are granted every role, other users only their own"""
+    return required_role is None or role in (required_role, "admin")
+
+
+@router.post(
+    "/introspect",
+    response_model=IntrospectResponseModel,
+    response_model_exclude_none=True,
+    dependencies=[Depends(get_introspection_client)],
+)
+async def introspect_tokens(
+    introspection: IntrospectModel, db: AsyncSession = Depends(get_async_read_db)
+):
+    """an API gateway, with an API key of the introspect scope, or an admin can
+    validate up to INTROSPECT_MAX_TOKENS access tokens at once
+    each result has a status among active, expired, revoked, invalid and forbidden
+    (when the token does not grant the required role); refresh tokens are invalid;
+    unless STATELESS_TOKENS is set, the users are checked with a single IN query
+    per BULK_CHUNK_SIZE ids"""
+    results = []
+    for item in introspection.tokens:
+        try:
+            claims = decode_token(item.token)
+        except jwt.ExpiredSignatureError:
+            results.append({"status": "expired"})
+        except jwt.PyJWTError:
+            results.append({"status": "invalid"})
+        else:
+            if ACCESS_TOKEN_CLAIMS.issubset(claims):
+                results.append({"status": "active", "claims": claims})
+            else:
+                results.append({"status": "invalid"})
+
+    for result in results:
+        if "claims" in result and await is_revoked(db, result["claims"]):
+            result.pop("claims")
+            result["status"] = "revoked"
+
+    if not STATELESS_TOKENS:
+        user_ids = list({r["claims"].get("id") for r in results if "claims" in r})
+        users = {}
+        for chunk in chunked(user_ids, BULK_CHUNK_SIZE):
+            rows = await db.execute(
+                select(User.id, User.role, User.token_version).where(
+                    User.id.in_(chunk)
+                )
+            )
+            users.update((row.id, row) for row in rows)
+        for result in results:
+            if "claims" not in result:
+                continue
+            user = users.get(result["claims"].get("id"))
+            if user is None or result["claims"].get("ver", 0) != user.token_version:
+                result.pop("claims")
+                result["status"] = "invalid"
+            else:
+                result["claims"] = {**result["claims"], "role": user.role}
+
+    for item, result in zip(introspection.tokens, results):
+        if "claims" in result and not role_grants(
+            result["claims"].get("role"), item.role
+        ):
+            result["status"] = "forbidden"
+        result["active"] = result["status"] == "active"
+    return {"results": results}
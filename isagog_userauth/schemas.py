@@ -5,14 +5,42 @@ This module defines the Pydantic models used for various user-related operations
 such as signup, login, deleting a user, and changing a user's password. These models
 are used to validate and serialize/deserialize data in the application.
 
+Every /user route declares one of the response models below. The hot routes build
+their payloads directly (see the responses module); the models then document the
+payload in the OpenAPI schema.
+
 Classes:
     SignupModel: Schema for user signup requests.
     SignupResponseModel: Schema for user signup responses.
     DeleteUserModel: Schema for user deletion requests.
     PasswordChangeModel: Schema for changing a user's password.
+    LogoutModel: Schema for logout requests.
+    BulkUsersModel: Schema selecting many users by ID and/or email.
+    BulkRoleChangeModel: Schema for changing the role of many users.
+    BulkPasswordResetModel: Schema for resetting the password of many users.
+    IntrospectTokenModel: Schema of one token to introspect.
+    IntrospectModel: Schema for batched token introspection requests.
+    MessageModel: Schema of the responses carrying a single message.
+    TokenModel: Schema of login responses.
+    AccessTokenModel: Schema of refresh responses.
+    UserSummaryModel: Schema of a user in the /user/list responses.
+    ImportRowResultModel: Schema of the outcome of one imported row.
+    ImportReportModel: Schema of bulk import responses.
+    BulkOutcomeModel: Schema of the outcome of one selected user.
+    BulkResultsModel: Schema of the bulk operation responses.
+    IntrospectResultModel: Schema of the introspection result of one token.
+    IntrospectResponseModel: Schema of batched token introspection responses.
+    ApiKeyCreateModel: Schema for issuing an API key.
+    ApiKeyModel: Schema of an API key, without its secret.
+    ApiKeyIssuedModel: Schema of a newly issued API key, with the key itself.
 """
 
-from pydantic import BaseModel, EmailStr, Field
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+
+from .config import BULK_MAX_PASSWORD_RESETS, INTROSPECT_MAX_TOKENS
 
 
 class SignupModel(BaseModel):
@@ -69,3 +97,271 @@ class PasswordChangeModel(BaseModel):
 
     email: EmailStr
     new_password: str = Field(..., max_length=30)
+
+
+class LogoutModel(BaseModel):
+    """
+    Schema for logging out.
+
+    Attributes:
+        refresh_token (str, optional): A refresh token to revoke along with the access token.
+    """
+
+    refresh_token: str | None = None
+
+
+class BulkUsersModel(BaseModel):
+    """
+    Schema selecting many users by ID and/or email.
+
+    Attributes:
+        ids (list[int]): The IDs of the selected users.
+        emails (list[EmailStr]): The email addresses of the selected users.
+    """
+
+    ids: list[int] = Field(default_factory=list)
+    emails: list[EmailStr] = Field(default_factory=list)
+
+
+class BulkRoleChangeModel(BulkUsersModel):
+    """
+    Schema for changing the role of many users.
+
+    Attributes:
+        role (str): The new role of the selected users.
+    """
+
+    role: str
+
+
+class BulkPasswordResetModel(BaseModel):
+    """
+    Schema for resetting the password of many users.
+
+    Attributes:
+        users (list[PasswordChangeModel]): The email and new password of each user,
+            at most BULK_MAX_PASSWORD_RESETS.
+    """
+
+    users: list[PasswordChangeModel] = Field(..., max_length=BULK_MAX_PASSWORD_RESETS)
+
+
+class IntrospectTokenModel(BaseModel):
+    """
+    Schema of one token to introspect.
+
+    Attributes:
+        token (str): The encoded access token.
+        role (str | None): The role the token must grant, if any.
+    """
+
+    token: str
+    role: str | None = None
+
+
+class IntrospectModel(BaseModel):
+    """
+    Schema for batched token introspection requests.
+
+    Attributes:
+        tokens (list[IntrospectTokenModel]): The tokens to introspect, at most
+            INTROSPECT_MAX_TOKENS.
+    """
+
+    tokens: list[IntrospectTokenModel] = Field(..., max_length=INTROSPECT_MAX_TOKENS)
+
+
+class MessageModel(BaseModel):
+    """
+    Schema of the responses carrying a single message.
+
+    Attributes:
+        message (str): A human readable outcome.
+    """
+
+    message: str
+
+
+class AccessTokenModel(BaseModel):
+    """
+    Schema of refresh responses.
+
+    Attributes:
+        access_token (str): The new access token.
+        token_type (str): Always "bearer".
+    """
+
+    access_token: str
+    token_type: str = "bearer"
+
+
+class TokenModel(AccessTokenModel):
+    """
+    Schema of login responses.
+
+    Attributes:
+        refresh_token (str): The refresh token.
+        role (str): The role of the user.
+    """
+
+    refresh_token: str
+    role: str
+
+
+class UserSummaryModel(BaseModel):
+    """
+    Schema of a user in the /user/list responses (and NDJSON lines).
+
+    Attributes:
+        id (int): The ID of the user.
+        email (str): The user's email address.
+        username (str): The user's username.
+        role (str): The user's role.
+    """
+
+    id: int
+    email: str
+    username: str
+    role: str
+
+
+class ImportRowResultModel(BaseModel):
+    """
+    Schema of the outcome of one imported row.
+
+    Attributes:
+        row (int): The number of the row in the input, starting at 1.
+        email (str | None): The email of the row, absent when missing.
+        username (str | None): The username of the row, absent when missing.
+        status (str): One of created, duplicate and invalid.
+        detail (str | None): Why the row was not created, if so.
+    """
+
+    row: int
+    email: str | None = None
+    username: str | None = None
+    status: str
+    detail: str | None = None
+
+
+class ImportReportModel(BaseModel):
+    """
+    Schema of bulk import responses.
+
+    Attributes:
+        created (int): The number of users created.
+        duplicate (int): The number of rows matching an existing user.
+        invalid (int): The number of rows failing validation.
+        results (list[ImportRowResultModel]): The outcome of every row.
+    """
+
+    created: int
+    duplicate: int
+    invalid: int
+    results: list[ImportRowResultModel]
+
+
+class BulkOutcomeModel(BaseModel):
+    """
+    Schema of the outcome of one user selected by ID or email.
+
+    Attributes:
+        id (int | None): The selected ID, absent when selected by email.
+        email (str | None): The selected email, absent when selected by ID.
+        status (str): The outcome, e.g. deleted, updated or not_found.
+    """
+
+    id: int | None = None
+    email: str | None = None
+    status: str
+
+
+class BulkResultsModel(BaseModel):
+    """
+    Schema of the bulk operation responses.
+
+    Attributes:
+        results (list[BulkOutcomeModel]): One outcome per selected user, in request order.
+    """
+
+    results: list[BulkOutcomeModel]
+
+
+class IntrospectResultModel(BaseModel):
+    """
+    Schema of the introspection result of one token.
+
+    Attributes:
+        status (str): One of active, expired, revoked, invalid and forbidden.
+        active (bool): Whether the status is active.
+        claims (dict | None): The claims of a valid token, absent otherwise.
+    """
+
+    status: str
+    active: bool
+    claims: dict | None = None
+
+
+class IntrospectResponseModel(BaseModel):
+    """
+    Schema of batched token introspection responses.
+
+    Attributes:
+        results (list[IntrospectResultModel]): One result per token, in request order.
+    """
+
+    results: list[IntrospectResultModel]
+
+
+class ApiKeyCreateModel(BaseModel):
+    """
+    Schema for issuing an API key.
+
+    Attributes:
+        email (EmailStr): The email of the user the key authenticates as.
+        name (str): A label telling what the key is used for.
+        expires_in_days (int | None): The lifetime of the key, None for no expiry.
+        scopes (list[str]): The permissions granted beyond the user's, e.g.
+            "introspect" for an API gateway.
+    """
+
+    email: EmailStr
+    name: str = Field(..., max_length=64)
+    expires_in_days: int | None = Field(default=None, ge=1)
+    scopes: list[Literal["introspect"]] = Field(default_factory=list)
+
+
+class ApiKeyModel(BaseModel):
+    """
+    Schema of an API key, without its secret.
+
+    Attributes:
+        id (int): The ID of the key.
+        prefix (str): The public prefix of the key.
+        user_id (int): The ID of the user the key authenticates as.
+        name (str): The label of the key.
+        created_ts (datetime | None): When the key was issued.
+        expires_at (float | None): When the key expires, in seconds since the epoch.
+        scopes (str): The space-separated permissions of the key.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    prefix: str
+    user_id: int
+    name: str
+    created_ts: datetime | None = None
+    expires_at: float | None = None
+    scopes: str = ""
+
+
+class ApiKeyIssuedModel(ApiKeyModel):
+    """
+    Schema of a newly issued API key.
+
+    Attributes:
+        key (str): The API key, only returned when it is issued.
+    """
+
+    key: str
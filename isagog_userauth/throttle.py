@@ -0,0 +1,189 @@
+"""
+Login throttling.
+
+Every failed /user/login attempt costs a full password hash, so an attacker
+trying credentials at a few hundred requests per second keeps every core busy.
+The failures are therefore counted per submitted identifier (email or username)
+and per client IP over a sliding window, and a login whose identifier or IP is
+over its limit is rejected with 429 before any database lookup or hash.
+
+The counters live in count-min sketches of fixed size: however many distinct
+identifiers or addresses an attacker uses, memory does not grow. A sketch can
+only overestimate a count, through hash collisions, never underestimate it;
+the width makes collisions rare enough for the limits to stay meaningful.
+
+Environment Variables:
+    LOGIN_THROTTLE_WINDOW (float): The sliding window in seconds.
+    LOGIN_MAX_FAILURES_PER_IDENTITY (int): Failures allowed per identifier, 0 disables.
+    LOGIN_MAX_FAILURES_PER_IP (int): Failures allowed per client IP, 0 disables.
+    LOGIN_THROTTLE_WIDTH (int): The number of counters per sketch row.
+    LOGIN_THROTTLE_DEPTH (int): The number of sketch rows.
+
+Classes:
+    SlidingWindowSketch: Approximate sliding-window counts in fixed memory.
+    LoginThrottle: The identity and IP limits of the login route.
+"""
+
+import hashlib
+import math
+import time
+from array import array
+
+from .config import (LOGIN_MAX_FAILURES_PER_IDENTITY, LOGIN_MAX_FAILURES_PER_IP,
+                     LOGIN_THROTTLE_DEPTH, LOGIN_THROTTLE_WIDTH,
+                     LOGIN_THROTTLE_WINDOW)
+from .models import normalize_identifier
+
+
+class SlidingWindowSketch:
+    """
+    Approximate sliding-window counts in fixed memory.
+
+    Two count-min sketches hold the counts of the current and the previous
+    fixed window. The count over the last `window` seconds is estimated as the
+    current count plus the previous count weighted by the part of the previous
+    window that still overlaps the sliding one, so old events decay linearly.
+
+    It is only used from the event loop, so it needs no locking.
+
+    Attributes:
+        width (int): The number of counters per row.
+        depth (int): The number of rows, i.e. of hash functions.
+        window (float): The sliding window in seconds.
+    """
+
+    def __init__(self, width: int, depth: int, window: float):
+        self.width = width
+        self.depth = depth
+        self.window = window
+        self._current = array("I", bytes(4 * width * depth))
+        self._previous = array("I", bytes(4 * width * depth))
+        self._window_start = self._start_of(time.time())
+
+    def _start_of(self, now: float) -> float:
+        return math.floor(now / self.window) * self.window
+
+    def _rotate(self, now: float):
+        """move to the window holding now, dropping the counts that aged out"""
+        start = self._start_of(now)
+        if start == self._window_start:
+            return
+        if start - self._window_start == self.window:
+            self._previous, self._current = self._current, self._previous
+        else:
+            self._previous = array("I", bytes(4 * self.width * self.depth))
+        self._current = array("I", bytes(4 * self.width * self.depth))
+        self._window_start = start
+
+    def _indexes(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8 * self.depth)
+        digest = digest.digest()
+        return [
+            row * self.width
+            + int.from_bytes(digest[8 * row : 8 * row + 8], "little") % self.width
+            for row in range(self.depth)
+        ]
+
+    def _counts(self, key: str) -> tuple[int, int]:
+        indexes = self._indexes(key)
+        return (
+            min(self._current[i] for i in indexes),
+            min(self._previous[i] for i in indexes),
+        )
+
+    def add(self, key: str, now: float | None = None):
+        """count one event for key"""
+        now = time.time() if now is None else now
+        self._rotate(now)
+        for i in self._indexes(key):
+            if self._current[i] < 0xFFFFFFFF:
+                self._current[i] += 1
+
+    def estimate(self, key: str, now: float | None = None) -> float:
+        """the approximate number of events of key over the last window"""
+        now = time.time() if now is None else now
+        self._rotate(now)
+        current, previous = self._counts(key)
+        overlap = 1 - (now - self._window_start) / self.window
+        return current + previous * overlap
+
+    def retry_after(self, key: str, limit: int, now: float | None = None) -> float:
+        """the seconds until the estimate of key drops below limit, if left alone"""
+        now = time.time() if now is None else now
+        self._rotate(now)
+        current, previous = self._counts(key)
+        elapsed = now - self._window_start
+        if current >= limit:
+            # wait for the next window, then for the current count to decay
+            return self.window - elapsed + self.window * (1 - limit / current)
+        if previous:
+            return max(0.0, self.window * (1 - (limit - current) / previous) - elapsed)
+        return 0.0
+
+
+class LoginThrottle:
+    """
+    The identity and IP failure limits of the login route.
+
+    Attributes:
+        max_per_identity (int): Failures allowed per identifier, 0 disables.
+        max_per_ip (int): Failures allowed per client IP, 0 disables.
+        rejected (int): The number of login attempts rejected so far.
+    """
+
+    def __init__(
+        self,
+        max_per_identity: int,
+        max_per_ip: int,
+        window: float,
+        width: int,
+        depth: int,
+    ):
+        self.max_per_identity = max_per_identity
+        self.max_per_ip = max_per_ip
+        self.rejected = 0
+        self._sketch = SlidingWindowSketch(width, depth, window)
+
+    def _limits(self, identifier: str, client_ip: str | None):
+        if self.max_per_identity:
+            # the normalization of the login lookup, so that the variants of
+            # an identity it resolves to one user share one counter
+            key = normalize_identifier(identifier.strip())
+            yield "id:" + key, self.max_per_identity
+        if self.max_per_ip and client_ip:
+            yield "ip:" + client_ip, self.max_per_ip
+
+    def check(self, identifier: str, client_ip: str | None) -> float | None:
+        """
+        Tell whether a login attempt is allowed.
+
+        Args:
+            identifier (str): The submitted email or username.
+            client_ip (str | None): The client address.
+
+        Returns:
+            float | None: None if allowed, else the seconds to wait before retrying.
+        """
+        waits = [
+            self._sketch.retry_after(key, limit)
+            for key, limit in self._limits(identifier, client_ip)
+            if self._sketch.estimate(key) >= limit
+        ]
+        if not waits:
+            return None
+        self.rejected += 1
+        return max(waits)
+
+    def record_failure(self, identifier: str, client_ip: str | None):
+        """count a failed login attempt against its identifier and client IP"""
+        for key, _ in self._limits(identifier, client_ip):
+            self._sketch.add(key)
+
+
+login_throttle = LoginThrottle(
+    LOGIN_MAX_FAILURES_PER_IDENTITY,
+    LOGIN_MAX_FAILURES_PER_IP,
+    LOGIN_THROTTLE_WINDOW,
+    LOGIN_THROTTLE_WIDTH,
+    LOGIN_THROTTLE_DEPTH,
+)
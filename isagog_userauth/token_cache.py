@@ -0,0 +1,118 @@
+"""
+In-process cache of verified JWT payloads.
+
+Clients reuse the same access token for its whole lifetime, so the signature
+check and claim validation performed by jwt.decode are repeated for identical
+input over and over. TokenCache remembers the payload of every token that
+passed verification, keyed by a digest of the token, until the token's own
+expiry. Since the key covers the whole token, signature included, a hit can
+only happen for a string that was verified before.
+
+Environment Variables:
+    TOKEN_CACHE_SIZE (int): The maximum number of cached payloads, 0 disables the cache.
+
+Classes:
+    TokenCache: A size-bounded, thread-safe LRU cache of verified token payloads.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """
+    A size-bounded, thread-safe LRU cache of verified token payloads.
+
+    Entries expire at the token's "exp" claim, and the least recently used
+    entry is evicted once the cache is full. Tokens without an "exp" claim
+    are never cached.
+
+    Attributes:
+        maxsize (int): The maximum number of cached payloads.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that required a full decode.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> dict | None:
+        """
+        Return the cached payload of a token, if it is cached and not expired.
+
+        Args:
+            token (str): The encoded JWT token.
+
+        Returns:
+            dict | None: The verified payload, which must not be mutated, or None.
+        """
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, payload: dict):
+        """
+        Cache the payload of a token that passed verification.
+
+        Args:
+            token (str): The encoded JWT token.
+            payload (dict): The verified payload.
+
+        Returns:
+            None
+        """
+        expires_at = payload.get("exp")
+        if self.maxsize <= 0 or not isinstance(expires_at, (int, float)):
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop every cached payload and reset the counters.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Report the cache occupancy and hit/miss counters.
+
+        Returns:
+            dict: The hits, misses, current size and maximum size of the cache.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
@@ -8,39 +8,67 @@ from the token.
 
 Environment Variables:
     BCRYPT_PEPPER (str): A secret string added to passwords before hashing.
-    JWT_SECRET (str): The secret key used to encode and decode JWT tokens.
+    PASSWORD_HASHER (str): The scheme of new password hashes, see the hashers module.
+    JWT_SECRET (str): The secret key used to encode and decode HS256 JWT tokens.
+    JWT_ALGORITHM (str): The signing algorithm, see the keys module for EdDSA/ES256.
     ACCESS_TOKEN_LIFETIME (int): The lifetime of an access token in minutes.
     REFRESH_TOKEN_LIFETIME (int): The lifetime of a refresh token in days.
+    STATELESS_TOKENS (bool): Authorize protected routes from token claims only.
+    TOKEN_CACHE_SIZE (int): The number of verified token payloads kept in memory.
 
 Functions:
     verify_password(plain_password, hashed_password): Verify a password against its hash.
-    get_password_hash(password): Hash a password using bcrypt with a pepper.
+    get_password_hash(password): Hash a peppered password with the configured hasher.
+    password_needs_rehash(hashed_password): Tell whether a hash has outdated settings.
     create_access_token(data, expires_delta): Create a JWT access token.
     create_refresh_token(data): Create a JWT refresh token.
-    get_current_user(token, db): Retrieve the current user from the JWT token.
+    create_token_pair(access_data, refresh_data): Create both tokens of a login.
+    token_claims(data, lifetime, now): Add the registered claims of a new token.
+    access_token_claims(user): Build the claims carried by an access token.
+    login_lookups(identifier): The statements finding the user logging in.
+    email_lookup(email): The statement finding a user by email, case-insensitively.
+    decode_token(token): Decode and verify a JWT token.
+    get_token_payload(token, db): Retrieve the verified, unrevoked bearer token payload.
+    get_current_user_row(payload, db): Retrieve the current user row from the database.
+    get_token_principal(payload): Build the current principal from token claims only.
+    get_current_user_row_async(payload, db): Asyncio variant of get_current_user_row.
+    get_current_user: get_token_principal or get_current_user_row, per STATELESS_TOKENS.
+    get_current_user_async: get_token_principal or get_current_user_row_async.
     get_admin_user(current_user): Ensure the current user has admin privileges.
+    get_admin_user_async(current_user): Asyncio variant of get_admin_user.
 """
 
-from datetime import datetime, timedelta, timezone
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
 
-import bcrypt
 import jwt
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .config import (ACCESS_TOKEN_LIFETIME, BCRYPT_PEPPER, JWT_SECRET,
-                     REFRESH_TOKEN_LIFETIME)
+from .config import (ACCESS_TOKEN_LIFETIME, BCRYPT_PEPPER,
+                     REFRESH_TOKEN_LIFETIME, STATELESS_TOKENS,
+                     TOKEN_CACHE_SIZE)
 from .custom_exceptions import ForbiddenException, MissingTokenException
-from .db_session import get_db
-from .models import User
+from .db_session import get_async_read_db, get_read_db
+from .hashers import default_hasher, identify_hasher
+from .keys import get_keyset
+from .metrics import password_hash_seconds, timed, token_rejections_total
+from .models import User, normalize_identifier
+from .revocation import is_revoked
+from .token_cache import TokenCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/login")
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
 
 
 def verify_password(plain_password, hashed_password):
     """
-    Verify a password against its hash.
+    Verify a password against its hash, with the hasher its prefix identifies.
 
     Args:
         plain_password (str): The plain text password.
@@ -49,15 +77,15 @@ def verify_password(plain_password, hashed_password):
     Returns:
         bool: True if the password matches the hash, False otherwise.
     """
-    return bcrypt.checkpw(
-        (BCRYPT_PEPPER + plain_password).encode("utf-8"),
-        hashed_password.encode("utf-8"),
-    )
+    with timed(password_hash_seconds.labels("verify")):
+        return identify_hasher(hashed_password).verify(
+            (BCRYPT_PEPPER + plain_password).encode("utf-8"), hashed_password
+        )
 
 
 def get_password_hash(password):
     """
-    Hash a password using bcrypt with a pepper.
+    Hash a password using the configured hasher (bcrypt by default) with a pepper.
 
     Args:
         password (str): The plain text password.
@@ -65,12 +93,47 @@ def get_password_hash(password):
     Returns:
         str: The hashed password.
     """
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw((BCRYPT_PEPPER + password).encode("utf-8"), salt).decode(
-        "utf-8"
+    with timed(password_hash_seconds.labels("hash")):
+        return default_hasher().hash((BCRYPT_PEPPER + password).encode("utf-8"))
+
+
+def password_needs_rehash(hashed_password):
+    """
+    Tell whether a hash was made with another scheme or other cost parameters
+    than the ones configured for new passwords.
+
+    Args:
+        hashed_password (str): The hashed password.
+
+    Returns:
+        bool: True if the password should be hashed again.
+    """
+    hasher = identify_hasher(hashed_password)
+    return hasher.name != default_hasher().name or hasher.needs_update(
+        hashed_password
     )
 
 
+def token_claims(data: dict, lifetime: timedelta, now: float) -> dict:
+    """
+    Add the registered claims of a new token to its data.
+
+    Args:
+        data (dict): The data to encode in the token.
+        lifetime (timedelta): The lifetime of the token.
+        now (float): The issue time, as a POSIX timestamp.
+
+    Returns:
+        dict: The claims, with exp in whole seconds as jwt.encode would write it.
+    """
+    return {
+        **data,
+        "exp": int(now + lifetime.total_seconds()),
+        "iat": now,
+        "jti": uuid.uuid4().hex,
+    }
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """
     Create a JWT access token.
@@ -83,15 +146,8 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     Returns:
         str: The encoded JWT token.
     """
-    to_encode = data.copy()
-    if expires_delta:
-        expires_delta = timedelta(hours=1)  # Example expires_delta
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_LIFETIME)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm="HS256")
-    return encoded_jwt
+    lifetime = expires_delta or timedelta(minutes=ACCESS_TOKEN_LIFETIME)
+    return get_keyset().sign(token_claims(data, lifetime, time.time()))
 
 
 def create_refresh_token(data: dict):
@@ -104,70 +160,314 @@ def create_refresh_token(data: dict):
     Returns:
         str: The encoded JWT token.
     """
-    expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_LIFETIME)
-    to_encode = data.copy()
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm="HS256")
-    return encoded_jwt
+    lifetime = timedelta(days=REFRESH_TOKEN_LIFETIME)
+    return get_keyset().sign(token_claims(data, lifetime, time.time()))
+
+
+def create_token_pair(access_data: dict, refresh_data: dict) -> tuple[str, str]:
+    """
+    Create the access and refresh tokens of a login, issued at the same time and
+    signed in one batch.
+
+    Args:
+        access_data (dict): The data to encode in the access token.
+        refresh_data (dict): The data to encode in the refresh token.
+
+    Returns:
+        tuple[str, str]: The encoded access and refresh tokens.
+    """
+    now = time.time()
+    access_token, refresh_token = get_keyset().sign_many(
+        (
+            token_claims(
+                access_data, timedelta(minutes=ACCESS_TOKEN_LIFETIME), now
+            ),
+            token_claims(refresh_data, timedelta(days=REFRESH_TOKEN_LIFETIME), now),
+        )
+    )
+    return access_token, refresh_token
+
+
+@dataclass(frozen=True)
+class TokenPrincipal:
+    """
+    The authenticated identity, built purely from verified access token claims.
+
+    Exposes the same attributes as User that authorization checks rely on,
+    so routes can use either interchangeably.
+
+    Attributes:
+        id (int): The primary key of the user.
+        email (str): The email address of the user (the token subject).
+        username (str): The username of the user.
+        role (str): The role of the user, either 'admin' or 'basic'.
+        token_version (int): The user's token version when the token was issued.
+    """
+
+    id: int
+    email: str
+    username: str
+    role: str
+    token_version: int
+
+
+# the claims every access token carries, and a refresh token lacks
+ACCESS_TOKEN_CLAIMS = frozenset(("sub", "id", "username", "role"))
+
+
+def access_token_claims(user: User) -> dict:
+    """
+    Build the claims carried by an access token for a user.
+
+    Args:
+        user (User): The user the token is issued to.
+
+    Returns:
+        dict: The claims needed to authorize the user without a database lookup.
+    """
+    return {
+        "sub": user.email,
+        "id": user.id,
+        "username": user.username,
+        "role": user.role,
+        "ver": user.token_version or 0,
+    }
+
+
+def login_lookups(identifier: str) -> list:
+    """
+    Build the statements finding the user who logs in with an email or username.
+
+    Each statement is an exact probe of the unique index of email_key or
+    username_key, tried in order: an identifier with an "@" is looked up as an
+    email first, then as a username; any other only as a username.
+
+    Args:
+        identifier (str): The email or username typed by the user.
+
+    Returns:
+        list[Select]: The statements to run until one returns a user.
+    """
+    key = normalize_identifier(identifier)
+    by_username = select(User).where(User.username_key == key)
+    if "@" not in key:
+        return [by_username]
+    return [select(User).where(User.email_key == key), by_username]
+
+
+def email_lookup(email: str):
+    """
+    Build the statement finding a user by email, case-insensitively.
+
+    Args:
+        email (str): The email address.
+
+    Returns:
+        Select: An exact probe of the unique index of email_key.
+    """
+    return select(User).where(User.email_key == normalize_identifier(email))
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decode and verify a JWT token, reusing the payload of recently verified tokens.
+
+    Args:
+        token (str): The encoded JWT token.
+
+    Returns:
+        dict: The verified token payload, shared with the cache and not to be mutated.
+
+    Raises:
+        jwt.PyJWTError: If the token is missing, invalid or expired.
+    """
+    if not isinstance(token, str):
+        raise jwt.DecodeError("Missing or malformed token")
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = get_keyset().verify(token)
+        token_cache.put(token, payload)
+    return payload
+
+
+async def get_token_payload(
+    token: str = Security(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> dict:
+    """
+    Retrieve the verified payload of the bearer token.
+
+    The session is only used when the revocation denylist reports a probable
+    hit, so no connection is checked out for the vast majority of requests.
+
+    Parameters:
+    token (str): The JWT token extracted from the Authorization header.
+    db (AsyncSession): The asyncio read session dependency (see get_async_read_db).
+
+    Returns:
+    dict: The verified token payload.
+
+    Raises:
+    MissingTokenException: If no token is provided in the request.
+    HTTPException: If the token is invalid, expired or revoked.
+    """
+    if not token:
+        token_rejections_total.labels("missing").inc()
+        raise MissingTokenException()
+
+    try:
+        payload = decode_token(token)
+    except jwt.PyJWTError as exc:
+        reason = "expired" if isinstance(exc, jwt.ExpiredSignatureError) else "invalid"
+        token_rejections_total.labels(reason).inc()
+        raise HTTPException(
+            status_code=401, detail="Invalid authentication credentials"
+        ) from exc
+    if await is_revoked(db, payload):
+        token_rejections_total.labels("revoked").inc()
+        raise HTTPException(
+            status_code=401, detail="Invalid authentication credentials"
+        )
+    return payload
+
 
+def stale_token_reason(user) -> str:
+    """the rejection reason of a valid token whose user is gone or changed"""
+    return "unknown_user" if user is None else "stale_version"
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Security(oauth2_scheme)
+
+def get_current_user_row(
+    payload: dict = Depends(get_token_payload), db: Session = Depends(get_read_db)
 ):
     """
-    Retrieves the current authenticated user from the provided JWT token.
+    Retrieves the current authenticated user row from the provided JWT token.
 
     This function is used as a dependency in FastAPI routes to verify the user's
-    authentication status. It decodes the JWT token to extract the user information
-    and fetches the corresponding user from the database.
+    authentication status. It fetches the user referenced by the token from the
+    database and checks that the token version has not been superseded, e.g. by
+    a password change.
 
     Parameters:
-    db (Session): The database session dependency.
-    token (str): The JWT token extracted from the Authorization header.
+    payload (dict): The verified token payload.
+    db (Session): The read session dependency (see get_read_db).
 
     Returns:
     User: The authenticated user object.
 
     Raises:
-    MissingTokenException: If no token is provided in the request.
-    HTTPException: If the token is invalid or expired, or if no user is found for the token.
+    HTTPException: If no user is found for the token or the token version is stale.
 
     Example:
     ```
-    @app.get("/protected", dependencies=[Depends(get_current_user)])
-    def protected_route(current_user: User = Depends(get_current_user)):
-        return {"message": "You have access to this JWT protected resource."}
+    @app.get("/me")
+    def me(current_user: User = Depends(get_current_user_row)):
+        return {"email": current_user.email}
     ```
 
     Note:
-    This function should be used as a dependency in routes where authentication is required.
+    Use this dependency in routes that explicitly need the full User row.
     """
-    if not token:
-        raise MissingTokenException()
+    user = db.query(User).filter(User.id == payload.get("id")).first()
+    if user is None or payload.get("ver", 0) != (user.token_version or 0):
+        token_rejections_total.labels(stale_token_reason(user)).inc()
+        raise HTTPException(
+            status_code=401, detail="Invalid authentication credentials"
+        )
+    return user
+
+
+async def get_token_principal(payload: dict = Depends(get_token_payload)):
+    """
+    Retrieves the current authenticated principal from the token claims alone.
+
+    No database access is performed, so the token must carry every claim
+    emitted by access_token_claims.
+
+    Parameters:
+    payload (dict): The verified token payload.
 
+    Returns:
+    TokenPrincipal: The authenticated principal.
+
+    Raises:
+    HTTPException: If the token lacks the claims needed to build the principal.
+    """
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        user = db.query(User).filter(User.id == payload["id"]).first()
-        if user is None:
-            raise HTTPException(
-                status_code=401, detail="Invalid authentication credentials"
-            )
-        return user
-    except jwt.PyJWTError as exc:
+        return TokenPrincipal(
+            id=payload["id"],
+            email=payload["sub"],
+            username=payload["username"],
+            role=payload["role"],
+            token_version=payload.get("ver", 0),
+        )
+    except KeyError as exc:
+        token_rejections_total.labels("invalid").inc()
         raise HTTPException(
             status_code=401, detail="Invalid authentication credentials"
         ) from exc
 
 
+async def get_current_user_row_async(
+    payload: dict = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Asyncio variant of get_current_user_row, backed by an AsyncSession.
+
+    Parameters:
+    payload (dict): The verified token payload.
+    db (AsyncSession): The asyncio read session dependency (see get_async_read_db).
+
+    Returns:
+    User: The authenticated user object.
+
+    Raises:
+    HTTPException: If no user is found for the token or the token version is stale.
+    """
+    user = await db.get(User, payload.get("id"))
+    if user is None or payload.get("ver", 0) != (user.token_version or 0):
+        token_rejections_total.labels(stale_token_reason(user)).inc()
+        raise HTTPException(
+            status_code=401, detail="Invalid authentication credentials"
+        )
+    return user
+
+
+# The dependencies used by protected routes: with STATELESS_TOKENS enabled the
+# principal is built from verified claims only, otherwise the user row is loaded.
+get_current_user = get_token_principal if STATELESS_TOKENS else get_current_user_row
+get_current_user_async = (
+    get_token_principal if STATELESS_TOKENS else get_current_user_row_async
+)
+
+
 def get_admin_user(current_user: User = Depends(get_current_user)):
     """
     Ensure the current user has admin privileges.
 
     Args:
-        current_user (User): The current authenticated user.
+        current_user (User | TokenPrincipal): The current authenticated user.
+
+    Returns:
+        User | TokenPrincipal: The current user if they have admin privileges.
+
+    Raises:
+        HTTPException: If the current user does not have admin privileges.
+    """
+    if current_user.role != "admin":
+        raise ForbiddenException()
+    return current_user
+
+
+async def get_admin_user_async(current_user: User = Depends(get_current_user_async)):
+    """
+    Asyncio variant of get_admin_user, running on the event loop.
+
+    Args:
+        current_user (User | TokenPrincipal): The current authenticated user.
 
     Returns:
-        User: The current user if they have admin privileges.
+        User | TokenPrincipal: The current user if they have admin privileges.
 
     Raises:
         HTTPException: If the current user does not have admin privileges.
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from isagog_userauth.db_session import (get_async_db, get_async_read_db, get_db,
+                                        get_read_db)
+from isagog_userauth.main import app
+from isagog_userauth.metrics import instrument_engine
+from isagog_userauth.models import Base, User
+from isagog_userauth.revocation import revocations
+from isagog_userauth.utils import get_password_hash, token_cache
+
+
+@pytest.fixture(scope="module")
+def session_factory(tmp_path_factory):
+    """the sessionmaker of a temporary SQLite database, used by the app in place
+    of the configured one until the end of the test module"""
+    path = tmp_path_factory.mktemp("db") / "users.db"
+    engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}
+    )
+    # TestClient may run each request on its own event loop, so avoid pooling
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", poolclass=NullPool
+    )
+    instrument_engine(async_engine.sync_engine)
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autoflush=False, bind=engine)
+    TestingAsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    overrides = {
+        get_db: override_get_db,
+        get_async_db: override_get_async_db,
+        get_read_db: override_get_db,
+        get_async_read_db: override_get_async_db,
+    }
+    app.dependency_overrides.update(overrides)
+    # the in-memory views of the revocation tables and of verified tokens
+    # refer to the user ids of the previous database
+    revocations.rebuild((), ())
+    token_cache.clear()
+    yield TestingSessionLocal
+
+    for dependency in overrides:
+        app.dependency_overrides.pop(dependency, None)
+    revocations.rebuild((), ())
+    token_cache.clear()
+    engine.dispose()
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture(scope="module")
+def add_user(session_factory):
+    """a function adding a user to the temporary database, returning its id"""
+
+    def add(username, password, role="basic", email=None):
+        with session_factory() as db:
+            user = User(
+                email=email or f"{username}@example.com",
+                username=username,
+                password=get_password_hash(password),
+                role=role,
+            )
+            db.add(user)
+            db.commit()
+            return user.id
+
+    return add
+
+
+@pytest.fixture(scope="module")
+def client(add_user):
+    """a client of the app on a temporary database seeded with a basic user,
+    testuser, and an admin, testadmin"""
+    add_user("testuser", "testpassword")
+    add_user("testadmin", "adminpassword", role="admin")
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def admin_headers(client):
+    """the authorization header of testadmin"""
+    tokens = client.post(
+        "/user/login", data={"username": "testadmin", "password": "adminpassword"}
+    ).json()
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
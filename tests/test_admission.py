@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from isagog_userauth.admission import AdmissionLimiter
+from isagog_userauth.custom_exceptions import ServiceUnavailableException
+
+
+def test_bounded_queue_and_queue_time():
+    async def scenario():
+        limiter = AdmissionLimiter(capacity=1, max_queue=1, max_queue_time=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 1
+
+        with pytest.raises(ServiceUnavailableException) as full:
+            await limiter.acquire()
+        assert full.value.status_code == 503
+        assert "Retry-After" in full.value.headers
+
+        with pytest.raises(ServiceUnavailableException):
+            await waiter  # the slot is not released within max_queue_time
+        release.set()
+        await holder
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 0 and stats["queued"] == 0
+    assert stats["admitted"] == 1
+    assert stats["rejected_queue_full"] == 1
+    assert stats["rejected_queue_time"] == 1
+
+
+def test_slot_handed_over_in_order():
+    async def scenario():
+        limiter = AdmissionLimiter(capacity=1, max_queue=10, max_queue_time=1)
+        order = []
+
+        async def work(name):
+            async with limiter.slot():
+                order.append(name)
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(*(work(name) for name in "abc"))
+        return order, limiter.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert stats["admitted"] == 3 and stats["active"] == 0
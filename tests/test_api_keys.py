@@ -0,0 +1,77 @@
+from isagog_userauth.api_keys import generate_api_key, key_digest, parse_api_key
+
+
+def test_generated_key_parses_back():
+    key, prefix, digest = generate_api_key()
+    assert parse_api_key(key) == (prefix, key.split("_", 2)[2])
+    assert key_digest(parse_api_key(key)[1]) == digest
+    assert len(digest) == 64
+
+
+def test_malformed_keys_are_rejected():
+    for key in ("", "isk_short_secret", "abc_0123456789ab_secret", "isk_0123456789ab_"):
+        assert parse_api_key(key) is None
+
+
+def test_api_keys(client, admin_headers):
+    response = client.post(
+        "/admin/api-keys",
+        json={"email": "TestUser@Example.com", "name": "ci"},
+        headers=admin_headers,
+    )
+    assert response.status_code == 200
+    issued = response.json()
+    assert issued["key"].startswith(f"isk_{issued['prefix']}_")
+
+    key_headers = {"X-API-Key": issued["key"]}
+    assert client.get("/protected", headers=key_headers).status_code == 200
+    assert client.get("/protected", headers=admin_headers).status_code == 200
+    forged = {"X-API-Key": issued["key"][:-2] + "xx"}
+    assert client.get("/protected", headers=forged).status_code == 401
+    # routes depending on get_current_user_async only accept bearer tokens
+    assert client.get("/superprotected", headers=key_headers).status_code == 401
+
+    listed = client.get("/admin/api-keys", headers=admin_headers).json()
+    assert [key["prefix"] for key in listed] == [issued["prefix"]]
+    assert "key" not in listed[0]
+
+    response = client.delete(f"/admin/api-keys/{issued['id']}", headers=admin_headers)
+    assert response.json() == {"message": "API key revoked successfully"}
+    assert client.get("/protected", headers=key_headers).status_code == 401
+
+
+def test_deleted_user_api_keys_do_not_pass_to_a_reused_id(client, admin_headers):
+    def signup(name, role):
+        client.post(
+            "/user/signup",
+            json={
+                "email": f"{name}@example.com",
+                "username": name,
+                "password": "password",
+                "role": role,
+            },
+            headers=admin_headers,
+        )
+        page = client.get(
+            "/user/list", params={"username_prefix": name}, headers=admin_headers
+        )
+        return page.json()[0]["id"]
+
+    holder_id = signup("keyholder", "basic")
+    key = client.post(
+        "/admin/api-keys",
+        json={"email": "keyholder@example.com", "name": "ci"},
+        headers=admin_headers,
+    ).json()["key"]
+    response = client.request(
+        "DELETE", "/user/delete", json={"id": holder_id}, headers=admin_headers
+    )
+    assert response.status_code == 200
+
+    # SQLite hands the id of the deleted (highest) row to the next user
+    newcomer_id = signup("newcomer", "admin")
+    assert newcomer_id == holder_id
+    assert client.get("/protected", headers={"X-API-Key": key}).status_code == 401
+    client.request(
+        "DELETE", "/user/delete", json={"id": newcomer_id}, headers=admin_headers
+    )
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import timezone
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from isagog_userauth import audit as audit_module
+from isagog_userauth.base import Base
+from isagog_userauth.db_session import build_async_engine, build_engine
+from isagog_userauth.metrics import audit_events_dropped_total
+from isagog_userauth.models import AuditEvent, User
+
+
+@pytest.fixture
+def audit_log(monkeypatch):
+    log = audit_module.AuditLog(max_size=4, batch_size=2)
+    monkeypatch.setattr(audit_module, "audit_log", log)
+    return log
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path}/audit.db")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User), [{"email": "a@b.c", "username": "a", "password": "x"}]
+        )
+    yield engine
+    engine.dispose()
+
+
+def test_full_queue_drops_events(audit_log):
+    dropped = audit_events_dropped_total.labels("queue_full")
+    before = dropped.value
+    results = [audit_module.audit("login", "bad_password") for _ in range(5)]
+    assert results == [True] * 4 + [False]
+    assert dropped.value == before + 1
+    assert audit_log.stats() == {"queued": 4, "written": 0}
+
+
+def test_writer_batches_events_and_drains_on_stop(audit_log, database, tmp_path):
+    async def scenario():
+        engine = build_async_engine(f"sqlite+aiosqlite:///{tmp_path}/audit.db")
+        writer = asyncio.create_task(
+            audit_module.run_audit_writer(async_sessionmaker(engine))
+        )
+        await asyncio.sleep(0)
+        audit_module.audit("login", user_id=1, identifier="a", client_ip="10.0.0.1")
+        audit_module.audit("login", user_id=1)  # the latest login
+        audit_module.audit("login", "bad_password", user_id=1)
+        audit_module.audit("user.delete", user_id=2, actor_id=1)
+        audit_log.stop()
+        await writer
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+    assert audit_log.stats() == {"queued": 0, "written": 4}
+    with database.connect() as connection:
+        events = connection.execute(select(AuditEvent).order_by(AuditEvent.id)).all()
+        last_login_ts = connection.scalar(select(User.last_login_ts))
+    assert [(e.action, e.outcome) for e in events] == [
+        ("login", "success"),
+        ("login", "success"),
+        ("login", "bad_password"),
+        ("user.delete", "success"),
+    ]
+    assert events[0].identifier == "a" and events[3].actor_id == 1
+    last_login_ts = last_login_ts.replace(tzinfo=timezone.utc).timestamp()
+    assert last_login_ts == pytest.approx(events[1].ts, abs=1e-3)
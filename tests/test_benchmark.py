@@ -0,0 +1,23 @@
+from benchmarks.bench_auth import compare_results, percentile
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.95) == 0
+
+
+def test_compare_results_flags_regressions():
+    baseline = [
+        {"scenario": "protected", "concurrency": 8, "ops_per_sec": 1000, "p95_ms": 10},
+        {"scenario": "login_valid", "concurrency": 8, "ops_per_sec": 50, "p95_ms": 200},
+    ]
+    results = [
+        {"scenario": "protected", "concurrency": 8, "ops_per_sec": 950, "p95_ms": 10.5},
+        {"scenario": "login_valid", "concurrency": 8, "ops_per_sec": 40, "p95_ms": 260},
+        {"scenario": "list", "concurrency": 8, "ops_per_sec": 1, "p95_ms": 1000},
+    ]
+    regressions = compare_results(results, baseline, threshold=0.10)
+    assert len(regressions) == 2
+    assert all(r.startswith("login_valid at concurrency 8") for r in regressions)
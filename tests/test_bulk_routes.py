@@ -0,0 +1,112 @@
+from isagog_userauth.config import BULK_MAX_PASSWORD_RESETS
+from isagog_userauth.routers import user as user_router
+
+
+def test_bulk_import(client, admin_headers, monkeypatch):
+    headers = {**admin_headers, "Content-Type": "text/csv"}
+    body = (
+        "email,username,password,role\n"
+        "bulk1@example.com,bulk1,pw1,\n"
+        "bulk2@example.com,bulk2,pw2,admin\n"
+        "testuser@example.com,bulk3,pw3,basic\n"
+        "bulk1@example.com,bulk4,pw4,basic\n"
+        "bulk5@example.com,bulk5,pw5,root\n"
+        "not-an-email,bulk6,pw6,basic\n"
+    )
+    report = client.post("/user/import", content=body, headers=headers).json()
+    assert (report["created"], report["duplicate"], report["invalid"]) == (2, 2, 2)
+    assert [result["status"] for result in report["results"]] == [
+        "created",
+        "created",
+        "duplicate",
+        "duplicate",
+        "invalid",
+        "invalid",
+    ]
+    response = client.post(
+        "/user/login", data={"username": "bulk2", "password": "pw2"}
+    )
+    assert response.json()["role"] == "admin"
+
+    headers["Content-Type"] = "application/x-ndjson"
+    body = '{"email": 123, "username": "bulk7", "password": "pw7"}\n{"username": 5}\n'
+    response = client.post("/user/import", content=body, headers=headers)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [(r.get("email"), r.get("username"), r["status"]) for r in results] == [
+        ("123", "bulk7", "invalid"),
+        (None, "5", "invalid"),
+    ]
+
+    monkeypatch.setattr(user_router, "IMPORT_MAX_ROWS", 1)
+    response = client.post("/user/import", content=body, headers=headers)
+    assert response.status_code == 413
+
+
+def test_bulk_admin_mutations(client, admin_headers):
+    for name in ("bulka", "bulkb", "bulkc"):
+        client.post(
+            "/user/signup",
+            json={"email": f"{name}@example.com", "username": name, "password": "pw"},
+            headers=admin_headers,
+        )
+    ids = {
+        user["username"]: user["id"]
+        for user in client.get(
+            "/user/list", params={"username_prefix": "bulk"}, headers=admin_headers
+        ).json()
+    }
+
+    response = client.put(
+        "/user/bulk/role",
+        json={
+            "ids": [ids["bulka"], 999999],
+            "emails": ["BulkB@Example.com"],  # emails match ignoring case
+            "role": "admin",
+        },
+        headers=admin_headers,
+    )
+    assert [result["status"] for result in response.json()["results"]] == [
+        "updated",
+        "not_found",
+        "updated",
+    ]
+
+    response = client.put(
+        "/user/bulk/passchange",
+        json={
+            "users": [
+                {"email": "BULKC@example.com", "new_password": "newpw"},
+                {"email": "nobody@example.com", "new_password": "newpw"},
+            ]
+        },
+        headers=admin_headers,
+    )
+    assert [result["status"] for result in response.json()["results"]] == [
+        "updated",
+        "not_found",
+    ]
+    response = client.post(
+        "/user/login", data={"username": "bulkc", "password": "newpw"}
+    )
+    assert response.status_code == 200
+
+    too_many = [{"email": "bulkc@example.com", "new_password": "pw"}] * (
+        BULK_MAX_PASSWORD_RESETS + 1
+    )
+    response = client.put(
+        "/user/bulk/passchange", json={"users": too_many}, headers=admin_headers
+    )
+    assert response.status_code == 422
+
+    response = client.request(
+        "DELETE",
+        "/user/bulk/delete",
+        json={"ids": [ids["bulka"], ids["bulkb"]], "emails": ["Bulkc@example.com"]},
+        headers=admin_headers,
+    )
+    assert {result["status"] for result in response.json()["results"]} == {"deleted"}
+    remaining = client.get(
+        "/user/list", params={"username_prefix": "bulk"}, headers=admin_headers
+    ).json()
+    assert not {"bulka", "bulkb", "bulkc"} & {user["username"] for user in remaining}
@@ -0,0 +1,159 @@
+import dataclasses
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from isagog_userauth import database, db_session
+from isagog_userauth.base import Base
+from isagog_userauth.config import Settings, get_settings
+from isagog_userauth.db_session import (build_engine, get_async_engine,
+                                        get_async_read_sessionmaker,
+                                        get_async_sessionmaker, get_engine,
+                                        get_read_sessionmaker, get_sessionmaker)
+from isagog_userauth.models import User, normalize_identifier
+from isagog_userauth.utils import email_lookup, login_lookups
+
+
+LAZY_FACTORIES = (
+    get_engine,
+    get_sessionmaker,
+    get_async_engine,
+    get_async_sessionmaker,
+    get_read_sessionmaker,
+    get_async_read_sessionmaker,
+)
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """settings of a temporary SQLite database without replica, in force for the
+    lazily built engines and init_db until the end of the test"""
+    settings = dataclasses.replace(
+        get_settings(),
+        user_db_url=f"sqlite:///{tmp_path}/users.db",
+        user_async_db_url=None,
+        user_read_db_url=None,
+        user_async_read_db_url=None,
+        init_db_lock_file="",
+        admin_password=None,
+    )
+    monkeypatch.setattr(db_session, "get_settings", lambda: settings)
+    monkeypatch.setattr(database, "get_settings", lambda: settings)
+    for factory in LAZY_FACTORIES:
+        factory.cache_clear()
+    yield settings
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    for factory in LAZY_FACTORIES:
+        factory.cache_clear()
+
+
+def test_settings_from_env():
+    settings = Settings.from_env(
+        {"STATELESS_TOKENS": "yes", "DB_POOL_SIZE": "3", "PROFILE_SAMPLE_RATE": "0.5"}
+    )
+    assert settings.stateless_tokens is True
+    assert settings.db_pool_size == 3
+    assert settings.profile_sample_rate == 0.5
+    assert settings.user_table_name == "users"
+    with pytest.raises(ValueError):
+        Settings.from_env({"DB_POOL_SIZE": "ten"})
+
+
+def test_init_db_is_a_single_query_once_initialized(settings, monkeypatch):
+    settings = dataclasses.replace(
+        settings,
+        admin_email="init-admin@example.com",
+        admin_username="init-admin",
+        admin_password="init-password",
+    )
+    monkeypatch.setattr(database, "get_settings", lambda: settings)
+    hashes = []
+    monkeypatch.setattr(
+        database, "get_password_hash", lambda password: hashes.append(password) or "x"
+    )
+
+    database.init_db()
+    assert hashes == ["init-password"]
+    with get_sessionmaker()() as db:
+        admin = db.query(User).filter(User.email == "init-admin@example.com").one()
+        assert admin.role == "admin"
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the schema is up to date")
+
+    monkeypatch.setattr(database.Base.metadata, "create_all", fail)
+    monkeypatch.setattr(database, "init_lock", fail)
+    database.init_db()
+    assert hashes == ["init-password"]  # the admin exists, nothing is hashed
+
+
+def test_login_lookups_are_index_probes():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    statements = [
+        *login_lookups("Someone@Example.com"),
+        *login_lookups("Someone"),
+        email_lookup("someone@example.com"),
+        update(User)
+        .where(User.email_key == normalize_identifier("Someone@Example.com"))
+        .values(password="x"),
+    ]
+    with engine.connect() as connection:
+        for statement in statements:
+            sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+            details = [row[-1] for row in plan]
+            assert details and all("USING" in detail for detail in details), details
+            assert not any(detail.startswith("SCAN") for detail in details), details
+
+
+@pytest.mark.usefixtures("settings")
+def test_backfill_identifier_keys():
+    database.create_tables()
+    # rows of a database created before the keys existed; the emails only
+    # differ in case
+    old_rows = [("Backfill@Example.com", "Backfill"), ("backfill@example.COM", "b2")]
+    with get_sessionmaker()() as db:
+        for email, username in old_rows:
+            db.execute(
+                insert(User.__table__).values(
+                    email=email,
+                    username=username,
+                    password="x",
+                    email_key=None,
+                    username_key=None,
+                )
+            )
+        db.commit()
+
+    skipped = database.backfill_identifier_keys(batch_size=1)
+
+    with get_sessionmaker()() as db:
+        users = db.scalars(select(User).order_by(User.id)).all()
+        assert [user.email_key for user in users] == ["backfill@example.com", None]
+        assert users[0].username_key == "backfill"
+        assert skipped == [users[1].id]
+
+
+@pytest.mark.usefixtures("settings")
+def test_read_sessions_fall_back_to_the_primary_and_replicas_are_read_only(tmp_path):
+    assert get_read_sessionmaker() is get_sessionmaker()
+    assert get_async_read_sessionmaker() is get_async_sessionmaker()
+
+    primary = sqlite3.connect(tmp_path / "primary.db")
+    with primary:
+        primary.execute("CREATE TABLE t (x INTEGER)")
+        primary.execute("INSERT INTO t VALUES (1)")
+    # a plain copy of the primary serves as the replica
+    primary.execute(f"VACUUM INTO '{tmp_path / 'replica.db'}'")
+    primary.close()
+
+    replica = build_engine(f"sqlite:///{tmp_path}/replica.db", read_only=True)
+    with replica.connect() as connection:
+        assert connection.exec_driver_sql("SELECT x FROM t").scalar() == 1
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("INSERT INTO t VALUES (2)")
+    replica.dispose()
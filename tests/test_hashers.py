@@ -0,0 +1,54 @@
+import pytest
+
+from isagog_userauth.hashers import (BcryptHasher, ScryptHasher, calibrate,
+                                     identify_hasher)
+from isagog_userauth.utils import (get_password_hash, password_needs_rehash,
+                                   verify_password)
+
+
+def test_scrypt_roundtrip_and_parameters():
+    hasher = ScryptHasher(log_n=10, r=8, p=1)
+    hashed = hasher.hash(b"secret")
+
+    assert hashed.startswith("$scrypt$ln=10,r=8,p=1$")
+    assert hasher.verify(b"secret", hashed)
+    assert not hasher.verify(b"wrong", hashed)
+    assert not hasher.needs_update(hashed)
+    assert ScryptHasher(log_n=11).needs_update(hashed)
+
+
+def test_verifier_chosen_by_prefix():
+    legacy = BcryptHasher(rounds=4).hash(b"secret")
+    assert identify_hasher(legacy).name == "bcrypt"
+    assert BcryptHasher(rounds=4).needs_update(legacy) is False
+    assert password_needs_rehash(legacy)  # 4 rounds instead of the configured 12
+    assert not password_needs_rehash(get_password_hash("secret"))
+    with pytest.raises(ValueError):
+        verify_password("secret", "plaintext")
+
+
+def test_calibrate_stops_at_the_target():
+    params, elapsed = calibrate("bcrypt", target_ms=1)
+    assert params == {"rounds": 4} or elapsed <= 1
+
+
+@pytest.mark.parametrize(
+    "hashed",
+    [
+        "$scrypt$",
+        "$scrypt$ln=10,r=8$c2FsdA$a2V5",
+        "$scrypt$ln=x,r=8,p=1$c2FsdA$a2V5",
+        "$scrypt$ln=10,r=8,p=1$not base64!$a2V5",
+    ],
+)
+def test_scrypt_rejects_malformed_hashes(hashed):
+    assert ScryptHasher(log_n=10).verify(b"secret", hashed) is False
+
+
+def test_argon2_rejects_malformed_hashes():
+    pytest.importorskip("argon2")
+    from isagog_userauth.hashers import Argon2Hasher
+
+    hasher = Argon2Hasher(time_cost=1, memory_cost=8, parallelism=1)
+    assert hasher.verify(b"secret", hasher.hash(b"secret"))
+    assert hasher.verify(b"secret", "$argon2id$v=19$garbage") is False
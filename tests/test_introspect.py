@@ -0,0 +1,80 @@
+import pytest
+
+from isagog_userauth.config import INTROSPECT_MAX_TOKENS
+
+
+@pytest.fixture(scope="module")
+def basic(client):
+    """the tokens of testuser"""
+    return client.post(
+        "/user/login", data={"username": "testuser", "password": "testpassword"}
+    ).json()
+
+
+def test_introspect(client, admin_headers, basic):
+    admin_token = admin_headers["Authorization"].split()[1]
+    response = client.post(
+        "/user/introspect",
+        json={
+            "tokens": [
+                {"token": basic["access_token"]},
+                {"token": basic["access_token"], "role": "admin"},
+                {"token": admin_token, "role": "admin"},
+                {"token": "not.a.token"},
+                {"token": basic["refresh_token"]},
+            ]
+        },
+        headers=admin_headers,
+    )
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [
+        "active",
+        "forbidden",
+        "active",
+        "invalid",
+        "invalid",
+    ]
+    assert [result["active"] for result in results] == [
+        True,
+        False,
+        True,
+        False,
+        False,
+    ]
+    assert results[0]["claims"]["username"] == "testuser"
+
+
+def test_introspect_with_a_scoped_api_key(client, admin_headers, basic):
+    # a gateway holds an API key of the introspect scope, not an admin token
+    keys = {
+        scopes: client.post(
+            "/admin/api-keys",
+            json={"email": "testuser@example.com", "name": "gw", "scopes": scopes},
+            headers=admin_headers,
+        ).json()
+        for scopes in ((), ("introspect",))
+    }
+    assert keys[("introspect",)]["scopes"] == "introspect"
+    body = {"tokens": [{"token": basic["access_token"]}]}
+    response = client.post(
+        "/user/introspect",
+        json=body,
+        headers={"X-API-Key": keys[("introspect",)]["key"]},
+    )
+    assert response.json()["results"][0]["status"] == "active"
+    response = client.post(
+        "/user/introspect", json=body, headers={"X-API-Key": keys[()]["key"]}
+    )
+    assert response.status_code == 403
+    response = client.post(
+        "/user/introspect",
+        json=body,
+        headers={"Authorization": f"Bearer {basic['access_token']}"},
+    )
+    assert response.status_code == 403
+
+
+def test_introspect_token_limit(client, admin_headers):
+    too_many = {"tokens": [{"token": "x"}] * (INTROSPECT_MAX_TOKENS + 1)}
+    response = client.post("/user/introspect", json=too_many, headers=admin_headers)
+    assert response.status_code == 422
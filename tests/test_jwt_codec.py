@@ -0,0 +1,73 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+
+from benchmarks.bench_jwt import run_benchmarks
+from isagog_userauth.keys import HS256Codec, KeySet
+from isagog_userauth.utils import token_claims
+
+SECRET = "codec-secret-of-at-least-thirty-two-bytes"
+
+
+@pytest.fixture
+def codec():
+    return HS256Codec(SECRET)
+
+
+def test_encodes_like_pyjwt(codec):
+    claims = token_claims({"sub": "é@b.c", "id": 1}, timedelta(minutes=5), time.time())
+    assert codec.encode(claims) == jwt.encode(claims, SECRET, algorithm="HS256")
+    expire = datetime.now(timezone.utc) + timedelta(minutes=1)
+    assert codec.encode({"exp": expire}) == jwt.encode(
+        {"exp": expire}, SECRET, algorithm="HS256"
+    )
+    payloads = [claims, {"sub": "x"}]
+    assert codec.encode_many(payloads) == [
+        jwt.encode(payload, SECRET, algorithm="HS256") for payload in payloads
+    ]
+
+
+def test_decodes_like_pyjwt(codec):
+    claims = token_claims({"sub": "a@b.c"}, timedelta(minutes=5), time.time())
+    assert codec.decode(jwt.encode(claims, SECRET, algorithm="HS256")) == claims
+    # another header, e.g. with a kid, goes through PyJWT
+    token = jwt.encode(claims, SECRET, algorithm="HS256", headers={"kid": "k"})
+    assert codec.decode(token) == claims
+
+    expired = codec.encode({"sub": "a@b.c", "exp": int(time.time()) - 1})
+    with pytest.raises(jwt.ExpiredSignatureError):
+        codec.decode(expired)
+    with pytest.raises(jwt.InvalidTokenError):
+        codec.decode(codec.encode({"sub": 1}))
+    with pytest.raises(jwt.DecodeError):
+        codec.decode("not a token")
+
+
+def test_rejects_forgeries(codec):
+    claims = {"sub": "a@b.c", "role": "admin"}
+    with pytest.raises(jwt.InvalidSignatureError):
+        codec.decode(HS256Codec("another-secret-of-thirty-two-bytes!").encode(claims))
+    header, payload, signature = codec.encode(claims).split(".")
+    with pytest.raises(jwt.InvalidSignatureError):
+        codec.decode(f"{header}.{payload}x.{signature}")
+    unsigned = jwt.encode(claims, None, algorithm="none")
+    with pytest.raises(jwt.InvalidTokenError):
+        codec.decode(unsigned)
+    hs512 = jwt.encode(claims, SECRET, algorithm="HS512")
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        codec.decode(hs512)
+
+
+def test_keyset_signs_with_the_codec():
+    keyset = KeySet.from_secret(SECRET)
+    assert keyset.codec is not None
+    access, refresh = keyset.sign_many([{"sub": "a"}, {"sub": "b"}])
+    assert keyset.verify(access) == {"sub": "a"}
+    assert jwt.decode(refresh, SECRET, algorithms=["HS256"]) == {"sub": "b"}
+
+
+def test_benchmark_runs():
+    results = run_benchmarks(iterations=10)
+    assert [r["operation"] for r in results] == ["encode", "encode_pair", "decode"]
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+
+pytest.importorskip("cryptography")
+
+from isagog_userauth.keys import KeySet, generate_key
+
+
+@pytest.fixture
+def keys_dir(tmp_path):
+    for kid in ("2024-01", "2024-02"):
+        (tmp_path / f"{kid}.pem").write_bytes(generate_key("EdDSA"))
+    return tmp_path
+
+
+def test_rotation_by_kid(keys_dir):
+    expire = datetime.now(timezone.utc) + timedelta(minutes=1)
+    payload = {"sub": "a@b.c", "exp": expire}
+    old = KeySet.from_directory("EdDSA", str(keys_dir), "2024-01")
+    new = KeySet.from_directory("EdDSA", str(keys_dir), "2024-02")
+    old_token = old.sign(payload)
+
+    assert jwt.get_unverified_header(old_token)["kid"] == "2024-01"
+    assert new.verify(old_token)["sub"] == "a@b.c"
+    assert [key["kid"] for key in json.loads(new.jwks)["keys"]] == [
+        "2024-01",
+        "2024-02",
+    ]
+
+    (keys_dir / "2024-01.pem").unlink()
+    retired = KeySet.from_directory("EdDSA", str(keys_dir), "2024-02")
+    with pytest.raises(jwt.InvalidTokenError):
+        retired.verify(old_token)
+
+
+def test_rejects_algorithm_confusion(keys_dir):
+    keyset = KeySet.from_directory("EdDSA", str(keys_dir), "2024-01")
+    forged = jwt.encode(
+        {"sub": "a@b.c"},
+        "not-the-key" * 4,
+        algorithm="HS256",
+        headers={"kid": "2024-01"},
+    )
+    with pytest.raises(jwt.InvalidTokenError):
+        keyset.verify(forged)
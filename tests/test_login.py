@@ -1,55 +1,9 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from isagog_userauth.main import app
-from isagog_userauth.models import Base, User
-from isagog_userauth.utils import get_password_hash
-from isagog_userauth.db_session import get_db
-
-# Setup an in-memory SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-# Dependency override to use the test database
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-
-app.dependency_overrides[get_db] = override_get_db
-
-
-@pytest.fixture(scope="module")
-def client():
-    Base.metadata.create_all(bind=engine)
-    client = TestClient(app)
-
-    # Create a test user
-    db = TestingSessionLocal()
-    test_user = User(
-        email="testuser@example.com",
-        username="testuser",
-        password=get_password_hash("testpassword"),
-        role="basic",
-    )
-    db.add(test_user)
-    db.commit()
-    db.refresh(test_user)
-    db.close()
-
-    yield client
-
-    # Drop the tables after tests
-    Base.metadata.drop_all(bind=engine)
+from isagog_userauth.config import BCRYPT_PEPPER, LOGIN_MAX_FAILURES_PER_IDENTITY
+from isagog_userauth.hashers import BcryptHasher
+from isagog_userauth.models import User
+from isagog_userauth.utils import verify_password
 
 
 def test_login(client):
@@ -78,3 +32,142 @@ def test_login(client):
         assert "sub" in refresh_token_payload
     except jwt.PyJWTError as e:
         pytest.fail(f"JWT token verification failed: {e}")
+
+
+def test_stateless_principal_from_access_token(client):
+    import asyncio
+
+    from isagog_userauth.utils import decode_token, get_token_principal
+
+    response = client.post(
+        "/user/login", data={"username": "testuser", "password": "testpassword"}
+    )
+    payload = decode_token(response.json()["access_token"])
+    principal = asyncio.run(get_token_principal(payload))
+    assert principal.username == "testuser"
+    assert principal.email == "testuser@example.com"
+    assert principal.role == "basic"
+
+
+def test_password_change_invalidates_tokens(client, add_user):
+    add_user("changer", "oldpassword")
+    tokens = client.post(
+        "/user/login", data={"username": "changer", "password": "oldpassword"}
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/protected", headers=headers).status_code == 200
+
+    response = client.put(
+        "/user/passchange",
+        json={"email": "changer@example.com", "new_password": "newpassword"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert client.get("/protected", headers=headers).status_code == 401
+    response = client.post(
+        "/user/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+    response = client.post(
+        "/user/login", data={"username": "changer", "password": "newpassword"}
+    )
+    assert response.status_code == 200
+
+
+def test_admin_writes(client):
+    tokens = client.post(
+        "/user/login", data={"username": "testadmin", "password": "adminpassword"}
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    new_user = {"email": "new@example.com", "username": "newuser", "password": "pw"}
+
+    response = client.post("/user/signup", json=new_user, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "email": "new@example.com",
+        "username": "newuser",
+        "role": "basic",
+    }
+    response = client.post(
+        "/user/signup", json={**new_user, "username": "other"}, headers=headers
+    )
+    assert response.json()["detail"] == "Email already registered"
+    response = client.post(
+        "/user/signup",
+        json={**new_user, "email": "other@example.com"},
+        headers=headers,
+    )
+    assert response.json()["detail"] == "Username already taken"
+
+    response = client.put(
+        "/user/passchange",
+        json={"email": "missing@example.com", "new_password": "pw"},
+        headers=headers,
+    )
+    assert response.status_code == 404
+
+    users = client.get("/user/list", headers=headers).json()
+    new_id = next(user["id"] for user in users if user["username"] == "newuser")
+    response = client.request(
+        "DELETE", "/user/delete", json={"id": new_id}, headers=headers
+    )
+    assert response.status_code == 200
+    response = client.request(
+        "DELETE", "/user/delete", json={"id": new_id}, headers=headers
+    )
+    assert response.status_code == 404
+
+
+def test_login_rehashes_outdated_password(client, session_factory):
+    db = session_factory()
+    db.add(
+        User(
+            email="legacy@example.com",
+            username="legacy",
+            password=BcryptHasher(rounds=4).hash(
+                (BCRYPT_PEPPER + "legacypassword").encode("utf-8")
+            ),
+            role="basic",
+        )
+    )
+    db.commit()
+
+    response = client.post(
+        "/user/login", data={"username": "legacy", "password": "legacypassword"}
+    )
+    assert response.status_code == 200
+    db.expire_all()
+    user = db.query(User).filter(User.username == "legacy").one()
+    db.close()
+    assert user.password.startswith("$2b$12$")
+    assert verify_password("legacypassword", user.password)
+
+
+def test_login_throttled_after_failures(client):
+    for _ in range(LOGIN_MAX_FAILURES_PER_IDENTITY):
+        response = client.post(
+            "/user/login", data={"username": "nobody", "password": "guess"}
+        )
+        assert response.status_code == 401
+
+    response = client.post(
+        "/user/login", data={"username": "nobody", "password": "guess"}
+    )
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_refresh_without_token(client):
+    for body in ({}, {"refresh_token": None}, {"refresh_token": 42}):
+        response = client.post("/user/refresh", json=body)
+        assert response.status_code == 401
+
+
+def test_login_ignores_case(client):
+    for identifier in ("TestUser", "TESTUSER@example.com"):
+        response = client.post(
+            "/user/login", data={"username": identifier, "password": "testpassword"}
+        )
+        assert response.status_code == 200
+        assert response.json()["role"] == "basic"
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from isagog_userauth.config import LOGIN_MAX_FAILURES_PER_IDENTITY
+from isagog_userauth.metrics import Counter, Histogram, instrument_engine
+
+
+def test_histogram_and_counter_exposition():
+    histogram = Histogram(
+        "test_latency_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0)
+    )
+    series = histogram.labels('/a"b')
+    for value in (0.05, 0.5, 5.0):
+        series.observe(value)
+    counter = Counter("test_events_total", "Test events.")
+    counter.labels().inc()
+    counter.labels().inc(2)
+
+    assert histogram.collect() == [
+        "# HELP test_latency_seconds Test latency.",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="/a\\"b",le="1"} 2',
+        'test_latency_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+        'test_latency_seconds_sum{route="/a\\"b"} 5.55',
+        'test_latency_seconds_count{route="/a\\"b"} 3',
+    ]
+    assert counter.collect()[-1] == "test_events_total 3"
+
+
+def test_instrumented_engine_forgets_failed_statements():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM missing"))
+        assert connection.info["query_start"] == []
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+    engine.dispose()
+
+
+def test_metrics(client, add_user):
+    # produce every series asserted below
+    add_user("counted", "password")
+    tokens = client.post(
+        "/user/login", data={"username": "counted", "password": "password"}
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    client.post("/user/logout", json={}, headers=headers)
+    assert client.get("/protected", headers=headers).status_code == 401
+    for _ in range(LOGIN_MAX_FAILURES_PER_IDENTITY + 1):
+        response = client.post(
+            "/user/login", data={"username": "uncounted", "password": "guess"}
+        )
+    assert response.status_code == 429
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'isagog_login_attempts_total{outcome="success"}' in body
+    assert 'isagog_login_attempts_total{outcome="throttled"}' in body
+    assert 'isagog_token_rejections_total{reason="revoked"}' in body
+    assert 'isagog_password_hash_seconds_count{operation="verify"}' in body
+    assert 'isagog_jwt_seconds_bucket{operation="decode",le="+Inf"}' in body
+    assert 'isagog_db_query_seconds_count{route="/user/login"}' in body
+    assert 'isagog_requests_in_progress{route="/user/login"} 0' in body
+    assert "isagog_token_cache_hits " in body
@@ -0,0 +1,67 @@
+import asyncio
+
+from isagog_userauth import password_pool
+from isagog_userauth.admission import AdmissionLimiter
+from isagog_userauth.password_pool import (
+    get_password_hash_async,
+    shutdown_password_pool,
+    verify_password_async,
+)
+
+
+def test_hash_and_verify_on_pool():
+    async def roundtrip():
+        hashed = await get_password_hash_async("testpassword")
+        return (
+            await verify_password_async("testpassword", hashed),
+            await verify_password_async("wrongpassword", hashed),
+        )
+
+    try:
+        assert asyncio.run(roundtrip()) == (True, False)
+    finally:
+        shutdown_password_pool()
+
+
+def test_hash_passwords_async_keeps_a_job_per_worker_in_flight(monkeypatch):
+    in_flight, peak = 0, 0
+
+    async def fake_hash(password):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return password.upper()
+
+    monkeypatch.setattr(password_pool, "get_password_hash_async", fake_hash)
+    monkeypatch.setattr(password_pool, "pool_size", lambda: 3)
+    monkeypatch.setattr(
+        password_pool,
+        "password_admission",
+        AdmissionLimiter(capacity=8, max_queue=8, max_queue_time=1),
+    )
+    passwords = [f"pw{i}" for i in range(20)]
+    hashed = asyncio.run(password_pool.hash_passwords_async(passwords))
+
+    assert hashed == [password.upper() for password in passwords]
+    assert peak == 3
+
+
+def test_hash_passwords_async_takes_admission_slots(monkeypatch):
+    limiter = AdmissionLimiter(capacity=2, max_queue=8, max_queue_time=1)
+    peak = 0
+
+    async def fake_hash(password):
+        nonlocal peak
+        peak = max(peak, limiter.stats()["active"])
+        await asyncio.sleep(0.001)
+        return password
+
+    monkeypatch.setattr(password_pool, "get_password_hash_async", fake_hash)
+    monkeypatch.setattr(password_pool, "password_admission", limiter)
+    monkeypatch.setattr(password_pool, "pool_size", lambda: 4)
+    asyncio.run(password_pool.hash_passwords_async(["a", "b", "c", "d", "e"]))
+
+    assert limiter.stats()["admitted"] == 5
+    assert limiter.stats()["active"] == 0 and peak == 2
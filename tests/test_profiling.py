@@ -0,0 +1,82 @@
+import asyncio
+import marshal
+
+from isagog_userauth.profiling import (ProfilingMiddleware, profiles,
+                                       requested_mode)
+
+
+def test_sampled_streaming_response_is_not_buffered():
+    sent = []
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for chunk in (b"first", b"second"):
+            await send(
+                {"type": "http.response.body", "body": chunk, "more_body": True}
+            )
+            # every chunk reached the client before the next one is produced
+            assert sent[-1]["body"] == chunk
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/stream",
+        "headers": [],
+        "query_string": b"",
+    }
+    middleware = ProfilingMiddleware(streaming_app, sample_rate=1.0)
+    asyncio.run(middleware(scope, receive, send))
+
+    assert [m.get("body") for m in sent] == [None, b"first", b"second", b""]
+    latest = profiles.list()[0]
+    assert latest["path"] == "/stream"
+    assert latest["status"] == 200 and latest["sampled"]
+
+
+def test_only_the_header_requests_a_profile():
+    scope = {"headers": [(b"x-profile", b" Summary ")], "query_string": b""}
+    assert requested_mode(scope) == "summary"
+    # a route may well have a query parameter of its own named profile
+    scope = {"headers": [], "query_string": b"profile=pstats"}
+    assert requested_mode(scope) is None
+
+
+def test_profile_request(client, admin_headers):
+    headers = admin_headers
+    basic = client.post(
+        "/user/login", data={"username": "testuser", "password": "testpassword"}
+    ).json()
+
+    response = client.get(
+        "/protected",
+        headers={
+            "Authorization": f"Bearer {basic['access_token']}",
+            "X-Profile": "summary",
+        },
+    )
+    assert response.status_code == 403
+
+    response = client.get("/user/list", headers={**headers, "X-Profile": "summary"})
+    assert response.status_code == 200
+    assert response.headers["X-Profiled-Status"] == "200"
+    assert "function calls" in response.text
+    profile_id = response.headers["X-Profile-Id"]
+
+    response = client.get(
+        "/superprotected", headers={**headers, "X-Profile": "pstats"}
+    )
+    assert response.headers["content-type"] == "application/octet-stream"
+    functions = {name for _, _, name in marshal.loads(response.content)}
+    assert "get_admin_user_async" in functions  # dependencies are profiled too
+
+    listed = client.get("/admin/profiles", headers=headers).json()["profiles"]
+    assert [p["path"] for p in listed[:2]] == ["/superprotected", "/user/list"]
+    response = client.get(f"/admin/profiles/{profile_id}", headers=headers)
+    assert "cumulative" in response.text
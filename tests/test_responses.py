@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from isagog_userauth.metrics import current_route, response_serialize_seconds
+from isagog_userauth.responses import (ConstantJSONResponse, FastJSONResponse,
+                                       get_encoder)
+
+
+def test_encoders_agree():
+    payload = {"id": 1, "email": "zoë@example.com", "roles": ["basic"], "ok": None}
+    expected = json.loads(json.dumps(payload))
+    for name in ("auto", "json"):
+        assert json.loads(get_encoder(name)(payload)) == expected
+    with pytest.raises(ValueError):
+        get_encoder("yaml")
+
+
+def test_fast_response_is_timed_per_route():
+    token = current_route.set("/user/test-render")
+    try:
+        response = FastJSONResponse([{"id": 1}])
+    finally:
+        current_route.reset(token)
+    assert json.loads(response.body) == [{"id": 1}]
+    series = response_serialize_seconds.labels("/user/test-render")
+    assert sum(series.counts) == 1
+
+    constant = ConstantJSONResponse(b'{"message":"done"}')
+    assert constant.headers["content-type"] == "application/json"
+    assert constant.body == b'{"message":"done"}'
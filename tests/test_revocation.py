@@ -0,0 +1,51 @@
+from isagog_userauth.revocation import BloomFilter, RevocationList
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_revocation_list():
+    revocations = RevocationList(capacity=100, error_rate=0.01)
+    revocations.add_token("revoked")
+    revocations.add_user(7, 1000.0)
+
+    assert revocations.check_token("revoked") is True
+    assert revocations.check_token("unknown") is False
+    assert revocations.user_revoked({"id": 7, "iat": 999.5})
+    assert not revocations.user_revoked({"id": 7, "iat": 1000.5})
+    assert not revocations.user_revoked({"id": 8, "iat": 0})
+
+    revocations.rebuild(["revoked"], [])
+    assert revocations.check_token("revoked") is None  # only the filter knows it
+    assert not revocations.user_revoked({"id": 7, "iat": 999.5})
+
+
+def test_logout_revokes_tokens(client, add_user):
+    add_user("leaver", "password")
+    tokens = client.post(
+        "/user/login", data={"username": "leaver", "password": "password"}
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    other = client.post(
+        "/user/login", data={"username": "leaver", "password": "password"}
+    ).json()
+
+    response = client.post(
+        "/user/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers
+    )
+    assert response.status_code == 200
+    assert client.get("/protected", headers=headers).status_code == 401
+    response = client.post(
+        "/user/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+    # other sessions of the same user are unaffected
+    other_headers = {"Authorization": f"Bearer {other['access_token']}"}
+    assert client.get("/protected", headers=other_headers).status_code == 200
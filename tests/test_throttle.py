@@ -0,0 +1,41 @@
+from isagog_userauth.throttle import LoginThrottle, SlidingWindowSketch
+
+
+def test_sliding_window_decay():
+    sketch = SlidingWindowSketch(width=1024, depth=4, window=60)
+    for _ in range(10):
+        sketch.add("key", now=600.0)
+
+    assert sketch.estimate("key", now=630.0) == 10
+    assert sketch.estimate("other", now=630.0) == 0
+    assert sketch.estimate("key", now=690.0) == 5  # half of the previous window
+    assert sketch.retry_after("key", limit=5, now=690.0) == 0
+    assert sketch.estimate("key", now=800.0) == 0
+
+
+def test_login_throttle_limits_identity_and_ip():
+    throttle = LoginThrottle(
+        max_per_identity=3, max_per_ip=5, window=60, width=1024, depth=4
+    )
+    for _ in range(3):
+        assert throttle.check("Victim", "10.0.0.1") is None
+        throttle.record_failure("Victim", "10.0.0.1")
+
+    assert throttle.check("victim ", "10.0.0.2") > 0  # identifiers are normalized
+    assert throttle.check("someone", "10.0.0.1") is None
+    throttle.record_failure("someone", "10.0.0.1")
+    throttle.record_failure("another", "10.0.0.1")
+    assert throttle.check("third", "10.0.0.1") > 0
+    assert throttle.rejected == 2
+
+
+def test_login_throttle_normalizes_like_the_login_lookup():
+    throttle = LoginThrottle(
+        max_per_identity=2, max_per_ip=0, window=60, width=1024, depth=4
+    )
+    throttle.record_failure("Straße", None)
+    throttle.record_failure("STRASSE", None)
+    assert throttle.check("strasse", None) > 0
+    throttle.record_failure("ｖｉｃｔｉｍ", None)  # fullwidth, NFKC folds it
+    throttle.record_failure("Victim", None)
+    assert throttle.check("victim", None) > 0
@@ -0,0 +1,26 @@
+import time
+
+from isagog_userauth.token_cache import TokenCache
+
+
+def test_lru_eviction_and_counters():
+    cache = TokenCache(maxsize=2)
+    exp = time.time() + 60
+    cache.put("a", {"id": 1, "exp": exp})
+    cache.put("b", {"id": 2, "exp": exp})
+    assert cache.get("a") == {"id": 1, "exp": exp}
+    cache.put("c", {"id": 3, "exp": exp})  # evicts "b", the least recently used
+
+    assert cache.get("b") is None
+    assert cache.get("c")["id"] == 3
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_entries_expire_with_the_token():
+    cache = TokenCache(maxsize=10)
+    cache.put("expired", {"id": 1, "exp": time.time() - 1})
+    cache.put("no-exp", {"id": 2})
+
+    assert cache.get("expired") is None
+    assert cache.get("no-exp") is None
+    assert cache.stats()["size"] == 0
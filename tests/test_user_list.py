@@ -0,0 +1,32 @@
+import json
+
+
+def test_list_pagination_and_stream(client, admin_headers):
+    first = client.get("/user/list", params={"limit": 1}, headers=admin_headers)
+    assert len(first.json()) == 1
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get(
+        "/user/list", params={"limit": 1, "after_id": cursor}, headers=admin_headers
+    )
+    assert second.json()[0]["id"] > first.json()[0]["id"]
+
+    admins = client.get("/user/list", params={"role": "admin"}, headers=admin_headers)
+    assert [user["username"] for user in admins.json()] == ["testadmin"]
+    prefixed = client.get(
+        "/user/list", params={"email_prefix": "testu"}, headers=admin_headers
+    )
+    assert [user["username"] for user in prefixed.json()] == ["testuser"]
+
+    streamed = client.get("/user/list", params={"stream": True}, headers=admin_headers)
+    assert streamed.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    assert lines == client.get("/user/list", headers=admin_headers).json()
+
+
+def test_list_prefix_ending_with_the_last_code_point(client, admin_headers):
+    for prefix in ("\U0010ffff", "test\U0010ffff"):
+        response = client.get(
+            "/user/list", params={"username_prefix": prefix}, headers=admin_headers
+        )
+        assert response.status_code == 200
+        assert response.json() == []